@@ -0,0 +1,180 @@
+import math
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+from checkpoints import item_names, parse_day
+from engine import EPOCH, SECONDS_PER_DAY
+from statements import STATEMENTS
+
+
+# Sales velocity, days of cover, sell-through and reorder points per item over the last window_days days.
+# The shipments come from shipment_summary, one row per destination, item and day, so the work grows with
+# the days and items in the window rather than with the number of shipments. The rows are read in chunks
+# into one NumPy array per column and grouped by item id with bincount. NumPy is imported on first use.
+
+DEFAULT_WINDOW_DAYS = 90
+DEFAULT_LEAD_TIME_DAYS = 14
+
+# Safety stock covers demand up to this many standard deviations above the mean, 1.65 is ~95% of lead times
+DEFAULT_SERVICE_Z = 1.65
+
+DEFAULT_CHUNK_SIZE = 100000
+
+
+@dataclass
+class ItemAnalytics:
+    store: str
+    item_no: str
+    item_name: str
+    on_hand: int
+    received: int
+    shipped: int
+    daily_velocity: float
+    demand_stddev: float
+    days_of_cover: float  # inf when nothing shipped in the window
+    sell_through: float  # shipped / received in the window, nan when nothing was received
+    reorder_point: float
+    suggested_order: int
+
+
+@dataclass
+class ChannelAnalytics:
+    shipping_to: str
+    shipped: int
+    total_cost: float
+    share: float  # of all units shipped in the window
+    sell_through: float  # units shipped here / units received in the window, nan when nothing was received
+
+
+@dataclass
+class AnalyticsResult:
+    start_day: date
+    end_day: date
+    items: list = field(default_factory=list)
+    channels: list = field(default_factory=list)
+    seconds: float = 0.0
+
+    def summary(self):
+        return (f"{len(self.items):,} items over {self.start_day} .. {self.end_day}, "
+                f"{sum(item.suggested_order > 0 for item in self.items):,} to reorder ({self.seconds:.2f}s).")
+
+
+def require_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("Analytics requires numpy (pip install numpy).")
+    return numpy
+
+
+def read_columns(conn, query, params, dtypes, chunk_size=DEFAULT_CHUNK_SIZE, job=None):
+    # Run query and return one array per column, converting chunk_size rows at a time
+    np = require_numpy()
+    cursor = conn.execute(query, params)
+    chunks = [[] for _ in dtypes]
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        for parts, values, dtype in zip(chunks, zip(*rows), dtypes):
+            parts.append(np.array(values, dtype=dtype))
+        if job:
+            job.check()
+    return [np.concatenate(parts) if parts else np.empty(0, dtype=dtype) for parts, dtype in zip(chunks, dtypes)]
+
+
+def analyze(conn, as_of=None, window_days=DEFAULT_WINDOW_DAYS, lead_time_days=DEFAULT_LEAD_TIME_DAYS,
+            service_z=DEFAULT_SERVICE_Z, job=None):
+    # The window is the window_days days ending with as_of (default: today)
+    np = require_numpy()
+    window_days, lead_time_days = int(window_days), float(lead_time_days)
+    if window_days < 1 or lead_time_days < 0:
+        raise ValueError("The window must be at least one day and the lead time cannot be negative.")
+    started = time.perf_counter()
+    end_day = parse_day(as_of or date.today())
+    start_day = end_day - timedelta(days=window_days - 1)
+    first = (start_day - EPOCH.date()).days
+    last = (end_day - EPOCH.date()).days
+
+    # Item ids are small consecutive integers, so they index the per-item arrays directly
+    size = (conn.execute(STATEMENTS["max_item_id"]).fetchone()[0] or 0) + 1
+
+    channel, item, day, quantity, cost = read_columns(
+        conn, STATEMENTS["window_shipments"], (first, last), [object, np.int64, np.int64, np.float64, np.float64], job=job)
+    shipped = np.bincount(item, weights=quantity, minlength=size)
+    velocity = shipped / window_days
+
+    # Daily demand summed over the destinations, days without shipments count as zero in the variance
+    item_days, inverse = np.unique(item * window_days + (day - first), return_inverse=True)
+    daily = np.bincount(inverse.ravel(), weights=quantity)
+    squares = np.bincount(item_days // window_days, weights=daily * daily, minlength=size)
+    stddev = np.sqrt(np.maximum(squares / window_days - velocity * velocity, 0))
+
+    received_item, received_quantity = read_columns(
+        conn, STATEMENTS["window_receipts"], (first * SECONDS_PER_DAY, (last + 1) * SECONDS_PER_DAY),
+        [np.int64, np.float64], job=job)
+    received = np.bincount(received_item, weights=received_quantity, minlength=size)
+
+    balance_item, balance_quantity = read_columns(conn, STATEMENTS["on_hand"], (), [np.int64, np.float64], job=job)
+    on_hand = np.zeros(size)
+    on_hand[balance_item] = balance_quantity
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        days_of_cover = np.where(velocity > 0, on_hand / velocity, np.inf)
+        sell_through = np.where(received > 0, shipped / received, np.nan)
+    reorder_point = velocity * lead_time_days + service_z * stddev * math.sqrt(lead_time_days)
+    # At or below the reorder point, order enough to be back above it after another lead time of sales
+    suggested = np.where((velocity > 0) & (on_hand <= reorder_point),
+                         np.ceil(np.maximum(reorder_point + velocity * lead_time_days - on_hand, 0)), 0)
+
+    # Fewest days of cover first, the faster seller first among equals
+    active = np.flatnonzero((on_hand != 0) | (shipped > 0) | (received > 0))
+    active = active[np.lexsort((-shipped[active], days_of_cover[active]))]
+
+    result = AnalyticsResult(start_day, end_day)
+    names = item_names(conn)
+    for item_id in active.tolist():
+        result.items.append(ItemAnalytics(
+            *names[item_id], int(on_hand[item_id]), int(received[item_id]), int(shipped[item_id]),
+            float(velocity[item_id]), float(stddev[item_id]), float(days_of_cover[item_id]),
+            float(sell_through[item_id]), float(reorder_point[item_id]), int(suggested[item_id])))
+
+    channels, channel_index = np.unique(channel, return_inverse=True)
+    channel_index = channel_index.ravel()
+    channel_shipped = np.bincount(channel_index, weights=quantity, minlength=len(channels))
+    channel_cost = np.bincount(channel_index, weights=cost, minlength=len(channels))
+    total_shipped, total_received = shipped.sum(), received.sum()
+    for position in np.argsort(-channel_shipped, kind="stable").tolist():
+        result.channels.append(ChannelAnalytics(
+            channels[position], int(channel_shipped[position]), round(float(channel_cost[position]), 2),
+            float(channel_shipped[position] / total_shipped) if total_shipped else 0.0,
+            float(channel_shipped[position] / total_received) if total_received else math.nan))
+
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+if __name__ == "__main__":
+    from db import connect
+
+    try:
+        window_days = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_WINDOW_DAYS
+        lead_time_days = float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_LEAD_TIME_DAYS
+        as_of = parse_day(sys.argv[3]) if len(sys.argv) > 3 else None
+    except ValueError:
+        print(f"Usage: python analytics.py [WINDOW_DAYS (default: {DEFAULT_WINDOW_DAYS})] "
+              f"[LEAD_TIME_DAYS (default: {DEFAULT_LEAD_TIME_DAYS})] [AS_OF_DAY]")
+        sys.exit(1)
+
+    result = analyze(connect(readonly=True), as_of, window_days, lead_time_days)
+    print("Store\tItem No\tItem Name\tOn Hand\tShipped\tPer Day\tDays of Cover\tReorder Point\tSuggested Order")
+    for item in result.items[:50]:
+        print(item.store, item.item_no, item.item_name, item.on_hand, item.shipped, f"{item.daily_velocity:.2f}",
+              f"{item.days_of_cover:.1f}", f"{item.reorder_point:.1f}", item.suggested_order, sep="\t")
+    print()
+    print("Shipping To\tShipped\tShare\tSell-Through")
+    for channel in result.channels:
+        print(channel.shipping_to, channel.shipped, f"{channel.share:.1%}", f"{channel.sell_through:.1%}", sep="\t")
+    print(result.summary())
@@ -1,1065 +1,1159 @@
-import tkinter as tk
-from tkinter import ttk, messagebox, StringVar
-import sqlite3
-from datetime import datetime
-import pandas as pd
-
-# Create or connect to the database
-conn = sqlite3.connect("inventory.db")
-cursor = conn.cursor()
-
-# Create tables if not exists
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS incoming_items (
-        id INTEGER PRIMARY KEY,
-        store TEXT,
-        item_no TEXT,
-        item_name TEXT,
-        quantity INTEGER,
-        price REAL, 
-        tax_rate REAL,
-        entry_date TEXT
-    )
-''')
-
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS outgoing_shipments (
-        id INTEGER PRIMARY KEY,
-        store TEXT,
-        item_name TEXT,
-        item_no TEXT,
-        quantity INTEGER,
-        average_price_at_shipment REAL, 
-        average_price_at_shipment_after_tax REAL, 
-        shipping_to TEXT,
-        entry_date TEXT
-    )
-''')
-
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS expense_entries (
-        id INTEGER PRIMARY KEY,
-        store TEXT,
-        item_name TEXT,
-        quantity INTEGER,
-        price REAL, 
-        tax_rate REAL, 
-        entry_date TEXT
-    )
-''')
-
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS expenses (
-        store TEXT,
-        item_name TEXT,
-        total_quantity INTEGER,
-        average_price_before_tax REAL,
-        average_price_after_tax REAL,
-        PRIMARY KEY (store, item_name)
-    )
-''')
-
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS inventory (
-        store TEXT,
-        item_no TEXT,
-        item_name TEXT,
-        total_quantity INTEGER,
-        average_price_before_tax REAL,
-        average_price_after_tax REAL,
-        PRIMARY KEY (store, item_no, item_name)
-    )
-''')
-
-conn.commit()
-
-
-class InventoryApp:
-
-    def __init__(self, root):
-        self.root = root
-        self.root.title("Inventory Management App")
-
-        self.tabControl = ttk.Notebook(root)
-        self.incoming_tab = ttk.Frame(self.tabControl)
-        self.outgoing_tab = ttk.Frame(self.tabControl)
-        self.new_expense_tab = ttk.Frame(self.tabControl)
-        self.inventory_tab = ttk.Frame(self.tabControl)
-
-        # self.shipment_summary_tab = ttk.Frame(self.tabControl)
-        self.expense_summary_tab = ttk.Frame(self.tabControl)
-
-        self.tabControl.add(self.incoming_tab, text="Incoming Items")
-        self.tabControl.add(self.outgoing_tab, text="Outgoing Shipments")
-        self.tabControl.add(self.new_expense_tab, text="Expense Entry")
-        self.tabControl.add(self.inventory_tab, text="Inventory Summary")
-        # Shipment Summary Tab
-        self.create_reporting_tab()
-
-        self.tabControl.add(self.expense_summary_tab, text="Expense Summary")
-        self.tabControl.pack(expand=1, fill="both")
-
-        self.incoming_items_window = None
-        self.new_expense_window = None
-        self.outgoing_shipments_window = None
-
-        # Incoming Items Tab
-        self.create_incoming_tab()
-
-        # Outgoing Shipments Tab
-        self.create_outgoing_tab()
-
-        # expense entry Tab
-        self.create_new_expense_tab()
-
-        # Inventory Tab
-        self.create_inventory_tab()
-
-        # Outgoing Shipment Summary Tab
-        # self.shipment_summary_tab()
-
-        # Expense Summary Tab
-        self.create_expense_summary_tab()
-
-    def calculate_after_tax_price(self, price_before_tax, tax_rate):
-        return price_before_tax + price_before_tax*tax_rate/100
-
-    def clean_input(self, text):
-        return text.strip().upper()
-
-    def validate_input(self, *entries):
-        for entry in entries:
-            if not entry.get():
-                messagebox.showwarning(
-                    "Missing Information", "Please fill in all fields.")
-                return False
-        return True
-
-    def create_incoming_tab(self):
-        # Store
-        label_store = tk.Label(self.incoming_tab, text="Store:")
-        self.entry_store = tk.Entry(self.incoming_tab)
-        label_store.grid(row=0, column=0, padx=10, pady=10)
-        self.entry_store.grid(row=0, column=1, padx=10, pady=10)
-
-        # Item no
-        label_item_no = tk.Label(self.incoming_tab, text="Item No:")
-        self.entry_item_no = tk.Entry(self.incoming_tab)
-        label_item_no.grid(row=1, column=0, padx=10, pady=10)
-        self.entry_item_no.grid(row=1, column=1, padx=10, pady=10)
-
-        # Item name
-        label_item_name = tk.Label(self.incoming_tab, text="Item Name:")
-        self.entry_item_name = tk.Entry(self.incoming_tab)
-        label_item_name.grid(row=2, column=0, padx=10, pady=10)
-        self.entry_item_name.grid(row=2, column=1, padx=10, pady=10)
-
-        # Quantity
-        label_quantity = tk.Label(self.incoming_tab, text="Quantity:")
-        self.entry_quantity = tk.Entry(self.incoming_tab)
-        label_quantity.grid(row=3, column=0, padx=10, pady=10)
-        self.entry_quantity.grid(row=3, column=1, padx=10, pady=10)
-
-        # Price
-        label_price = tk.Label(self.incoming_tab, text="Price:")
-        self.entry_price = tk.Entry(self.incoming_tab)
-        label_price.grid(row=4, column=0, padx=10, pady=10)
-        self.entry_price.grid(row=4, column=1, padx=10, pady=10)
-
-        # Tax rate
-        label_tax_rate = tk.Label(self.incoming_tab, text="Tax Rate (%):")
-        self.entry_tax_rate = tk.Entry(self.incoming_tab)
-        label_tax_rate.grid(row=5, column=0, padx=10, pady=10)
-        self.entry_tax_rate.grid(row=5, column=1, padx=10, pady=10)
-
-        # Entry Date
-        label_entry_date = tk.Label(
-            self.incoming_tab, text="Entry Date:")
-        self.entry_date = tk.Entry(self.incoming_tab)
-        label_entry_date.grid(row=6, column=0, padx=10, pady=10)
-        self.entry_date.grid(row=6, column=1, padx=10, pady=10)
-
-        # Set today's date as the default value
-        self.entry_date.insert(
-            0, datetime.now().strftime("%m/%d/%Y"))
-
-        btn_enter_incoming = tk.Button(
-            self.incoming_tab, text="Enter Incoming Item", command=self.enter_incoming_item)
-        btn_enter_incoming.grid(row=7, column=0, columnspan=2, pady=10)
-
-        btn_display_incoming = tk.Button(
-            self.incoming_tab, text="Display Incoming Items", command=self.display_incoming_items)
-        btn_display_incoming.grid(row=8, column=0, columnspan=2, pady=10)
-
-    def create_outgoing_tab(self):
-        # Store
-        label_store = tk.Label(self.outgoing_tab, text="Store:")
-        self.entry_store_outgoing = tk.Entry(self.outgoing_tab)
-        label_store.grid(row=0, column=0, padx=10, pady=10)
-        self.entry_store_outgoing.grid(row=0, column=1, padx=10, pady=10)
-
-        # Item no
-        label_item_no = tk.Label(self.outgoing_tab, text="Item No:")
-        self.entry_item_no_outgoing = tk.Entry(self.outgoing_tab)
-        label_item_no.grid(row=1, column=0, padx=10, pady=10)
-        self.entry_item_no_outgoing.grid(row=1, column=1, padx=10, pady=10)
-
-        # Item name
-        label_item_name = tk.Label(self.outgoing_tab, text="Item Name:")
-        self.entry_item_name_outgoing = tk.Entry(self.outgoing_tab)
-        label_item_name.grid(row=2, column=0, padx=10, pady=10)
-        self.entry_item_name_outgoing.grid(row=2, column=1, padx=10, pady=10)
-
-        # Quantity
-        label_quantity = tk.Label(self.outgoing_tab, text="Quantity:")
-        self.entry_quantity_outgoing = tk.Entry(self.outgoing_tab)
-        label_quantity.grid(row=3, column=0, padx=10, pady=10)
-        self.entry_quantity_outgoing.grid(row=3, column=1, padx=10, pady=10)
-
-        # Shipping to (dropdown menu)
-        label_shipping_to = tk.Label(
-            self.outgoing_tab, text="Shipping To:")
-        self.shipping_to_var = tk.StringVar(self.outgoing_tab)
-        self.shipping_to_var.set("USA FBA")  # Default value
-        shipping_to_options = [
-            "USA FBA", "USA MFN", "CAN FBA", "CAN MFN"]
-        shipping_to_menu = tk.OptionMenu(
-            self.outgoing_tab, self.shipping_to_var, *shipping_to_options)
-
-        label_shipping_to.grid(row=4, column=0, padx=10, pady=10)
-        shipping_to_menu.grid(row=4, column=1, padx=10, pady=10)
-
-        # Entry Date
-        label_entry_date_outgoing = tk.Label(
-            self.outgoing_tab, text="Entry Date:")
-        self.entry_date_outgoing = tk.Entry(self.outgoing_tab)
-        label_entry_date_outgoing.grid(row=5, column=0, padx=10, pady=10)
-        self.entry_date_outgoing.grid(row=5, column=1, padx=10, pady=10)
-
-        # Set today's date as the default value
-        self.entry_date_outgoing.insert(
-            0, datetime.now().strftime("%m/%d/%Y"))
-
-        # Enter Outgoing Shipment button
-        btn_enter_outgoing = tk.Button(
-            self.outgoing_tab, text="Enter Outgoing Shipment", command=self.enter_outgoing_shipment)
-        btn_enter_outgoing.grid(row=6, column=0, columnspan=2, pady=10)
-
-        # Display Outgoing Shipments button
-        btn_display_outgoing = tk.Button(
-            self.outgoing_tab, text="Display Outgoing Shipments", command=self.display_outgoing_shipments)
-        btn_display_outgoing.grid(row=7, column=0, columnspan=2, pady=10)
-
-    def create_new_expense_tab(self):
-        # Store
-        label_store = tk.Label(self.new_expense_tab, text="Store:")
-        self.entry_store_new_expense = tk.Entry(self.new_expense_tab)
-        label_store.grid(row=0, column=0, padx=10, pady=10)
-        self.entry_store_new_expense.grid(row=0, column=1, padx=10, pady=10)
-
-        # Item name
-        label_item_name = tk.Label(self.new_expense_tab, text="Item Name:")
-        self.entry_item_name_new_expense = tk.Entry(self.new_expense_tab)
-        label_item_name.grid(row=1, column=0, padx=10, pady=10)
-        self.entry_item_name_new_expense.grid(
-            row=1, column=1, padx=10, pady=10)
-
-        # Quantity
-        label_quantity = tk.Label(self.new_expense_tab, text="Quantity:")
-        self.entry_quantity_new_expense = tk.Entry(self.new_expense_tab)
-        label_quantity.grid(row=2, column=0, padx=10, pady=10)
-        self.entry_quantity_new_expense.grid(row=2, column=1, padx=10, pady=10)
-
-        # Price
-        label_price = tk.Label(self.new_expense_tab, text="Price:")
-        self.entry_price_new_expense = tk.Entry(self.new_expense_tab)
-        label_price.grid(row=3, column=0, padx=10, pady=10)
-        self.entry_price_new_expense.grid(row=3, column=1, padx=10, pady=10)
-
-        # Tax rate
-        label_tax_rate = tk.Label(self.new_expense_tab, text="Tax Rate (%):")
-        self.entry_tax_rate_new_expense = tk.Entry(self.new_expense_tab)
-        label_tax_rate.grid(row=4, column=0, padx=10, pady=10)
-        self.entry_tax_rate_new_expense.grid(row=4, column=1, padx=10, pady=10)
-
-        # Entry Date
-        label_entry_date_new_expense = tk.Label(
-            self.new_expense_tab, text="Entry Date:")
-        self.entry_date_new_expense = tk.Entry(self.new_expense_tab)
-        label_entry_date_new_expense.grid(row=5, column=0, padx=10, pady=10)
-        self.entry_date_new_expense.grid(row=5, column=1, padx=10, pady=10)
-
-        # Set today's date as the default value
-        self.entry_date_new_expense.insert(
-            0, datetime.now().strftime("%m/%d/%Y"))
-
-        # Enter New Expense button
-        btn_enter_new_expense = tk.Button(
-            self.new_expense_tab, text="Enter New Expense", command=self.enter_new_expense)
-        btn_enter_new_expense.grid(row=6, column=0, columnspan=2, pady=10)
-
-        # Display Expenses button
-        btn_display_new_expense = tk.Button(
-            self.new_expense_tab, text="Display Expense Details", command=self.display_expense_details)
-        btn_display_new_expense.grid(row=7, column=0, columnspan=2, pady=10)
-
-    def create_inventory_tab(self):
-        self.tree_inventory = ttk.Treeview(self.inventory_tab, columns=(
-            "Store", "Item No", "Item Name", "Total Quantity", "Average Price", "Average Price After Tax"))
-
-        self.tree_inventory.column("#0", width=30, anchor="w")
-        self.tree_inventory.column("#1", width=130, anchor="w")
-        self.tree_inventory.column("#2", width=130, anchor="w")
-        self.tree_inventory.column("#3", width=130, anchor="w")
-        self.tree_inventory.column("#4", width=130, anchor="e")
-        self.tree_inventory.column("#5", width=130, anchor="e")
-        self.tree_inventory.column("#6", width=130, anchor="e")
-
-        self.tree_inventory.heading("#0", text="#")
-        self.tree_inventory.heading("#1", text="Store")
-        self.tree_inventory.heading("#2", text="Item No")
-        self.tree_inventory.heading("#3", text="Item Name")
-        self.tree_inventory.heading("#4", text="Total Quantity")
-        self.tree_inventory.heading("#5", text="Average Price")
-        self.tree_inventory.heading("#6", text="Average Price After Tax")
-
-        self.tree_inventory.grid(row=0, column=0, padx=10, pady=10)
-
-        btn_display_inventory = tk.Button(
-            self.inventory_tab, text="Display Inventory", command=self.display_inventory)
-        btn_display_inventory.grid(row=1, column=0, pady=10)
-
-    def create_expense_summary_tab(self):
-        self.tree_expense_summary_tab = ttk.Treeview(self.expense_summary_tab, columns=(
-            "Store", "Item Name", "Total Quantity",  "Average Price After Tax", "Total Cost"))
-
-        self.tree_expense_summary_tab.column("#0", width=10, anchor="w")
-        self.tree_expense_summary_tab.column("#1", width=150, anchor="w")
-        self.tree_expense_summary_tab.column("#2", width=150, anchor="w")
-        self.tree_expense_summary_tab.column("#3", width=150, anchor="e")
-        self.tree_expense_summary_tab.column("#4", width=150, anchor="e")
-        self.tree_expense_summary_tab.column("#5", width=150, anchor="e")
-
-        self.tree_expense_summary_tab.heading("#0", text="#")
-        self.tree_expense_summary_tab.heading("#1", text="Store")
-        self.tree_expense_summary_tab.heading("#2", text="Item Name")
-        self.tree_expense_summary_tab.heading("#3", text="Total Quantity")
-        self.tree_expense_summary_tab.heading(
-            "#4", text="Average Price After Tax")
-        self.tree_expense_summary_tab.heading("#5", text="Total Cost")
-
-        self.tree_expense_summary_tab.grid(row=0, column=0, padx=10, pady=10)
-
-        btn_display_expense_summary = tk.Button(
-            self.expense_summary_tab, text="Display Expenses", command=self.display_expense_summary)
-        btn_display_expense_summary.grid(row=1, column=0, pady=10)
-
-    def enter_incoming_item(self):
-        # Validate input
-        if not self.validate_input(self.entry_store, self.entry_item_no, self.entry_item_name, self.entry_quantity, self.entry_price, self.entry_tax_rate):
-            return
-
-        item_no = self.clean_input(self.entry_item_no.get())
-        store = self.clean_input(self.entry_store.get())
-        item_name = self.clean_input(self.entry_item_name.get())
-        quantity = int(self.clean_input(self.entry_quantity.get()))
-        price = float(self.clean_input(self.entry_price.get()))
-        tax_rate = float(self.clean_input(self.entry_tax_rate.get()))
-
-        # Get the entry date from the entry field or use today's date if not provided
-        entry_date_str = self.clean_input(self.entry_date.get())
-        entry_date = datetime.strptime(
-            entry_date_str, "%m/%d/%Y").strftime("%Y-%m-%d %H:%M:%S") if entry_date_str else datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        cursor.execute('''
-            INSERT INTO incoming_items (store, item_no, item_name, quantity, price, tax_rate, entry_date)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (store, item_no, item_name, quantity, price, tax_rate, entry_date))
-
-        self.update_inventory_incoming(
-            store, item_no, item_name, quantity, price, tax_rate)
-        conn.commit()
-
-        # Display success message
-        messagebox.showinfo("Success", "Incoming item entered successfully!")
-
-        # Clear entry fields
-        self.entry_store.delete(0, tk.END)
-        self.entry_item_no.delete(0, tk.END)
-        self.entry_item_name.delete(0, tk.END)
-        self.entry_quantity.delete(0, tk.END)
-        self.entry_price.delete(0, tk.END)
-        self.entry_tax_rate.delete(0, tk.END)
-
-    def enter_new_expense(self):
-        # Validate input
-        if not self.validate_input(self.entry_store_new_expense, self.entry_item_name_new_expense,  self.entry_quantity_new_expense, self.entry_price_new_expense, self.entry_tax_rate_new_expense):
-            return
-
-        store = self.clean_input(self.entry_store_new_expense.get())
-        item_name = self.clean_input(self.entry_item_name_new_expense.get())
-        quantity = int(self.clean_input(self.entry_quantity_new_expense.get()))
-        price = float(self.clean_input(self.entry_price_new_expense.get()))
-        tax_rate = float(self.clean_input(
-            self.entry_tax_rate_new_expense.get()))
-
-        # Get the entry date from the entry field or use today's date if not provided
-        entry_date_str = self.clean_input(self.entry_date_new_expense.get())
-        entry_date = datetime.strptime(
-            entry_date_str, "%m/%d/%Y").strftime("%Y-%m-%d %H:%M:%S") if entry_date_str else datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        cursor.execute('''
-            INSERT INTO expense_entries (store,  item_name, quantity, price, tax_rate, entry_date)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (store, item_name, quantity, price, tax_rate, entry_date))
-        conn.commit()
-
-        self.update_expense_summary(
-            store, item_name, quantity, price, tax_rate)
-
-        # Display success message
-        messagebox.showinfo("Success", "New Expense entered successfully!")
-
-        # Clear entry fields
-        self.entry_store_new_expense.delete(0, tk.END)
-        self.entry_item_name_new_expense.delete(0, tk.END)
-        self.entry_quantity_new_expense.delete(0, tk.END)
-        self.entry_price_new_expense.delete(0, tk.END)
-        self.entry_tax_rate_new_expense.delete(0, tk.END)
-
-    def update_expense_summary(self, store, item_name, quantity, average_price_before_tax, tax_rate):
-        # Check if the item already exists in the inventory
-        cursor.execute(
-            'SELECT * FROM expenses WHERE store = ? AND item_name = ?', (store, item_name))
-        existing_item = cursor.fetchone()
-
-        average_price_after_tax = self.calculate_after_tax_price(
-            average_price_before_tax, tax_rate)
-        additional_total_cost = average_price_before_tax * quantity
-        additional_total_cost_after_tax = average_price_after_tax * quantity
-
-        if existing_item:
-            # Update existing item
-            cursor.execute('''
-                UPDATE expenses 
-                SET total_quantity = total_quantity + ?, 
-                    average_price_before_tax = (total_quantity * average_price_before_tax + ?) / (total_quantity + ?), 
-                    average_price_after_tax  = (total_quantity * average_price_after_tax + ?) / (total_quantity + ?) 
-                WHERE store = ? AND item_name = ?
-            ''', (quantity, additional_total_cost, quantity, additional_total_cost_after_tax, quantity, store, item_name))
-        else:
-            # Insert new item
-            cursor.execute('''
-                INSERT INTO expenses (store, item_name, total_quantity, average_price_before_tax, average_price_after_tax)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (store, item_name, quantity, average_price_before_tax if quantity != 0 else 0, average_price_after_tax if quantity != 0 else 0))
-
-        conn.commit()
-
-    def enter_outgoing_shipment(self):
-        # Validate input
-        if not self.validate_input(self.entry_item_no_outgoing, self.entry_quantity_outgoing):
-            return
-
-        store = self.clean_input(self.entry_store_outgoing.get())
-        item_no = self.clean_input(self.entry_item_no_outgoing.get())
-        item_name = self.clean_input(self.entry_item_name_outgoing.get())
-        quantity = int(self.clean_input(self.entry_quantity_outgoing.get()))
-        shipping_to = self.clean_input(
-            self.shipping_to_var.get())
-
-        # Get the entry date from the entry field or use today's date if not provided
-        entry_date_str = self.clean_input(self.entry_date_outgoing.get())
-        entry_date = datetime.strptime(
-            entry_date_str, "%m/%d/%Y").strftime("%Y-%m-%d %H:%M:%S") if entry_date_str else datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        # Check if there is enough quantity in the inventory
-        cursor.execute('''
-            SELECT total_quantity, average_price_before_tax, average_price_after_tax FROM inventory WHERE store=? AND item_no=? AND item_name=?
-        ''', (store, item_no, item_name))
-        result = cursor.fetchone()
-        if result and result[0] >= quantity:
-            average_price_at_shipment = result[1]
-            average_price_after_tax_at_shipment = result[2]
-
-            cursor.execute('''
-                INSERT INTO outgoing_shipments (store, item_no, item_name, quantity, shipping_to, average_price_at_shipment, average_price_at_shipment_after_tax, entry_date)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (store, item_no, item_name, quantity, shipping_to, average_price_at_shipment, average_price_after_tax_at_shipment, entry_date))
-
-            conn.commit()
-            self.update_inventory_outgoing(store, item_no, item_name, quantity)
-
-            # Display success message
-            messagebox.showinfo(
-                "Success", "Outgoing shipment entered successfully!")
-
-            # Clear entry fields
-            self.entry_store_outgoing.delete(0, tk.END)
-            self.entry_item_no_outgoing.delete(0, tk.END)
-            self.entry_item_name_outgoing.delete(0, tk.END)
-            self.entry_quantity_outgoing.delete(0, tk.END)
-        else:
-            if result:
-                available_quantity = result[0]
-                messagebox.showwarning(
-                    "Insufficient Quantity", f"Not enough quantity in the inventory. Available quantity for ({store}, {item_no}, {item_name}): {available_quantity}.")
-            else:
-                messagebox.showwarning(
-                    "Item Not Found", f"Item ({store}, {item_no}, {item_name}) not found in the inventory.")
-
-    def update_inventory_incoming(self, store, item_no, item_name, quantity, per_unit_price, tax_rate):
-
-        per_unit_price_after_tax = per_unit_price + per_unit_price*tax_rate/100
-        # Check if the item already exists in the inventory
-        cursor.execute(
-            'SELECT * FROM inventory WHERE store = ? AND item_no = ? AND item_name = ?', (store, item_no, item_name))
-        existing_item = cursor.fetchone()
-
-        additional_total_price = quantity * per_unit_price
-        additional_total_price_after_tax = quantity * per_unit_price_after_tax
-
-        if existing_item:
-            # Update existing item
-            cursor.execute('''
-                UPDATE inventory 
-                SET item_name = ?, 
-                    total_quantity = total_quantity + ?, 
-                    average_price_before_tax = (total_quantity * average_price_before_tax + ?) / (total_quantity + ?), 
-                    average_price_after_tax  = (total_quantity * average_price_after_tax + ?) / (total_quantity + ?) 
-                WHERE store = ? AND item_no = ? AND item_name = ?
-            ''', (item_name, quantity, additional_total_price, quantity, additional_total_price_after_tax, quantity, store, item_no, item_name))
-        else:
-            # Insert new item
-            cursor.execute('''
-                INSERT INTO inventory (store, item_no, item_name, total_quantity, average_price_before_tax, average_price_after_tax)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (store, item_no, item_name, quantity, per_unit_price if quantity != 0 else 0, per_unit_price_after_tax if quantity != 0 else 0))
-
-        conn.commit()
-
-        # Refresh inventory display
-        self.display_inventory()
-
-    def update_inventory_outgoing(self, store, item_no, item_name, quantity):
-        # This time the item must already exist in the inventory
-
-        cursor.execute('''
-            UPDATE inventory 
-            SET total_quantity = total_quantity - ? 
-            WHERE store=? AND item_no = ? AND item_name = ? 
-        ''', (quantity, store, item_no, item_name)
-        )
-
-        conn.commit()
-
-        # Refresh inventory display
-        self.display_inventory()
-
-    def display_expense_summary(self):
-        # Clear previous data
-        for row in self.tree_expense_summary_tab.get_children():
-            self.tree_expense_summary_tab.delete(row)
-
-        # Display updated expenses
-        cursor.execute('''
-            SELECT 
-                store, 
-                item_name, 
-                total_quantity, 
-                average_price_before_tax, 
-                average_price_after_tax, 
-                average_price_after_tax*total_quantity AS total_cost 
-            FROM expenses
-        ''')
-        result = cursor.fetchall()
-        for index, row in enumerate(result):
-            formatted_row = list(row)
-            formatted_row[2] = self.format_quantity(row[2])
-            formatted_row[3] = self.format_price(row[3])
-            formatted_row[4] = self.format_price(row[4])
-            self.tree_expense_summary_tab.insert("", "end", text = str(index), values=formatted_row)
-
-    def display_inventory(self):
-        # Clear previous data
-        for row in self.tree_inventory.get_children():
-            self.tree_inventory.delete(row)
-
-        # Display updated inventory
-        cursor.execute('''
-            SELECT store, item_no, item_name, total_quantity, average_price_before_tax, average_price_after_tax FROM inventory
-        ''')
-        result = cursor.fetchall()
-        for index, row in enumerate(result):
-            formatted_row = list(row)
-            formatted_row[3] = self.format_quantity(
-                row[3])  # Format the quantity value
-            formatted_row[4] = self.format_price(
-                row[4])  # Format the Average Price
-            # Format the Average Price After Tax
-            formatted_row[5] = self.format_price(row[5])
-            self.tree_inventory.insert("", "end", text = str(index), values=formatted_row)
-
-    def format_quantity(self, value):
-        return f"{value:,}"
-
-    def format_price(self, value):
-        return "{:0,.2f}".format(value)
-
-    def update_inventory_delete_incoming_entry(self, inventory_info, store, item_no, item_name, quantity, unit_price, tax_rate):
-        # Current inventory details
-        current_quantity = int(inventory_info[0])
-        inventory_price_before_tax = float(inventory_info[1])
-        inventory_price_after_tax = float(inventory_info[2])
-        current_total_cost_before_tax = current_quantity * inventory_price_before_tax
-        current_total_cost_after_tax = current_quantity * inventory_price_after_tax
-
-        # Detail of the selected entry
-        selected_entry_quantity = int(quantity)
-        selected_entry_price = float(unit_price)
-        selected_entry_tax_rate = float(tax_rate)
-        selected_entry_total_cost_before_tax = selected_entry_quantity * selected_entry_price
-        selected_entry_total_cost_after_tax = selected_entry_total_cost_before_tax + \
-            selected_entry_total_cost_before_tax * selected_entry_tax_rate
-
-        # Calculate the updated inventory information after deleting the incoming item
-        updated_quantity = current_quantity - selected_entry_quantity
-        updated_total_cost_before_tax = current_total_cost_before_tax - \
-            selected_entry_total_cost_before_tax
-        updated_total_cost_after_tax = current_total_cost_after_tax - \
-            selected_entry_total_cost_after_tax
-        updated_average_price_before_tax = updated_total_cost_before_tax / updated_quantity
-        updated_average_price_after_tax = updated_total_cost_after_tax / updated_quantity
-
-        # Update the inventory table with the new information
-        cursor.execute('''
-            UPDATE inventory
-            SET total_quantity = ?,
-                average_price_before_tax = ?,
-                average_price_after_tax = ?
-            WHERE store = ? AND item_no = ? AND item_name = ?
-        ''', (updated_quantity, updated_average_price_before_tax if updated_quantity != 0 else 0, updated_average_price_after_tax if updated_quantity != 0 else 0, store, item_no, item_name))
-        conn.commit()
-
-    def display_incoming_items(self):
-        def delete_selected_incoming_items_entry():
-            # Get the selected item's values
-            selected_item = tree_incoming_items.selection()
-            if not selected_item:
-                messagebox.showwarning(
-                    "No Selection", "Please select an entry to delete.")
-                return
-
-            selected_item_values = tree_incoming_items.item(
-                selected_item, 'values')
-            entry_date, store, item_no, item_name, quantity, unit_price, tax_rate = selected_item_values
-
-            # Get the inventory details for this item item's values
-            cursor.execute('''
-                SELECT total_quantity, average_price_before_tax, average_price_after_tax
-                FROM inventory
-                WHERE store = ? AND item_no = ? AND item_name = ?
-            ''', (store, item_no, item_name))
-
-            inventory_info = cursor.fetchone()
-            if inventory_info:
-                current_quantity = int(inventory_info[0])
-                if current_quantity < int(quantity):
-                    messagebox.showinfo(
-                        "Error", f"Selected entry cannot be deleted because some of them are already shipped. Remaining quantity in the inventory is {current_quantity}.")
-
-                else:
-                    # Delete the selected entry from the incoming_items table
-                    cursor.execute(f'''
-                        DELETE FROM incoming_items
-                        WHERE entry_date = ? AND store = ? AND item_no = ? AND item_name = ? AND quantity=? AND price =? AND tax_rate =?
-                    ''', (entry_date, store, item_no, item_name, quantity, unit_price, tax_rate))
-
-                    conn.commit()
-
-                    # Update the inventory table / DELETE or UPDATE
-                    if current_quantity == int(quantity):
-                        # Delete the selected item from the inventory
-                        cursor.execute('''
-                            DELETE FROM inventory
-                            WHERE store = ? AND item_no = ? AND item_name = ?
-                        ''', (store, item_no, item_name))
-                        conn.commit()
-                    else:
-                        # Update the selected item in the inventory
-                        tax_rate = float(tax_rate) / 100.0
-                        self.update_inventory_delete_incoming_entry(
-                            inventory_info, store, item_no, item_name, quantity, unit_price, tax_rate)
-
-                    # Refresh the display
-                    self.display_incoming_items()
-                    self.display_inventory()
-
-                    messagebox.showinfo(
-                        "Success", "Selected entry deleted successfully.")
-            else:
-                messagebox.showinfo(
-                    "Error", "Selected item is not in the inventory.")
-
-        # Close existing window
-        if self.incoming_items_window:
-            self.incoming_items_window.destroy()
-
-        # Create a new window for displaying incoming items
-        self.incoming_items_window = tk.Toplevel(self.root)
-        self.incoming_items_window.title("Incoming Items")
-
-        # Set the size of the window based on the screen dimensions
-        screen_width = self.incoming_items_window.winfo_screenwidth()
-        screen_height = self.incoming_items_window.winfo_screenheight()
-        window_width = int(screen_width * 0.9)
-        window_height = int(screen_height * 0.9)
-        window_x = int((screen_width - window_width) / 2)
-        window_y = int((screen_height - window_height) / 2)
-
-        self.incoming_items_window.geometry(
-            f"{window_width}x{window_height}+{window_x}+{window_y}")
-
-        tree_incoming_items = ttk.Treeview(self.incoming_items_window, columns=(
-            "Date", "Store", "Item No", "Item Name", "Quantity", "Unit Price", "Tax Rate"))
-
-        # Set column widths
-        tree_incoming_items.column("#0", width=20, anchor="w")  # #
-        tree_incoming_items.column("#1", width=130, anchor="w")  # Date
-        tree_incoming_items.column("#2", width=130, anchor="w")  # Store
-        tree_incoming_items.column("#3", width=130, anchor="w")  # Item No
-        tree_incoming_items.column("#4", width=130, anchor="w")  # Item Name
-        # Quantity (right-justified with commas)
-        tree_incoming_items.column("#5", width=130, anchor="e")
-        tree_incoming_items.column("#6", width=130, anchor="e")  # Unit Price
-        tree_incoming_items.column("#7", width=130, anchor="e")  # Tax Rate
-
-        tree_incoming_items.heading("#0", text="#")
-        tree_incoming_items.heading("#1", text="Date")
-        tree_incoming_items.heading("#2", text="Store")
-        tree_incoming_items.heading("#3", text="Item No")
-        tree_incoming_items.heading("#4", text="Item Name")
-        tree_incoming_items.heading("#5", text="Quantity")
-        tree_incoming_items.heading("#6", text="Unit Price")
-        tree_incoming_items.heading("#7", text="Tax Rate")
-
-        tree_incoming_items.grid(row=0, column=0, padx=10, pady=10)
-
-        # Add a button to delete the selected entry
-        btn_delete_entry = tk.Button(
-            self.incoming_items_window, text="Delete Selected Entry", command=delete_selected_incoming_items_entry)
-        btn_delete_entry.grid(row=1, column=0, padx=10, pady=10)
-
-        # Display incoming items
-        cursor.execute('''
-            SELECT entry_date, store, item_no, item_name, quantity, price, tax_rate FROM incoming_items
-        ''')
-
-        result = cursor.fetchall()
-        for index, row in enumerate(result):
-            tree_incoming_items.insert("", "end", values=row)
-
-    def update_inventory_delete_outgoing_entry(self, inventory_info, store, item_no, item_name, quantity, unit_price, tax_rate):
-        new_quantity = str(-1 * int(quantity))
-        self.update_inventory_delete_incoming_entry(
-            inventory_info, store, item_no, item_name, new_quantity, unit_price, tax_rate)
-
-    def display_outgoing_shipments(self):
-        def delete_selected_outgoing_shipment_entry():
-            # Get the selected item's values
-            selected_item = tree_outgoing_shipments.selection()
-            if not selected_item:
-                messagebox.showwarning(
-                    "No Selection", "Please select an entry to delete.")
-                return
-
-            selected_item_values = tree_outgoing_shipments.item(
-                selected_item, 'values')
-            entry_date, destination, store, item_no, item_name, quantity, avg_price_before_tax, avg_price_after_tax = selected_item_values
-
-            # Get the inventory details for this item item's values
-            cursor.execute('''
-                SELECT total_quantity, average_price_before_tax, average_price_after_tax
-                FROM inventory
-                WHERE store = ? AND item_no = ? AND item_name = ?
-            ''', (store, item_no, item_name))
-
-            inventory_info = cursor.fetchone()
-            if inventory_info:
-                # Update the selected item in the inventory
-                tax_rate = float(avg_price_after_tax) / \
-                    float(avg_price_before_tax) - 1.0
-                self.update_inventory_delete_outgoing_entry(
-                    inventory_info, store, item_no, item_name, quantity, avg_price_before_tax, tax_rate)
-            else:
-                # Insert new item
-                cursor.execute('''
-                    INSERT INTO inventory (store, item_no, item_name, total_quantity, average_price_before_tax, average_price_after_tax)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (store, item_no, item_name, quantity, avg_price_before_tax if quantity != 0 else 0, avg_price_after_tax if quantity != 0 else 0))
-                conn.commit()
-
-            # Delete the selected entry from the incoming_items table
-            cursor.execute(f'''
-                DELETE FROM outgoing_shipments
-                WHERE entry_date = ? AND store = ? AND item_no = ? AND item_name = ? AND quantity=? AND average_price_at_shipment =? AND average_price_at_shipment_after_tax =? AND shipping_to=?
-            ''', (entry_date, store, item_no, item_name, quantity, avg_price_before_tax, avg_price_after_tax, destination))
-
-            conn.commit()
-
-            # Refresh the display
-            self.display_outgoing_shipments()
-            self.display_inventory()
-
-            messagebox.showinfo(
-                "Success", "Selected entry deleted successfully.")
-
-        # Close existing window
-        if self.outgoing_shipments_window:
-            self.outgoing_shipments_window.destroy()
-
-        # Create a new window for displaying outgoing shipments
-        self.outgoing_shipments_window = tk.Toplevel(self.root)
-        self.outgoing_shipments_window.title("Outgoing Shipments")
-
-        # Set the size of the window based on the screen dimensions
-        screen_width = self.outgoing_shipments_window.winfo_screenwidth()
-        screen_height = self.outgoing_shipments_window.winfo_screenheight()
-        window_width = int(screen_width * 0.9)
-        window_height = int(screen_height * 0.9)
-        window_x = int((screen_width - window_width) / 2)
-        window_y = int((screen_height - window_height) / 2)
-
-        self.outgoing_shipments_window.geometry(
-            f"{window_width}x{window_height}+{window_x}+{window_y}")
-
-        # Prepare outgoing shipment values
-        tree_outgoing_shipments = ttk.Treeview(self.outgoing_shipments_window, columns=(
-            "Date", "Shipping Destination", "Store", "Item No", "Item Name", "Quantity", "Average Price at Shipment", "Average Price at Shipment After Tax"))
-
-        tree_outgoing_shipments.column("#0", width=20, anchor="w")
-        tree_outgoing_shipments.column("#1", width=130, anchor="w")
-        tree_outgoing_shipments.column("#2", width=130, anchor="w")
-        tree_outgoing_shipments.column("#3", width=130, anchor="w")
-        tree_outgoing_shipments.column("#4", width=130, anchor="w")
-        tree_outgoing_shipments.column("#5", width=130, anchor="w")
-        tree_outgoing_shipments.column("#6", width=130, anchor="e")
-        tree_outgoing_shipments.column("#7", width=130, anchor="e")
-        tree_outgoing_shipments.column("#8", width=130, anchor="e")
-
-        tree_outgoing_shipments.heading("#0", text="#")
-        tree_outgoing_shipments.heading("#1", text="Date")
-        tree_outgoing_shipments.heading("#2", text="Shipping Destination")
-        tree_outgoing_shipments.heading("#3", text="Store")
-        tree_outgoing_shipments.heading("#4", text="Item No")
-        tree_outgoing_shipments.heading("#5", text="Item Name")
-        tree_outgoing_shipments.heading("#6", text="Quantity")
-        tree_outgoing_shipments.heading("#7", text="Average Price at Shipment")
-        tree_outgoing_shipments.heading(
-            "#8", text="Average Price at Shipment After Tax")
-
-        tree_outgoing_shipments.grid(row=0, column=0, padx=10, pady=10)
-
-        # Add a button to delete the selected entry
-        btn_delete_entry = tk.Button(
-            self.outgoing_shipments_window, text="Delete Selected Shipment Entry", command=delete_selected_outgoing_shipment_entry)
-        btn_delete_entry.grid(row=1, column=0, padx=10, pady=10)
-
-        # Display outgoing shipments
-        cursor.execute('''
-            SELECT os.entry_date, os.shipping_to, os.store, os.item_no, os.item_name, os.quantity, os.average_price_at_shipment, os.average_price_at_shipment_after_tax
-            FROM outgoing_shipments os
-            ''')
-        result = cursor.fetchall()
-        for row in result:
-            tree_outgoing_shipments.insert("", "end", values=row)
-
-    def display_expense_details(self):
-        def delete_selected_expense_entry():
-            pass
-
-        # Close existing window
-        if self.new_expense_window:
-            self.new_expense_window.destroy()
-
-        # Create a new window for displaying expense details
-        self.new_expense_window = tk.Toplevel(self.root)
-        self.new_expense_window.title("Expense Details")
-
-        # Set the size of the window based on the screen dimensions
-        screen_width = self.new_expense_window.winfo_screenwidth()
-        screen_height = self.new_expense_window.winfo_screenheight()
-        window_width = int(screen_width * 0.9)
-        window_height = int(screen_height * 0.9)
-        window_x = int((screen_width - window_width) / 2)
-        window_y = int((screen_height - window_height) / 2)
-
-        self.new_expense_window.geometry(f"{window_width}x{window_height}+{window_x}+{window_y}")
-
-        # Prepare expense entry values
-        tree_expense_details = ttk.Treeview(self.new_expense_window, height=25, columns=(
-            "Date", "Store", "Item Name", "Quantity", "Unite Price", "Tax Rate"))
-
-        tree_expense_details.column("#0", width=40, anchor="w", stretch=tk.YES)
-        tree_expense_details.column("#1", width=130, anchor="w", stretch=tk.YES)
-        tree_expense_details.column("#2", width=130, anchor="w", stretch=tk.YES)
-        tree_expense_details.column("#3", width=130, anchor="w", stretch=tk.YES)
-        tree_expense_details.column("#4", width=130, anchor="w", stretch=tk.YES)
-        tree_expense_details.column("#5", width=130, anchor="w", stretch=tk.YES)
-        tree_expense_details.column("#6", width=130, anchor="e", stretch=tk.YES)
-
-        tree_expense_details.heading("#0", text="#")
-        tree_expense_details.heading("#1", text="Date")
-        tree_expense_details.heading("#2", text="Store")
-        tree_expense_details.heading("#3", text="Item Name")
-        tree_expense_details.heading("#4", text="Quantity")
-        tree_expense_details.heading("#5", text="Unite Price")
-        tree_expense_details.heading("#6", text="Tax Rate")
-        tree_expense_details.pack(fill=tk.Y)
-
-        tree_expense_details.grid(row=0, column=0, padx=10, pady=10)
-        
-
-        # Add a button to delete the selected entry
-        btn_delete_entry = tk.Button(
-            self.new_expense_window, text="Delete Selected Expense Entry", command=delete_selected_expense_entry)
-        btn_delete_entry.grid(row=1, column=0, padx=50, pady=50)
-        
-        
-
-        # Display expense details
-        cursor.execute('''
-            SELECT entry_date, store,  item_name, quantity, price, tax_Rate
-            FROM expense_entries 
-            ''')
-        result = cursor.fetchall()
-        for index, row in enumerate(result):
-            tree_expense_details.insert("", "end", text = str(index), values=row)
-
-    def create_reporting_tab(self):
-        self.reporting_tab = ttk.Frame(self.tabControl)
-        self.tabControl.add(self.reporting_tab, text="Shipment Summary")
-
-        # Dropdown for Shipping Personnel
-        self.shipping_to_var_report = StringVar(self.reporting_tab)
-        self.shipping_to_var_report.set("ALL")  # Default value
-        shipping_to_options_report = [
-            "ALL", "USA FBA", "USA MFN", "CAN FBA", "CAN MFN"]
-        shipping_to_menu_report = tk.OptionMenu(
-            self.reporting_tab, self.shipping_to_var_report, *shipping_to_options_report)
-
-        # Dropdown for Item Details
-        self.item_details_var_report = StringVar(self.reporting_tab)
-        self.item_details_var_report.set("ALL")  # Default value
-        item_details_options_report = ["ALL"] + \
-            self.get_all_store_item_no_item_name()
-
-        item_details_menu_report = tk.OptionMenu(
-            self.reporting_tab, self.item_details_var_report, *item_details_options_report)
-
-        btn_generate_report = tk.Button(
-            self.reporting_tab, text="Generate Report", command=self.generate_report)
-
-        btn_export_to_excel = tk.Button(
-            self.reporting_tab, text="Export Database to Excel", command=self.export_to_excel)
-
-        shipping_to_menu_report.grid(row=0, column=0, padx=10, pady=10)
-        item_details_menu_report.grid(row=0, column=1, padx=10, pady=10)
-        btn_generate_report.grid(row=0, column=3, padx=10, pady=10)
-        btn_export_to_excel.grid(row=1, column=4, padx=10, pady=10)
-
-        # Treeview for displaying the report
-        self.tree_report = ttk.Treeview(self.reporting_tab, columns=(
-            "Store", "Item No", "Item Name", "Total Quantity", "Total Cost", "Total Cost After Tax"))
-        self.tree_report.heading("#0", text="Store")
-        self.tree_report.heading("#1", text="Item No")
-        self.tree_report.heading("#2", text="Item Name")
-        self.tree_report.heading("#3", text="Total Quantity")
-        self.tree_report.heading("#4", text="Total Cost")
-        self.tree_report.heading("#5", text="Total Cost After Tax")
-        self.tree_report.grid(row=1, column=0, columnspan=4, padx=10, pady=10)
-
-    def generate_report(self):
-        # Clear previous data
-        for row in self.tree_report.get_children():
-            self.tree_report.delete(row)
-
-        shipping_to = self.clean_input(self.shipping_to_var_report.get())
-        item_details = self.item_details_var_report.get()
-
-        # Modify the SQL query based on user selections
-        query_params = []
-        where_conditions = []
-
-        if shipping_to != "ALL":
-            where_conditions.append("os.shipping_to = ?")
-            query_params.append(shipping_to)
-
-        if item_details != "ALL":
-            where_conditions.append(
-                "os.store = ? AND os.item_no = ? AND os.item_name = ?")
-            query_params.extend(list(eval(item_details)))
-
-        where_clause = " AND ".join(
-            where_conditions) if where_conditions else ""
-
-        query = f'''
-            SELECT os.store, os.item_no, os.item_name, SUM(os.quantity) as total_quantity, SUM(os.quantity * os.average_price_at_shipment) as total_cost, SUM(os.quantity * os.average_price_at_shipment_after_tax) as total_cost_after_tax 
-            FROM outgoing_shipments os
-            {"WHERE " + where_clause if where_clause else ""}
-            GROUP BY os.store, os.item_no, os.item_name
-        '''
-
-        cursor.execute(query, query_params)
-        result = cursor.fetchall()
-
-        for row in result:
-            self.tree_report.insert("", "end", values=row)
-
-    def get_all_store_item_no_item_name(self):
-        cursor.execute(
-            'SELECT DISTINCT store, item_no, item_name FROM inventory')
-        inventory = [row for row in cursor.fetchall()]
-
-        cursor.execute(
-            'SELECT DISTINCT store, item_no, item_name FROM outgoing_shipments')
-        outgoing_shipments = [row for row in cursor.fetchall()]
-
-        all_triplets = list(set(inventory + outgoing_shipments))
-        return [triplet for triplet in all_triplets if triplet]
-
-    def export_to_excel(self):
-        # Export the data to an Excel file with three sheets
-
-        # Define the file name
-        excel_file = "inventory_data.xlsx"
-
-        # Export incoming_items table
-        incoming_items_df = pd.read_sql_query(
-            'SELECT * FROM incoming_items', conn)
-        incoming_items_df.to_excel(
-            excel_file, sheet_name='incoming_items', index=False)
-
-        # Export outgoing_shipments table
-        outgoing_shipments_df = pd.read_sql_query(
-            'SELECT * FROM outgoing_shipments', conn)
-        outgoing_shipments_df.to_excel(
-            excel_file, sheet_name='outgoing_shipments', index=False)
-
-        # Export inventory table
-        inventory_df = pd.read_sql_query(
-            'SELECT * FROM inventory', conn)
-        inventory_df.to_excel(excel_file, sheet_name='inventory', index=False)
-
-        # Display success message
-        messagebox.showinfo(
-            "Success", "Data exported to Excel file successfully!")
-
-
-if __name__ == "__main__":
-    root = tk.Tk()
-    app = InventoryApp(root)
-    root.mainloop()
-
-# Close the database connection
-conn.close()
+import time
+
+# Taken before anything else is imported, so --measure-startup can account for import time
+STARTUP_STARTED = time.perf_counter()
+
+import argparse
+import sys
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog, StringVar
+from datetime import datetime
+
+from catalog import SkuCatalog
+from db import DEFAULT_DB_PATH, connect
+from engine import (InventoryEngine, InventoryError, InsufficientQuantityError, ConcurrentUpdateError, ItemNotFoundError, IncomingItem, OutgoingShipment, ExpenseEntry,
+                    SHIPPING_TO_OPTIONS, calculate_after_tax_price, clean_input, parse_date_range, parse_entry_date)
+from instrumentation import timed
+from paged_tree import PagedTreeview
+
+# analytics, exporter and importer are imported by the tabs and commands that use them, workers and the
+# profiler helpers where they are set up, so startup only loads what the first tab needs
+
+EXPORT_FORMAT_OPTIONS = {"Excel": "xlsx", "CSV (gzip)": "csv.gz", "Parquet": "parquet"}
+
+# The analytics tab lists this many items, the ones with the fewest days of cover
+ANALYTICS_DISPLAY_ROWS = 1000
+
+# Cold start to first paint should stay under this, checked with --measure-startup
+STARTUP_TARGET_MS = 500
+
+
+class StartupTimer:
+
+    def __init__(self, started):
+        self.started = started
+        self.last = started
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, (now - self.last) * 1000))
+        self.last = now
+
+    def report(self, first_paint_phase, target_ms):
+        # Print each phase and whether the time up to first paint is within the target
+        first_paint_ms = 0.0
+        painted = False
+        for phase, elapsed_ms in self.phases:
+            print(f"{phase:<32}{elapsed_ms:>10.1f} ms")
+            if not painted:
+                first_paint_ms += elapsed_ms
+            painted = painted or phase == first_paint_phase
+        print(f"{'cold start to first paint':<32}{first_paint_ms:>10.1f} ms (target {target_ms} ms)")
+        print(f"{'total':<32}{(self.last - self.started) * 1000:>10.1f} ms")
+        return first_paint_ms <= target_ms
+
+
+class InventoryApp:
+
+    def __init__(self, root, engine, workers):
+        self.root = root
+        self.engine = engine
+        # Reports, summaries, detail pages and exports run on the worker pool, postings stay on self.engine
+        self.workers = workers
+        self.jobs = {}  # key -> Job still running
+        self.sku_catalog = SkuCatalog(engine)
+        self.root.title("Inventory Management App")
+
+        self.tabControl = ttk.Notebook(root)
+        self.incoming_tab = ttk.Frame(self.tabControl)
+        self.outgoing_tab = ttk.Frame(self.tabControl)
+        self.new_expense_tab = ttk.Frame(self.tabControl)
+        self.inventory_tab = ttk.Frame(self.tabControl)
+        self.reporting_tab = ttk.Frame(self.tabControl)
+        self.expense_summary_tab = ttk.Frame(self.tabControl)
+        self.analytics_tab = ttk.Frame(self.tabControl)
+        self.diagnostics_tab = ttk.Frame(self.tabControl)
+
+        self.tabControl.add(self.incoming_tab, text="Incoming Items")
+        self.tabControl.add(self.outgoing_tab, text="Outgoing Shipments")
+        self.tabControl.add(self.new_expense_tab, text="Expense Entry")
+        self.tabControl.add(self.inventory_tab, text="Inventory Summary")
+        self.tabControl.add(self.reporting_tab, text="Shipment Summary")
+        self.tabControl.add(self.expense_summary_tab, text="Expense Summary")
+        self.tabControl.add(self.analytics_tab, text="Analytics")
+        self.tabControl.add(self.diagnostics_tab, text="Diagnostics")
+        self.tabControl.pack(expand=1, fill="both")
+
+        # Status bar for the jobs running on the worker pool
+        status_bar = ttk.Frame(root)
+        self.job_status_var = StringVar(status_bar)
+        self.job_progress = ttk.Progressbar(status_bar, mode="indeterminate", length=200)
+        self.btn_cancel_jobs = tk.Button(status_bar, text="Cancel", command=self.cancel_jobs, state="disabled")
+        tk.Label(status_bar, textvariable=self.job_status_var).pack(side="left", padx=10)
+        self.btn_cancel_jobs.pack(side="right", padx=10, pady=5)
+        self.job_progress.pack(side="right", padx=10)
+        status_bar.pack(fill="x")
+
+        self.incoming_items_window = None
+        # Inventory Treeview rows by (store, item_no, item_name), None until the first full load
+        self.inventory_row_index = None
+        self.new_expense_window = None
+        self.outgoing_shipments_window = None
+
+        # Tab contents are only built the first time a tab is selected
+        self.tab_builders = {
+            str(self.incoming_tab): self.create_incoming_tab,
+            str(self.outgoing_tab): self.create_outgoing_tab,
+            str(self.new_expense_tab): self.create_new_expense_tab,
+            str(self.inventory_tab): self.create_inventory_tab,
+            str(self.reporting_tab): self.create_reporting_tab,
+            str(self.expense_summary_tab): self.create_expense_summary_tab,
+            str(self.analytics_tab): self.create_analytics_tab,
+            str(self.diagnostics_tab): self.create_diagnostics_tab,
+        }
+        self.tabControl.bind("<<NotebookTabChanged>>", lambda event: self.build_tab(self.tabControl.select()))
+
+        # Incoming Items Tab is shown first
+        self.build_tab(self.incoming_tab)
+
+    def build_tab(self, tab):
+        builder = self.tab_builders.pop(str(tab), None)
+        if builder:
+            builder()
+
+    # ---- Background jobs ----
+
+    def run_job(self, key, name, function, on_done, *args, writable=False):
+        # Run function(engine, job, *args) on the worker pool and on_done(result) on the Tk thread.
+        # Starting a job under a key cancels the one still running under it.
+        previous = self.jobs.pop(key, None)
+        if previous:
+            previous.cancel()
+        job = self.workers.submit(
+            name, function, *args, writable=writable,
+            on_done=lambda result: self.finish_job(key, job, on_done, result),
+            on_error=lambda error: self.fail_job(key, job, error),
+            on_progress=lambda done, total: self.show_job_progress(job, done, total))
+        self.jobs[key] = job
+        self.update_job_status()
+        return job
+
+    def finish_job(self, key, job, on_done, result):
+        if self.jobs.get(key) is job:
+            del self.jobs[key]
+        self.update_job_status()
+        on_done(result)
+
+    def fail_job(self, key, job, error):
+        if self.jobs.get(key) is job:
+            del self.jobs[key]
+        self.update_job_status()
+        messagebox.showerror("Error", f"{job.name} failed.\n\n{error}")
+
+    def cancel_jobs(self):
+        for job in self.jobs.values():
+            job.cancel()
+        self.jobs.clear()
+        self.update_job_status()
+
+    def update_job_status(self):
+        if not self.jobs:
+            self.job_progress.stop()
+            self.job_progress.configure(mode="indeterminate", value=0)
+            self.job_status_var.set("")
+            self.btn_cancel_jobs.configure(state="disabled")
+            return
+        self.job_status_var.set(", ".join(job.name for job in self.jobs.values()) + "...")
+        self.btn_cancel_jobs.configure(state="normal")
+        if str(self.job_progress.cget("mode")) == "indeterminate":
+            self.job_progress.start(20)
+
+    def show_job_progress(self, job, done, total):
+        # Jobs that know their total switch the bar from indeterminate to a filling bar
+        if total:
+            self.job_progress.stop()
+            self.job_progress.configure(mode="determinate", maximum=total, value=done)
+            self.job_status_var.set(f"{job.name}: {done:,} of {total:,} rows...")
+        else:
+            self.job_status_var.set(f"{job.name}: {done:,} rows...")
+
+    def is_tab_built(self, tab):
+        return str(tab) not in self.tab_builders
+
+    def calculate_after_tax_price(self, price_before_tax, tax_rate):
+        return calculate_after_tax_price(price_before_tax, tax_rate)
+
+    def clean_input(self, text):
+        return clean_input(text)
+
+    def validate_input(self, *entries):
+        for entry in entries:
+            if not entry.get():
+                messagebox.showwarning(
+                    "Missing Information", "Please fill in all fields.")
+                return False
+        return True
+
+    def create_incoming_tab(self):
+        # Store
+        label_store = tk.Label(self.incoming_tab, text="Store:")
+        self.entry_store = tk.Entry(self.incoming_tab)
+        label_store.grid(row=0, column=0, padx=10, pady=10)
+        self.entry_store.grid(row=0, column=1, padx=10, pady=10)
+
+        # Item no
+        label_item_no = tk.Label(self.incoming_tab, text="Item No:")
+        self.entry_item_no = tk.Entry(self.incoming_tab)
+        label_item_no.grid(row=1, column=0, padx=10, pady=10)
+        self.entry_item_no.grid(row=1, column=1, padx=10, pady=10)
+
+        # Item name
+        label_item_name = tk.Label(self.incoming_tab, text="Item Name:")
+        self.entry_item_name = tk.Entry(self.incoming_tab)
+        label_item_name.grid(row=2, column=0, padx=10, pady=10)
+        self.entry_item_name.grid(row=2, column=1, padx=10, pady=10)
+
+        # Quantity
+        label_quantity = tk.Label(self.incoming_tab, text="Quantity:")
+        self.entry_quantity = tk.Entry(self.incoming_tab)
+        label_quantity.grid(row=3, column=0, padx=10, pady=10)
+        self.entry_quantity.grid(row=3, column=1, padx=10, pady=10)
+
+        # Price
+        label_price = tk.Label(self.incoming_tab, text="Price:")
+        self.entry_price = tk.Entry(self.incoming_tab)
+        label_price.grid(row=4, column=0, padx=10, pady=10)
+        self.entry_price.grid(row=4, column=1, padx=10, pady=10)
+
+        # Tax rate
+        label_tax_rate = tk.Label(self.incoming_tab, text="Tax Rate (%):")
+        self.entry_tax_rate = tk.Entry(self.incoming_tab)
+        label_tax_rate.grid(row=5, column=0, padx=10, pady=10)
+        self.entry_tax_rate.grid(row=5, column=1, padx=10, pady=10)
+
+        # Entry Date
+        label_entry_date = tk.Label(
+            self.incoming_tab, text="Entry Date:")
+        self.entry_date = tk.Entry(self.incoming_tab)
+        label_entry_date.grid(row=6, column=0, padx=10, pady=10)
+        self.entry_date.grid(row=6, column=1, padx=10, pady=10)
+
+        # Set today's date as the default value
+        self.entry_date.insert(
+            0, datetime.now().strftime("%m/%d/%Y"))
+
+        btn_enter_incoming = tk.Button(
+            self.incoming_tab, text="Enter Incoming Item", command=self.enter_incoming_item)
+        btn_enter_incoming.grid(row=7, column=0, columnspan=2, pady=10)
+
+        btn_display_incoming = tk.Button(
+            self.incoming_tab, text="Display Incoming Items", command=self.display_incoming_items)
+        btn_display_incoming.grid(row=8, column=0, columnspan=2, pady=10)
+
+        btn_import_incoming = tk.Button(
+            self.incoming_tab, text="Import Incoming Items from File", command=lambda: self.import_from_file("incoming"))
+        btn_import_incoming.grid(row=9, column=0, columnspan=2, pady=10)
+
+    def create_outgoing_tab(self):
+        # Store
+        label_store = tk.Label(self.outgoing_tab, text="Store:")
+        self.entry_store_outgoing = tk.Entry(self.outgoing_tab)
+        label_store.grid(row=0, column=0, padx=10, pady=10)
+        self.entry_store_outgoing.grid(row=0, column=1, padx=10, pady=10)
+
+        # Item no
+        label_item_no = tk.Label(self.outgoing_tab, text="Item No:")
+        self.entry_item_no_outgoing = tk.Entry(self.outgoing_tab)
+        label_item_no.grid(row=1, column=0, padx=10, pady=10)
+        self.entry_item_no_outgoing.grid(row=1, column=1, padx=10, pady=10)
+
+        # Item name
+        label_item_name = tk.Label(self.outgoing_tab, text="Item Name:")
+        self.entry_item_name_outgoing = tk.Entry(self.outgoing_tab)
+        label_item_name.grid(row=2, column=0, padx=10, pady=10)
+        self.entry_item_name_outgoing.grid(row=2, column=1, padx=10, pady=10)
+
+        # Quantity
+        label_quantity = tk.Label(self.outgoing_tab, text="Quantity:")
+        self.entry_quantity_outgoing = tk.Entry(self.outgoing_tab)
+        label_quantity.grid(row=3, column=0, padx=10, pady=10)
+        self.entry_quantity_outgoing.grid(row=3, column=1, padx=10, pady=10)
+
+        # Shipping to (dropdown menu)
+        label_shipping_to = tk.Label(
+            self.outgoing_tab, text="Shipping To:")
+        self.shipping_to_var = tk.StringVar(self.outgoing_tab)
+        self.shipping_to_var.set("USA FBA")  # Default value
+        shipping_to_options = SHIPPING_TO_OPTIONS
+        shipping_to_menu = tk.OptionMenu(
+            self.outgoing_tab, self.shipping_to_var, *shipping_to_options)
+
+        label_shipping_to.grid(row=4, column=0, padx=10, pady=10)
+        shipping_to_menu.grid(row=4, column=1, padx=10, pady=10)
+
+        # Entry Date
+        label_entry_date_outgoing = tk.Label(
+            self.outgoing_tab, text="Entry Date:")
+        self.entry_date_outgoing = tk.Entry(self.outgoing_tab)
+        label_entry_date_outgoing.grid(row=5, column=0, padx=10, pady=10)
+        self.entry_date_outgoing.grid(row=5, column=1, padx=10, pady=10)
+
+        # Set today's date as the default value
+        self.entry_date_outgoing.insert(
+            0, datetime.now().strftime("%m/%d/%Y"))
+
+        # Enter Outgoing Shipment button
+        btn_enter_outgoing = tk.Button(
+            self.outgoing_tab, text="Enter Outgoing Shipment", command=self.enter_outgoing_shipment)
+        btn_enter_outgoing.grid(row=6, column=0, columnspan=2, pady=10)
+
+        # Display Outgoing Shipments button
+        btn_display_outgoing = tk.Button(
+            self.outgoing_tab, text="Display Outgoing Shipments", command=self.display_outgoing_shipments)
+        btn_display_outgoing.grid(row=7, column=0, columnspan=2, pady=10)
+
+        # Import Outgoing Shipments button
+        btn_import_outgoing = tk.Button(
+            self.outgoing_tab, text="Import Outgoing Shipments from File", command=lambda: self.import_from_file("outgoing"))
+        btn_import_outgoing.grid(row=8, column=0, columnspan=2, pady=10)
+
+    def create_new_expense_tab(self):
+        # Store
+        label_store = tk.Label(self.new_expense_tab, text="Store:")
+        self.entry_store_new_expense = tk.Entry(self.new_expense_tab)
+        label_store.grid(row=0, column=0, padx=10, pady=10)
+        self.entry_store_new_expense.grid(row=0, column=1, padx=10, pady=10)
+
+        # Item name
+        label_item_name = tk.Label(self.new_expense_tab, text="Item Name:")
+        self.entry_item_name_new_expense = tk.Entry(self.new_expense_tab)
+        label_item_name.grid(row=1, column=0, padx=10, pady=10)
+        self.entry_item_name_new_expense.grid(
+            row=1, column=1, padx=10, pady=10)
+
+        # Quantity
+        label_quantity = tk.Label(self.new_expense_tab, text="Quantity:")
+        self.entry_quantity_new_expense = tk.Entry(self.new_expense_tab)
+        label_quantity.grid(row=2, column=0, padx=10, pady=10)
+        self.entry_quantity_new_expense.grid(row=2, column=1, padx=10, pady=10)
+
+        # Price
+        label_price = tk.Label(self.new_expense_tab, text="Price:")
+        self.entry_price_new_expense = tk.Entry(self.new_expense_tab)
+        label_price.grid(row=3, column=0, padx=10, pady=10)
+        self.entry_price_new_expense.grid(row=3, column=1, padx=10, pady=10)
+
+        # Tax rate
+        label_tax_rate = tk.Label(self.new_expense_tab, text="Tax Rate (%):")
+        self.entry_tax_rate_new_expense = tk.Entry(self.new_expense_tab)
+        label_tax_rate.grid(row=4, column=0, padx=10, pady=10)
+        self.entry_tax_rate_new_expense.grid(row=4, column=1, padx=10, pady=10)
+
+        # Entry Date
+        label_entry_date_new_expense = tk.Label(
+            self.new_expense_tab, text="Entry Date:")
+        self.entry_date_new_expense = tk.Entry(self.new_expense_tab)
+        label_entry_date_new_expense.grid(row=5, column=0, padx=10, pady=10)
+        self.entry_date_new_expense.grid(row=5, column=1, padx=10, pady=10)
+
+        # Set today's date as the default value
+        self.entry_date_new_expense.insert(
+            0, datetime.now().strftime("%m/%d/%Y"))
+
+        # Enter New Expense button
+        btn_enter_new_expense = tk.Button(
+            self.new_expense_tab, text="Enter New Expense", command=self.enter_new_expense)
+        btn_enter_new_expense.grid(row=6, column=0, columnspan=2, pady=10)
+
+        # Display Expenses button
+        btn_display_new_expense = tk.Button(
+            self.new_expense_tab, text="Display Expense Details", command=self.display_expense_details)
+        btn_display_new_expense.grid(row=7, column=0, columnspan=2, pady=10)
+
+        # Import Expenses button
+        btn_import_new_expense = tk.Button(
+            self.new_expense_tab, text="Import Expenses from File", command=lambda: self.import_from_file("expense"))
+        btn_import_new_expense.grid(row=8, column=0, columnspan=2, pady=10)
+
+    def create_inventory_tab(self):
+        self.tree_inventory = ttk.Treeview(self.inventory_tab, columns=(
+            "Store", "Item No", "Item Name", "Total Quantity", "Average Price", "Average Price After Tax"))
+
+        self.tree_inventory.column("#0", width=30, anchor="w")
+        self.tree_inventory.column("#1", width=130, anchor="w")
+        self.tree_inventory.column("#2", width=130, anchor="w")
+        self.tree_inventory.column("#3", width=130, anchor="w")
+        self.tree_inventory.column("#4", width=130, anchor="e")
+        self.tree_inventory.column("#5", width=130, anchor="e")
+        self.tree_inventory.column("#6", width=130, anchor="e")
+
+        self.tree_inventory.heading("#0", text="#")
+        self.tree_inventory.heading("#1", text="Store")
+        self.tree_inventory.heading("#2", text="Item No")
+        self.tree_inventory.heading("#3", text="Item Name")
+        self.tree_inventory.heading("#4", text="Total Quantity")
+        self.tree_inventory.heading("#5", text="Average Price")
+        self.tree_inventory.heading("#6", text="Average Price After Tax")
+
+        self.tree_inventory.grid(row=0, column=0, padx=10, pady=10)
+
+        btn_display_inventory = tk.Button(
+            self.inventory_tab, text="Display Inventory", command=self.display_inventory)
+        btn_display_inventory.grid(row=1, column=0, pady=10)
+
+    def create_expense_summary_tab(self):
+        self.tree_expense_summary_tab = ttk.Treeview(self.expense_summary_tab, columns=(
+            "Store", "Item Name", "Total Quantity",  "Average Price After Tax", "Total Cost"))
+
+        self.tree_expense_summary_tab.column("#0", width=10, anchor="w")
+        self.tree_expense_summary_tab.column("#1", width=150, anchor="w")
+        self.tree_expense_summary_tab.column("#2", width=150, anchor="w")
+        self.tree_expense_summary_tab.column("#3", width=150, anchor="e")
+        self.tree_expense_summary_tab.column("#4", width=150, anchor="e")
+        self.tree_expense_summary_tab.column("#5", width=150, anchor="e")
+
+        self.tree_expense_summary_tab.heading("#0", text="#")
+        self.tree_expense_summary_tab.heading("#1", text="Store")
+        self.tree_expense_summary_tab.heading("#2", text="Item Name")
+        self.tree_expense_summary_tab.heading("#3", text="Total Quantity")
+        self.tree_expense_summary_tab.heading(
+            "#4", text="Average Price After Tax")
+        self.tree_expense_summary_tab.heading("#5", text="Total Cost")
+
+        self.tree_expense_summary_tab.grid(row=0, column=0, padx=10, pady=10)
+
+        btn_display_expense_summary = tk.Button(
+            self.expense_summary_tab, text="Display Expenses", command=self.display_expense_summary)
+        btn_display_expense_summary.grid(row=1, column=0, pady=10)
+
+    def create_analytics_tab(self):
+        # Window and lead time in days, the results are computed on a worker
+        from analytics import DEFAULT_LEAD_TIME_DAYS, DEFAULT_WINDOW_DAYS
+
+        controls_frame = ttk.Frame(self.analytics_tab)
+        self.entry_analytics_window = tk.Entry(controls_frame, width=8)
+        self.entry_analytics_window.insert(0, str(DEFAULT_WINDOW_DAYS))
+        self.entry_analytics_lead_time = tk.Entry(controls_frame, width=8)
+        self.entry_analytics_lead_time.insert(0, str(DEFAULT_LEAD_TIME_DAYS))
+        btn_run_analytics = tk.Button(controls_frame, text="Run Analytics", command=self.run_analytics)
+        self.analytics_status_var = StringVar(controls_frame)
+
+        tk.Label(controls_frame, text="Window (days):").grid(row=0, column=0, padx=5)
+        self.entry_analytics_window.grid(row=0, column=1, padx=5)
+        tk.Label(controls_frame, text="Lead Time (days):").grid(row=0, column=2, padx=5)
+        self.entry_analytics_lead_time.grid(row=0, column=3, padx=5)
+        btn_run_analytics.grid(row=0, column=4, padx=10)
+        tk.Label(controls_frame, textvariable=self.analytics_status_var).grid(row=0, column=5, padx=10)
+        controls_frame.grid(row=0, column=0, columnspan=2, padx=10, pady=10, sticky="w")
+
+        # Items, fewest days of cover first
+        self.tree_analytics_items = ttk.Treeview(self.analytics_tab, columns=(
+            "Store", "Item No", "Item Name", "On Hand", "Shipped", "Per Day", "Days of Cover", "Sell-Through",
+            "Reorder Point", "Suggested Order"), show="headings", height=15)
+        for column in self.tree_analytics_items["columns"]:
+            self.tree_analytics_items.heading(column, text=column)
+            self.tree_analytics_items.column(
+                column, width=130 if column in ("Store", "Item No", "Item Name") else 95,
+                anchor="w" if column in ("Store", "Item No", "Item Name") else "e")
+        scrollbar_analytics_items = ttk.Scrollbar(
+            self.analytics_tab, orient="vertical", command=self.tree_analytics_items.yview)
+        self.tree_analytics_items.configure(yscrollcommand=scrollbar_analytics_items.set)
+        self.tree_analytics_items.grid(row=1, column=0, padx=(10, 0), pady=10, sticky="nsew")
+        scrollbar_analytics_items.grid(row=1, column=1, pady=10, sticky="ns")
+
+        # Sell-through per shipping destination
+        self.tree_analytics_channels = ttk.Treeview(self.analytics_tab, columns=(
+            "Shipping To", "Shipped", "Total Cost", "Share", "Sell-Through"), show="headings", height=5)
+        for column in self.tree_analytics_channels["columns"]:
+            self.tree_analytics_channels.heading(column, text=column)
+            self.tree_analytics_channels.column(column, width=130, anchor="w" if column == "Shipping To" else "e")
+        self.tree_analytics_channels.grid(row=2, column=0, padx=10, pady=10, sticky="w")
+
+    def create_diagnostics_tab(self):
+        # Time per operation recorded since startup or the last reset, most total time first
+        controls_frame = ttk.Frame(self.diagnostics_tab)
+        btn_refresh = tk.Button(controls_frame, text="Refresh", command=self.show_diagnostics)
+        btn_reset = tk.Button(controls_frame, text="Reset", command=self.reset_diagnostics)
+        self.btn_profiling = tk.Button(controls_frame, text="Start Profiling", command=self.toggle_profiling)
+        btn_refresh.grid(row=0, column=0, padx=5)
+        btn_reset.grid(row=0, column=1, padx=5)
+        self.btn_profiling.grid(row=0, column=2, padx=5)
+        controls_frame.grid(row=0, column=0, columnspan=2, padx=10, pady=10, sticky="w")
+
+        self.tree_diagnostics = ttk.Treeview(self.diagnostics_tab, columns=(
+            "Operation", "Count", "Total ms", "p50 ms", "p95 ms", "p99 ms", "Max ms", "Rows"),
+            show="headings", height=15)
+        for column in self.tree_diagnostics["columns"]:
+            self.tree_diagnostics.heading(column, text=column)
+            self.tree_diagnostics.column(
+                column, width=420 if column == "Operation" else 80, anchor="w" if column == "Operation" else "e")
+        scrollbar_diagnostics = ttk.Scrollbar(
+            self.diagnostics_tab, orient="vertical", command=self.tree_diagnostics.yview)
+        self.tree_diagnostics.configure(yscrollcommand=scrollbar_diagnostics.set)
+        self.tree_diagnostics.grid(row=1, column=0, padx=(10, 0), pady=10, sticky="nsew")
+        scrollbar_diagnostics.grid(row=1, column=1, pady=10, sticky="ns")
+
+        # cProfile output of the Tk main thread between Start and Stop Profiling
+        self.text_profile = tk.Text(self.diagnostics_tab, height=12, width=140, wrap="none")
+        self.text_profile.grid(row=2, column=0, columnspan=2, padx=10, pady=10, sticky="nsew")
+        self.show_diagnostics()
+
+    def show_diagnostics(self):
+        from instrumentation import RECORDER
+
+        self.tree_diagnostics.delete(*self.tree_diagnostics.get_children())
+        for operation in RECORDER.report():
+            self.tree_diagnostics.insert("", "end", values=(
+                operation.name, self.format_quantity(operation.count), f"{operation.total * 1000:,.1f}",
+                f"{operation.p50 * 1000:,.2f}", f"{operation.p95 * 1000:,.2f}", f"{operation.p99 * 1000:,.2f}",
+                f"{operation.max * 1000:,.2f}", self.format_quantity(operation.rows)))
+
+    def reset_diagnostics(self):
+        from instrumentation import RECORDER
+
+        RECORDER.reset()
+        self.show_diagnostics()
+
+    def toggle_profiling(self):
+        from instrumentation import is_profiling, start_profiling, stop_profiling
+
+        if is_profiling():
+            self.text_profile.delete("1.0", tk.END)
+            self.text_profile.insert("1.0", stop_profiling())
+            self.btn_profiling.configure(text="Start Profiling")
+            self.show_diagnostics()
+        else:
+            start_profiling()
+            self.btn_profiling.configure(text="Stop Profiling")
+
+    def enter_incoming_item(self):
+        # Validate input
+        if not self.validate_input(self.entry_store, self.entry_item_no, self.entry_item_name, self.entry_quantity, self.entry_price, self.entry_tax_rate):
+            return
+
+        item = IncomingItem(
+            store=self.entry_store.get(),
+            item_no=self.entry_item_no.get(),
+            item_name=self.entry_item_name.get(),
+            quantity=int(self.clean_input(self.entry_quantity.get())),
+            price=float(self.clean_input(self.entry_price.get())),
+            tax_rate=float(self.clean_input(self.entry_tax_rate.get())),
+            # Get the entry date from the entry field or use today's date if not provided
+            entry_date=parse_entry_date(self.entry_date.get()))
+
+        try:
+            self.engine.receive(item)
+        except ConcurrentUpdateError as e:
+            # Other stations kept changing the item through every retry
+            messagebox.showwarning("Busy", f"{e}\n\nPlease try again.")
+            return
+        except InventoryError as e:
+            messagebox.showwarning("Not Entered", str(e))
+            return
+
+        # Refresh inventory display
+        self.refresh_inventory_items(
+            (clean_input(item.store), clean_input(item.item_no), clean_input(item.item_name)))
+
+        # Display success message
+        messagebox.showinfo("Success", "Incoming item entered successfully!")
+
+        # Clear entry fields
+        self.entry_store.delete(0, tk.END)
+        self.entry_item_no.delete(0, tk.END)
+        self.entry_item_name.delete(0, tk.END)
+        self.entry_quantity.delete(0, tk.END)
+        self.entry_price.delete(0, tk.END)
+        self.entry_tax_rate.delete(0, tk.END)
+
+    def enter_new_expense(self):
+        # Validate input
+        if not self.validate_input(self.entry_store_new_expense, self.entry_item_name_new_expense,  self.entry_quantity_new_expense, self.entry_price_new_expense, self.entry_tax_rate_new_expense):
+            return
+
+        entry = ExpenseEntry(
+            store=self.entry_store_new_expense.get(),
+            item_name=self.entry_item_name_new_expense.get(),
+            quantity=int(self.clean_input(self.entry_quantity_new_expense.get())),
+            price=float(self.clean_input(self.entry_price_new_expense.get())),
+            tax_rate=float(self.clean_input(self.entry_tax_rate_new_expense.get())),
+            # Get the entry date from the entry field or use today's date if not provided
+            entry_date=parse_entry_date(self.entry_date_new_expense.get()))
+
+        try:
+            self.engine.add_expense(entry)
+        except ConcurrentUpdateError as e:
+            # Other stations kept changing the item through every retry
+            messagebox.showwarning("Busy", f"{e}\n\nPlease try again.")
+            return
+        except InventoryError as e:
+            messagebox.showwarning("Not Entered", str(e))
+            return
+
+        # Display success message
+        messagebox.showinfo("Success", "New Expense entered successfully!")
+
+        # Clear entry fields
+        self.entry_store_new_expense.delete(0, tk.END)
+        self.entry_item_name_new_expense.delete(0, tk.END)
+        self.entry_quantity_new_expense.delete(0, tk.END)
+        self.entry_price_new_expense.delete(0, tk.END)
+        self.entry_tax_rate_new_expense.delete(0, tk.END)
+
+    def enter_outgoing_shipment(self):
+        # Validate input
+        if not self.validate_input(self.entry_item_no_outgoing, self.entry_quantity_outgoing):
+            return
+
+        shipment = OutgoingShipment(
+            store=self.entry_store_outgoing.get(),
+            item_no=self.entry_item_no_outgoing.get(),
+            item_name=self.entry_item_name_outgoing.get(),
+            quantity=int(self.clean_input(self.entry_quantity_outgoing.get())),
+            shipping_to=self.shipping_to_var.get(),
+            # Get the entry date from the entry field or use today's date if not provided
+            entry_date=parse_entry_date(self.entry_date_outgoing.get()))
+
+        try:
+            self.engine.ship(shipment)
+        except InsufficientQuantityError as e:
+            messagebox.showwarning("Insufficient Quantity", str(e))
+            return
+        except ItemNotFoundError as e:
+            messagebox.showwarning("Item Not Found", str(e))
+            return
+        except ConcurrentUpdateError as e:
+            # Other stations kept changing the item through every retry
+            messagebox.showwarning("Busy", f"{e}\n\nPlease try again.")
+            return
+
+        # Refresh inventory display
+        self.refresh_inventory_items(
+            (clean_input(shipment.store), clean_input(shipment.item_no), clean_input(shipment.item_name)))
+
+        # Display success message
+        messagebox.showinfo(
+            "Success", "Outgoing shipment entered successfully!")
+
+        # Clear entry fields
+        self.entry_store_outgoing.delete(0, tk.END)
+        self.entry_item_no_outgoing.delete(0, tk.END)
+        self.entry_item_name_outgoing.delete(0, tk.END)
+        self.entry_quantity_outgoing.delete(0, tk.END)
+
+    def import_from_file(self, kind):
+        path = filedialog.askopenfilename(
+            title="Import from File", filetypes=[("CSV or Excel files", "*.csv *.xlsx"), ("All files", "*.*")])
+        if not path:
+            return
+
+        from importer import import_file
+
+        # The import posts from a worker's own writable connection, the main connection picks up its
+        # commits through the data version. Keyed by file, so a second import doesn't cancel the first.
+        self.run_job(f"import {path}", "Importing file",
+                     lambda engine, job: import_file(engine, path, kind, progress=job.progress),
+                     self.show_import_result, writable=True)
+
+    def show_import_result(self, result):
+        # Refresh the summaries once for the whole file
+        if result.kind == "expense":
+            self.display_expense_summary()
+        else:
+            self.refresh_inventory_items(*result.keys)
+
+        message = f"Imported {result.imported:,} rows in {result.batches} batches."
+        if result.rejected:
+            first_errors = "\n".join(
+                f"Line {line_no}: {error}" for line_no, error in result.rejected[:10])
+            message += f"\n\nRejected {len(result.rejected):,} rows:\n{first_errors}"
+        messagebox.showinfo("Import Finished", message)
+
+    def display_expense_summary(self):
+        self.build_tab(self.expense_summary_tab)
+        self.run_job("expense_summary", "Loading expenses",
+                     lambda engine, job: engine.expense_summary_rows(), self.show_expense_summary)
+
+    def show_expense_summary(self, result):
+        with timed("ui: expense summary", len(result)):
+            # Clear previous data
+            for row in self.tree_expense_summary_tab.get_children():
+                self.tree_expense_summary_tab.delete(row)
+
+            # Display updated expenses
+            for index, row in enumerate(result):
+                formatted_row = list(row)
+                formatted_row[2] = self.format_quantity(row[2])
+                formatted_row[3] = self.format_price(row[3])
+                formatted_row[4] = self.format_price(row[4])
+                self.tree_expense_summary_tab.insert("", "end", text = str(index), values=formatted_row)
+
+    def display_inventory(self):
+        self.build_tab(self.inventory_tab)
+        # Postings while the inventory loads restart the load, which then includes them
+        self.inventory_row_index = None
+        # The type-ahead is read along with it, to pick up what other stations posted or reversed
+        self.run_job("inventory", "Loading inventory",
+                     lambda engine, job: (engine.inventory_rows(), engine.store_item_triplets()), self.show_inventory)
+
+    def show_inventory(self, result):
+        result, triplets = result
+        self.sku_catalog.load(triplets)
+        with timed("ui: inventory", len(result)):
+            # Clear previous data
+            self.tree_inventory.delete(*self.tree_inventory.get_children())
+            self.inventory_row_index = {}
+
+            # Display updated inventory
+            for index, row in enumerate(result):
+                self.inventory_row_index[tuple(row[:3])] = self.tree_inventory.insert(
+                    "", "end", text = str(index), values=self.format_inventory_row(row))
+
+    def refresh_inventory_items(self, *keys):
+        # Update only the rows of the given (store, item_no, item_name) keys in place,
+        # the whole inventory is loaded once and afterwards only on "Display Inventory"
+        for key in keys:
+            self.sku_catalog.add(key)
+
+        # Nothing is shown until the Inventory Summary tab has been opened
+        if not self.is_tab_built(self.inventory_tab):
+            return
+
+        if self.inventory_row_index is None:
+            self.display_inventory()
+            return
+
+        for key in keys:
+            inventory_info = self.engine.get_inventory_item(*key)
+            iid = self.inventory_row_index.get(key)
+            if inventory_info is None:
+                if iid is not None:
+                    self.tree_inventory.delete(iid)
+                    del self.inventory_row_index[key]
+            elif iid is not None:
+                self.tree_inventory.item(iid, values=self.format_inventory_row(key + tuple(inventory_info)))
+            else:
+                self.inventory_row_index[key] = self.tree_inventory.insert(
+                    "", "end", text=str(len(self.inventory_row_index)), values=self.format_inventory_row(key + tuple(inventory_info)))
+
+    def format_inventory_row(self, row):
+        formatted_row = list(row)
+        formatted_row[3] = self.format_quantity(
+            row[3])  # Format the quantity value
+        formatted_row[4] = self.format_price(
+            row[4])  # Format the Average Price
+        # Format the Average Price After Tax
+        formatted_row[5] = self.format_price(row[5])
+        return formatted_row
+
+    def format_quantity(self, value):
+        return f"{value:,}"
+
+    def format_price(self, value):
+        return "{:0,.2f}".format(value)
+
+    def format_rate(self, value):
+        # nan when nothing was received in the window
+        return "-" if value != value else f"{value:.1%}"
+
+    def display_incoming_items(self):
+        def delete_selected_incoming_items_entry():
+            # Get the selected item's values
+            selected_item = tree_incoming_items.selection_ids()
+            if not selected_item:
+                messagebox.showwarning(
+                    "No Selection", "Please select an entry to delete.")
+                return
+
+            # Rows are keyed by the incoming_items id
+            try:
+                key, listed = self.engine.reverse_incoming(selected_item[0])
+            except InventoryError as e:
+                messagebox.showinfo("Error", str(e))
+                return
+
+            # Refresh the display
+            tree_incoming_items.reload()
+            self.refresh_inventory_items(key)
+            # A reversal can leave an item neither in stock nor ever shipped, the type-ahead then drops it
+            if not listed:
+                self.sku_catalog.remove(key)
+
+            messagebox.showinfo(
+                "Success", "Selected entry deleted successfully.")
+
+        # Close existing window
+        if self.incoming_items_window:
+            self.incoming_items_window.destroy()
+
+        # Create a new window for displaying incoming items
+        self.incoming_items_window = tk.Toplevel(self.root)
+        self.incoming_items_window.title("Incoming Items")
+
+        # Set the size of the window based on the screen dimensions
+        screen_width = self.incoming_items_window.winfo_screenwidth()
+        screen_height = self.incoming_items_window.winfo_screenheight()
+        window_width = int(screen_width * 0.9)
+        window_height = int(screen_height * 0.9)
+        window_x = int((screen_width - window_width) / 2)
+        window_y = int((screen_height - window_height) / 2)
+
+        self.incoming_items_window.geometry(
+            f"{window_width}x{window_height}+{window_x}+{window_y}")
+
+        tree_incoming_items = PagedTreeview(self.incoming_items_window, self.engine, "incoming", [
+            ("entry_date", "Date", 130, "w"),
+            ("store", "Store", 130, "w"),
+            ("item_no", "Item No", 130, "w"),
+            ("item_name", "Item Name", 130, "w"),
+            ("quantity", "Quantity", 130, "e"),
+            ("price", "Unit Price", 130, "e"),
+            ("tax_rate", "Tax Rate", 130, "e"),
+        ], workers=self.workers)
+        tree_incoming_items.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
+        self.incoming_items_window.rowconfigure(0, weight=1)
+        self.incoming_items_window.columnconfigure(0, weight=1)
+
+        # Add a button to delete the selected entry
+        btn_delete_entry = tk.Button(
+            self.incoming_items_window, text="Delete Selected Entry", command=delete_selected_incoming_items_entry)
+        btn_delete_entry.grid(row=1, column=0, padx=10, pady=10)
+
+        # Display the first page of incoming items, the rest is fetched while scrolling
+        tree_incoming_items.reload()
+
+    def display_outgoing_shipments(self):
+        def delete_selected_outgoing_shipment_entry():
+            # Get the selected item's values
+            selected_item = tree_outgoing_shipments.selection_ids()
+            if not selected_item:
+                messagebox.showwarning(
+                    "No Selection", "Please select an entry to delete.")
+                return
+
+            # Rows are keyed by the outgoing_shipments id
+            try:
+                key, listed = self.engine.reverse_shipment(selected_item[0])
+            except InventoryError as e:
+                messagebox.showinfo("Error", str(e))
+                return
+
+            # Refresh the display
+            tree_outgoing_shipments.reload()
+            self.refresh_inventory_items(key)
+            # A reversal can leave an item neither in stock nor ever shipped, the type-ahead then drops it
+            if not listed:
+                self.sku_catalog.remove(key)
+
+            messagebox.showinfo(
+                "Success", "Selected entry deleted successfully.")
+
+        # Close existing window
+        if self.outgoing_shipments_window:
+            self.outgoing_shipments_window.destroy()
+
+        # Create a new window for displaying outgoing shipments
+        self.outgoing_shipments_window = tk.Toplevel(self.root)
+        self.outgoing_shipments_window.title("Outgoing Shipments")
+
+        # Set the size of the window based on the screen dimensions
+        screen_width = self.outgoing_shipments_window.winfo_screenwidth()
+        screen_height = self.outgoing_shipments_window.winfo_screenheight()
+        window_width = int(screen_width * 0.9)
+        window_height = int(screen_height * 0.9)
+        window_x = int((screen_width - window_width) / 2)
+        window_y = int((screen_height - window_height) / 2)
+
+        self.outgoing_shipments_window.geometry(
+            f"{window_width}x{window_height}+{window_x}+{window_y}")
+
+        # Prepare outgoing shipment values
+        tree_outgoing_shipments = PagedTreeview(self.outgoing_shipments_window, self.engine, "outgoing", [
+            ("entry_date", "Date", 130, "w"),
+            ("shipping_to", "Shipping Destination", 130, "w"),
+            ("store", "Store", 130, "w"),
+            ("item_no", "Item No", 130, "w"),
+            ("item_name", "Item Name", 130, "w"),
+            ("quantity", "Quantity", 130, "e"),
+            ("average_price_at_shipment", "Average Price at Shipment", 130, "e"),
+            ("average_price_at_shipment_after_tax", "Average Price at Shipment After Tax", 130, "e"),
+        ], workers=self.workers)
+        tree_outgoing_shipments.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
+        self.outgoing_shipments_window.rowconfigure(0, weight=1)
+        self.outgoing_shipments_window.columnconfigure(0, weight=1)
+
+        # Add a button to delete the selected entry
+        btn_delete_entry = tk.Button(
+            self.outgoing_shipments_window, text="Delete Selected Shipment Entry", command=delete_selected_outgoing_shipment_entry)
+        btn_delete_entry.grid(row=1, column=0, padx=10, pady=10)
+
+        # Display the first page of outgoing shipments, the rest is fetched while scrolling
+        tree_outgoing_shipments.reload()
+
+    def display_expense_details(self):
+        def delete_selected_expense_entry():
+            # Get the selected item's values
+            selected_item = tree_expense_details.selection_ids()
+            if not selected_item:
+                messagebox.showwarning(
+                    "No Selection", "Please select an entry to delete.")
+                return
+
+            # Rows are keyed by the expense_entries id
+            try:
+                self.engine.reverse_expense(selected_item[0])
+            except InventoryError as e:
+                messagebox.showinfo("Error", str(e))
+                return
+
+            # Refresh the display
+            tree_expense_details.reload()
+            self.display_expense_summary()
+
+            messagebox.showinfo(
+                "Success", "Selected entry deleted successfully.")
+
+        # Close existing window
+        if self.new_expense_window:
+            self.new_expense_window.destroy()
+
+        # Create a new window for displaying expense details
+        self.new_expense_window = tk.Toplevel(self.root)
+        self.new_expense_window.title("Expense Details")
+
+        # Set the size of the window based on the screen dimensions
+        screen_width = self.new_expense_window.winfo_screenwidth()
+        screen_height = self.new_expense_window.winfo_screenheight()
+        window_width = int(screen_width * 0.9)
+        window_height = int(screen_height * 0.9)
+        window_x = int((screen_width - window_width) / 2)
+        window_y = int((screen_height - window_height) / 2)
+
+        self.new_expense_window.geometry(f"{window_width}x{window_height}+{window_x}+{window_y}")
+
+        # Prepare expense entry values
+        tree_expense_details = PagedTreeview(self.new_expense_window, self.engine, "expense", [
+            ("entry_date", "Date", 130, "w"),
+            ("store", "Store", 130, "w"),
+            ("item_name", "Item Name", 130, "w"),
+            ("quantity", "Quantity", 130, "w"),
+            ("price", "Unit Price", 130, "w"),
+            ("tax_rate", "Tax Rate", 130, "e"),
+        ], workers=self.workers, height=25)
+        tree_expense_details.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
+        self.new_expense_window.rowconfigure(0, weight=1)
+        self.new_expense_window.columnconfigure(0, weight=1)
+
+        # Add a button to delete the selected entry
+        btn_delete_entry = tk.Button(
+            self.new_expense_window, text="Delete Selected Expense Entry", command=delete_selected_expense_entry)
+        btn_delete_entry.grid(row=1, column=0, padx=50, pady=50)
+
+        # Display the first page of expense details, the rest is fetched while scrolling
+        tree_expense_details.reload()
+
+    def create_reporting_tab(self):
+        # Dropdown for Shipping Personnel
+        self.shipping_to_var_report = StringVar(self.reporting_tab)
+        self.shipping_to_var_report.set("ALL")  # Default value
+        shipping_to_options_report = ["ALL"] + SHIPPING_TO_OPTIONS
+        shipping_to_menu_report = tk.OptionMenu(
+            self.reporting_tab, self.shipping_to_var_report, *shipping_to_options_report)
+
+        # Type-ahead search for Item Details, the catalog is only loaded once the user starts searching
+        self.report_item = None  # (store, item_no, item_name), None for ALL
+        self.item_suggestions = []
+        item_details_frame = ttk.Frame(self.reporting_tab)
+        self.item_details_var_report = StringVar(item_details_frame)
+        self.item_details_var_report.set("Item: ALL")
+        label_item_details = tk.Label(item_details_frame, textvariable=self.item_details_var_report)
+        self.item_search_var = StringVar(item_details_frame)
+        self.entry_item_search = tk.Entry(item_details_frame, textvariable=self.item_search_var, width=40)
+        self.listbox_item_suggestions = tk.Listbox(
+            item_details_frame, height=5, width=40, exportselection=False)
+        self.entry_item_search.bind("<FocusIn>", lambda event: self.update_item_suggestions())
+        self.item_search_var.trace_add("write", lambda *args: self.update_item_suggestions())
+        self.listbox_item_suggestions.bind("<<ListboxSelect>>", self.select_item_suggestion)
+
+        label_item_details.grid(row=0, column=0, sticky="w")
+        self.entry_item_search.grid(row=1, column=0, sticky="we")
+        self.listbox_item_suggestions.grid(row=2, column=0, sticky="we")
+
+        # From/to days of the shipments to include, blank for no limit
+        date_range_frame = ttk.Frame(self.reporting_tab)
+        self.entry_report_from = tk.Entry(date_range_frame, width=12)
+        self.entry_report_to = tk.Entry(date_range_frame, width=12)
+        tk.Label(date_range_frame, text="From (mm/dd/yyyy):").grid(row=0, column=0, sticky="w")
+        self.entry_report_from.grid(row=0, column=1, padx=5)
+        tk.Label(date_range_frame, text="To (mm/dd/yyyy):").grid(row=1, column=0, sticky="w")
+        self.entry_report_to.grid(row=1, column=1, padx=5)
+
+        btn_generate_report = tk.Button(
+            self.reporting_tab, text="Generate Report", command=self.generate_report)
+
+        btn_export_to_excel = tk.Button(
+            self.reporting_tab, text="Export Database", command=self.export_to_excel)
+
+        # Dropdown for the export format
+        self.export_format_var = StringVar(self.reporting_tab)
+        self.export_format_var.set("Excel")  # Default value
+        export_format_menu = tk.OptionMenu(
+            self.reporting_tab, self.export_format_var, *EXPORT_FORMAT_OPTIONS)
+
+        shipping_to_menu_report.grid(row=0, column=0, padx=10, pady=10)
+        item_details_frame.grid(row=0, column=1, padx=10, pady=10)
+        date_range_frame.grid(row=0, column=2, padx=10, pady=10)
+        btn_generate_report.grid(row=0, column=3, padx=10, pady=10)
+        export_format_menu.grid(row=0, column=4, padx=10, pady=10)
+        btn_export_to_excel.grid(row=1, column=4, padx=10, pady=10)
+
+        # Treeview for displaying the report
+        self.tree_report = ttk.Treeview(self.reporting_tab, columns=(
+            "Store", "Item No", "Item Name", "Total Quantity", "Total Cost", "Total Cost After Tax"))
+        self.tree_report.heading("#0", text="Store")
+        self.tree_report.heading("#1", text="Item No")
+        self.tree_report.heading("#2", text="Item Name")
+        self.tree_report.heading("#3", text="Total Quantity")
+        self.tree_report.heading("#4", text="Total Cost")
+        self.tree_report.heading("#5", text="Total Cost After Tax")
+        self.tree_report.grid(row=1, column=0, columnspan=4, padx=10, pady=10)
+
+    def generate_report(self):
+        try:
+            start_date, end_date = parse_date_range(self.entry_report_from.get(), self.entry_report_to.get())
+        except ValueError:
+            messagebox.showerror("Invalid Date", "Please enter the dates as mm/dd/yyyy.")
+            return
+
+        shipping_to = self.clean_input(self.shipping_to_var_report.get())
+        item = self.report_item
+        self.run_job("report", "Generating report", lambda engine, job: engine.shipment_report(
+            shipping_to, item, start_date, end_date), self.show_report)
+
+    def show_report(self, result):
+        with timed("ui: shipment report", len(result)):
+            # Clear previous data
+            for row in self.tree_report.get_children():
+                self.tree_report.delete(row)
+
+            for row in result:
+                self.tree_report.insert("", "end", values=row)
+
+    def run_analytics(self):
+        try:
+            window_days = int(self.clean_input(self.entry_analytics_window.get()))
+            lead_time_days = float(self.clean_input(self.entry_analytics_lead_time.get()))
+        except ValueError:
+            messagebox.showerror("Invalid Input", "Please enter the window and lead time as numbers of days.")
+            return
+
+        from analytics import analyze
+
+        self.run_job("analytics", "Computing analytics", lambda engine, job: analyze(
+            engine.conn, window_days=window_days, lead_time_days=lead_time_days, job=job), self.show_analytics)
+
+    def show_analytics(self, result):
+        with timed("ui: analytics", min(len(result.items), ANALYTICS_DISPLAY_ROWS)):
+            self.tree_analytics_items.delete(*self.tree_analytics_items.get_children())
+            self.tree_analytics_channels.delete(*self.tree_analytics_channels.get_children())
+
+            for item in result.items[:ANALYTICS_DISPLAY_ROWS]:
+                self.tree_analytics_items.insert("", "end", values=(
+                    item.store, item.item_no, item.item_name, self.format_quantity(item.on_hand),
+                    self.format_quantity(item.shipped), f"{item.daily_velocity:,.2f}",
+                    "-" if item.days_of_cover == float("inf") else f"{item.days_of_cover:,.1f}",
+                    self.format_rate(item.sell_through), f"{item.reorder_point:,.1f}",
+                    self.format_quantity(item.suggested_order)))
+            for channel in result.channels:
+                self.tree_analytics_channels.insert("", "end", values=(
+                    channel.shipping_to, self.format_quantity(channel.shipped), self.format_price(channel.total_cost),
+                    f"{channel.share:.1%}", self.format_rate(channel.sell_through)))
+
+            shown = f"showing the first {ANALYTICS_DISPLAY_ROWS:,}. " if len(result.items) > ANALYTICS_DISPLAY_ROWS else ""
+            self.analytics_status_var.set(f"{result.summary()} {shown}".strip())
+
+    def update_item_suggestions(self):
+        # "ALL" first, then the catalog items matching what has been typed so far
+        self.item_suggestions = [None] + self.sku_catalog.search(self.item_search_var.get())
+        self.listbox_item_suggestions.delete(0, tk.END)
+        for item in self.item_suggestions:
+            self.listbox_item_suggestions.insert(tk.END, "ALL" if item is None else " | ".join(item))
+
+    def select_item_suggestion(self, event):
+        selection = self.listbox_item_suggestions.curselection()
+        if not selection:
+            return
+        self.report_item = self.item_suggestions[selection[0]]
+        self.item_details_var_report.set(
+            "Item: ALL" if self.report_item is None else "Item: " + " | ".join(self.report_item))
+
+    def export_to_excel(self):
+        # Export every table in one streaming pass, as one workbook or one file per table, on a worker
+        # with the rows written so far shown in the status bar
+        from exporter import count_rows, export_database
+
+        def export(engine, job, export_format):
+            total = count_rows(engine.conn)
+            return export_database(engine.conn, export_format, "inventory_data",
+                                   progress=lambda rows: job.progress(rows, total))
+
+        self.run_job("export", "Exporting database", export, self.show_export_result,
+                     EXPORT_FORMAT_OPTIONS[self.export_format_var.get()])
+
+    def show_export_result(self, result):
+        # Display success message
+        messagebox.showinfo(
+            "Success", f"Data exported successfully!\n\n{result.summary()}\n\n" + "\n".join(result.paths))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inventory Management App")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH,
+                        help=f"path of the SQLite database (default: {DEFAULT_DB_PATH})")
+    parser.add_argument("--measure-startup", action="store_true",
+                        help="print a breakdown of the startup time and exit")
+    parser.add_argument("--startup-target-ms", type=float, default=STARTUP_TARGET_MS,
+                        help=f"cold start to first paint target for --measure-startup (default: {STARTUP_TARGET_MS})")
+    parser.add_argument("--dump-diagnostics", action="store_true",
+                        help="print the time per database and UI operation on exit")
+    args = parser.parse_args()
+    timer = StartupTimer(STARTUP_STARTED)
+    timer.mark("imports")
+
+    # Create or connect to the database, the schema is set up once the window is on screen
+    conn = connect(args.db)
+    engine = InventoryEngine(conn, setup=False)
+    timer.mark("connect")
+
+    root = tk.Tk()
+    timer.mark("tk init")
+    from workers import WorkerPool
+
+    workers = WorkerPool(root, args.db)
+    app = InventoryApp(root, engine, workers)
+    timer.mark("build first tab")
+
+    if args.measure_startup:
+        root.update()
+        timer.mark("first paint")
+        engine.setup()
+        timer.mark("schema and migrations")
+        app.sku_catalog.load()
+        timer.mark("sku catalog load")
+        workers.close()
+        root.destroy()
+        conn.close()
+        within_target = timer.report("first paint", args.startup_target_ms)
+        sys.exit(0 if within_target else 1)
+
+    root.after_idle(engine.setup)
+    root.mainloop()
+    workers.close()
+
+    # Close the database connection
+    conn.close()
+    if args.dump_diagnostics:
+        from instrumentation import format_report
+
+        print(format_report())
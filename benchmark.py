@@ -0,0 +1,251 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from db import connect
+from engine import (InventoryEngine, InventoryError, IncomingItem, OutgoingShipment, ExpenseEntry,
+                    SHIPPING_TO_OPTIONS, STORED_DATE_FORMAT)
+from exporter import export_database
+from statements import check_plans
+
+
+SIZES = {"10k": 10000, "1m": 1000000, "10m": 10000000}
+
+# Share of the generated ledger rows going to each ledger table
+RECEIPT_SHARE = 0.40
+SHIPMENT_SHARE = 0.55
+
+GENERATE_BATCH_SIZE = 50000
+LEDGER_START = datetime(2025, 1, 1)
+LEDGER_DAYS = 365
+
+
+def parse_size(size):
+    size = size.lower()
+    if size in SIZES:
+        return SIZES[size]
+    return int(size)
+
+
+def synthetic_catalog(rng, rows):
+    # Scale the number of stores and SKUs with the ledger, like a growing business would
+    store_count = max(3, min(50, rows // 200000))
+    sku_count = max(100, min(100000, rows // 100))
+    stores = [f"STORE{index:02d}" for index in range(store_count)]
+    return [(rng.choice(stores), f"B{index:08d}", f"ITEM {index}") for index in range(sku_count)]
+
+
+def synthetic_date(rng):
+    return (LEDGER_START + timedelta(days=rng.randrange(LEDGER_DAYS), seconds=rng.randrange(86400))
+            ).strftime(STORED_DATE_FORMAT)
+
+
+def generate_ledger(engine, rows, seed=42):
+    # Fill the database through the engine's batch paths with `rows` ledger rows:
+    # receipts first so shipments find stock, then shipments to the four destinations, then expenses
+    rng = random.Random(seed)
+    catalog = synthetic_catalog(rng, rows)
+    receipts = int(rows * RECEIPT_SHARE)
+    shipments = int(rows * SHIPMENT_SHARE)
+    expenses = rows - receipts - shipments
+
+    def batches(count, make_row):
+        while count > 0:
+            size = min(count, GENERATE_BATCH_SIZE)
+            yield [make_row() for _ in range(size)]
+            count -= size
+
+    for batch in batches(receipts, lambda: IncomingItem(
+            *rng.choice(catalog), rng.randint(20, 100), round(rng.uniform(1, 50), 2),
+            rng.choice([0, 5, 8.25, 13]), synthetic_date(rng))):
+        engine.receive_batch(batch)
+
+    for batch in batches(shipments, lambda: OutgoingShipment(
+            *rng.choice(catalog), rng.randint(1, 5), rng.choice(SHIPPING_TO_OPTIONS), synthetic_date(rng))):
+        engine.ship_batch(batch)
+
+    expense_items = ["BOXES", "TAPE", "LABELS", "SHIPPING", "STORAGE"]
+    stores = sorted({store for store, _, _ in catalog})
+    for batch in batches(expenses, lambda: ExpenseEntry(
+            rng.choice(stores), rng.choice(expense_items), rng.randint(1, 50), round(rng.uniform(0.1, 20), 2),
+            rng.choice([0, 5, 8.25]), synthetic_date(rng))):
+        engine.add_expense_batch(batch)
+
+    return catalog
+
+
+def summarize(durations):
+    if not durations:
+        return {"count": 0}
+    durations = sorted(durations)
+    return {
+        "count": len(durations),
+        "mean_ms": statistics.fmean(durations) * 1000,
+        "p50_ms": durations[len(durations) // 2] * 1000,
+        "p95_ms": durations[min(len(durations) - 1, int(len(durations) * 0.95))] * 1000,
+        "ops_per_sec": len(durations) / sum(durations) if sum(durations) else 0.0,
+    }
+
+
+def timed(operation, repeat):
+    durations = []
+    for index in range(repeat):
+        started = time.perf_counter()
+        operation(index)
+        durations.append(time.perf_counter() - started)
+    return summarize(durations)
+
+
+def run_size(rows, seed, operations, directory, skip_export=False):
+    path = os.path.join(directory, f"benchmark_{rows}.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    conn = connect(path)
+    engine = InventoryEngine(conn)
+    results = {"rows": rows}
+
+    started = time.perf_counter()
+    catalog = generate_ledger(engine, rows, seed)
+    elapsed = time.perf_counter() - started
+    results["generate"] = {"seconds": elapsed, "rows_per_sec": rows / elapsed}
+
+    rng = random.Random(seed + 1)
+    in_stock = [tuple(row[:3]) for row in engine.inventory_rows() if row[3] > 0]
+
+    received_ids = []
+    results["receive"] = timed(lambda index: received_ids.append(engine.receive(IncomingItem(
+        *rng.choice(catalog), rng.randint(20, 100), round(rng.uniform(1, 50), 2), 8.25, synthetic_date(rng)))),
+        operations)
+
+    shipped_ids = []
+
+    def ship(index):
+        try:
+            shipped_ids.append(engine.ship(OutgoingShipment(
+                *rng.choice(in_stock), 1, rng.choice(SHIPPING_TO_OPTIONS), synthetic_date(rng))))
+        except InventoryError:
+            pass
+    results["ship"] = timed(ship, operations)
+
+    results["reverse_shipment"] = timed(lambda index: engine.reverse_shipment(shipped_ids[index]), len(shipped_ids))
+
+    def reverse_incoming(index):
+        try:
+            engine.reverse_incoming(received_ids[index])
+        except InventoryError:
+            pass
+    results["reverse_incoming"] = timed(reverse_incoming, len(received_ids))
+
+    report_items = [rng.choice(catalog) for _ in range(10)]
+    results["generate_report_all"] = timed(lambda index: engine.shipment_report(), 5)
+    results["generate_report_shipping_to"] = timed(
+        lambda index: engine.shipment_report(SHIPPING_TO_OPTIONS[index % len(SHIPPING_TO_OPTIONS)]), 8)
+    results["generate_report_item"] = timed(lambda index: engine.shipment_report("ALL", report_items[index]), 10)
+    results["inventory_summary"] = timed(lambda index: engine.inventory_rows(), 5)
+    results["expense_summary"] = timed(lambda index: engine.expense_summary_rows(), 5)
+    results["ledger_first_page"] = timed(lambda index: engine.ledger_page("outgoing", "entry_date", True), 10)
+
+    if not skip_export:
+        export = export_database(conn, "csv.gz", os.path.join(directory, f"benchmark_{rows}_export"))
+        results["export_csv_gz"] = {"seconds": export.seconds, "rows_per_sec": export.rows_per_second,
+                                    "bytes": export.bytes}
+        for export_path in export.paths:
+            os.remove(export_path)
+
+    conn.close()
+    results["db_bytes"] = os.path.getsize(path)
+    return results
+
+
+def check_size(rows, seed, directory):
+    # Generate a ledger of `rows` rows and return the hot statements that would read a whole table of it
+    path = os.path.join(directory, f"plans_{rows}.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    conn = connect(path)
+    generate_ledger(InventoryEngine(conn), rows, seed)
+    regressions = check_plans(conn)
+    conn.close()
+    return regressions
+
+
+def compare(results, baseline):
+    # Print the relative change of every timing against an earlier run, slower is positive
+    for size, metrics in results["sizes"].items():
+        if size not in baseline.get("sizes", {}):
+            continue
+        print(f"== {size} vs baseline")
+        for name, values in metrics.items():
+            old = baseline["sizes"][size].get(name)
+            if not isinstance(values, dict) or not isinstance(old, dict):
+                continue
+            key = "p50_ms" if "p50_ms" in values else "seconds"
+            if old.get(key):
+                change = (values[key] - old[key]) / old[key] * 100
+                print(f"  {name:<32}{old[key]:>12.3f} -> {values[key]:>12.3f} {key}  ({change:+.1f}%)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the inventory engine on synthetic ledgers")
+    parser.add_argument("--sizes", nargs="+", default=["10k"],
+                        help=f"ledger sizes to run, {', '.join(SIZES)} or a row count (default: 10k)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--operations", type=int, default=1000,
+                        help="single postings timed per posting benchmark (default: 1000)")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", metavar="BASELINE_JSON", help="print the change against an earlier run")
+    parser.add_argument("--directory", help="where to create the benchmark databases (default: a temp dir)")
+    parser.add_argument("--skip-export", action="store_true")
+    parser.add_argument("--check-plans", action="store_true",
+                        help="only check that no hot query reads a whole table, exit 1 if one does")
+    args = parser.parse_args(argv)
+
+    if args.check_plans:
+        failed = False
+        with tempfile.TemporaryDirectory() as temp_directory:
+            for size in args.sizes:
+                regressions = check_size(parse_size(size), args.seed, args.directory or temp_directory)
+                for name, plan in regressions:
+                    print(f"{size}: {name} reads a whole table:", *plan, sep="\n    ")
+                print(f"{size}: {len(regressions)} hot statement(s) read a whole table", file=sys.stderr)
+                failed = failed or bool(regressions)
+        sys.exit(1 if failed else 0)
+
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "operations": args.operations,
+        "sizes": {},
+    }
+    with tempfile.TemporaryDirectory() as temp_directory:
+        directory = args.directory or temp_directory
+        for size in args.sizes:
+            print(f"Running {size} ...", file=sys.stderr)
+            results["sizes"][size] = run_size(parse_size(size), args.seed, args.operations, directory, args.skip_export)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+from bisect import bisect_left, insort
+from heapq import nsmallest
+
+from engine import clean_input
+
+
+class SkuCatalog:
+    # Every (store, item_no, item_name) seen in the inventory or the shipments, searchable by prefix.
+    # Loaded from the database on first use, then kept current with add() as items are received or shipped
+    # and remove() as reversals take them out. Display Inventory loads it again with what other stations posted.
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.items = None  # set of (store, item_no, item_name)
+        self.prefix_index = []  # sorted (search key, item) pairs
+
+    def load(self, triplets=None):
+        # From store_item_triplets() rows read elsewhere, e.g. on a worker, or else from the engine
+        self.items = set()
+        self.prefix_index = []
+        entries = []
+        for item in self.engine.store_item_triplets() if triplets is None else triplets:
+            item = tuple(item)
+            if item not in self.items:
+                self.items.add(item)
+                entries.extend((key, item) for key in self.search_keys(item))
+        self.prefix_index = sorted(entries)
+
+    def ensure_loaded(self):
+        if self.items is None:
+            self.load()
+
+    def search_keys(self, item):
+        # An item can be found by its item no, its item name or its full "store item_no item_name" label
+        store, item_no, item_name = item
+        return {item_no, item_name, f"{store} {item_no} {item_name}"}
+
+    def add(self, item):
+        # Nothing to do until the catalog is first needed, the first load picks the item up
+        if self.items is None:
+            return
+        item = tuple(item)
+        if item in self.items:
+            return
+        self.items.add(item)
+        for key in self.search_keys(item):
+            insort(self.prefix_index, (key, item))
+
+    def remove(self, item):
+        # Nothing to do until the catalog is first needed, the first load leaves the item out
+        if self.items is None:
+            return
+        item = tuple(item)
+        if item not in self.items:
+            return
+        self.items.remove(item)
+        for key in self.search_keys(item):
+            del self.prefix_index[bisect_left(self.prefix_index, (key, item))]
+
+    def search(self, prefix, limit=50):
+        self.ensure_loaded()
+        prefix = clean_input(prefix)
+        if not prefix:
+            return nsmallest(limit, self.items)
+
+        # All keys starting with the prefix sit next to each other in the sorted index
+        matches = []
+        seen = set()
+        index = bisect_left(self.prefix_index, (prefix,))
+        while index < len(self.prefix_index) and len(matches) < limit:
+            key, item = self.prefix_index[index]
+            if not key.startswith(prefix):
+                break
+            if item not in seen:
+                seen.add(item)
+                matches.append(item)
+            index += 1
+        return matches
+
+    def __len__(self):
+        self.ensure_loaded()
+        return len(self.items)
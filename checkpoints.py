@@ -0,0 +1,181 @@
+import sys
+from datetime import date, datetime, timedelta
+from heapq import merge
+
+from db import transaction
+from engine import date_to_epoch, epoch_to_date
+from statements import STATEMENTS
+
+
+# A checkpoint holds the inventory as it stood at the end of checkpoint_date ("YYYY-MM-DD").
+# inventory_as_of starts from the latest checkpoint on or before the requested day and replays only
+# the receipts and shipments dated after it, using the same moving-average rules as the engine.
+
+DAY_FORMAT = "%Y-%m-%d"
+
+
+def parse_day(day):
+    if isinstance(day, datetime):
+        return day.date()
+    if isinstance(day, date):
+        return day
+    return datetime.strptime(str(day).strip()[:10], DAY_FORMAT).date()
+
+
+def nearest_checkpoint(conn, day):
+    row = conn.execute(STATEMENTS["nearest_checkpoint"], (parse_day(day).strftime(DAY_FORMAT),)).fetchone()
+    return row[0] if row else None
+
+
+def load_checkpoint(conn, checkpoint_date):
+    state = {}
+    for item_id, quantity, average_price, average_price_after_tax in conn.execute(
+            STATEMENTS["checkpoint_rows"], (checkpoint_date,)):
+        state[item_id] = [quantity, average_price, average_price_after_tax]
+    return state
+
+
+def item_names(conn):
+    # (store, item_no, item_name) of every item id
+    return {item_id: (store, item_no, item_name)
+            for item_id, store, item_no, item_name in conn.execute(STATEMENTS["item_names"])}
+
+
+def replay(conn, state, start_day=None, end_day=None):
+    # Apply the ledger rows dated from the start of start_day to the end of end_day onto state, in date
+    # order (no bound when None). Receipts of the same second go before shipments so the stock they
+    # bring is available, rows of the same kind and second keep their posting order. State is keyed by item id.
+    # An open end is the whole 64-bit range of entry_time
+    start = date_to_epoch(start_day) if start_day else -2 ** 63
+    end = date_to_epoch(end_day + timedelta(days=1)) if end_day else 2 ** 63 - 1
+    # Each ledger is read in (entry_time, id) order straight off its entry_time index, merging the two
+    # streams is cheaper than sorting their union
+    receipts = conn.execute(STATEMENTS["receipts_between"], (start, end))
+    shipments = conn.execute(STATEMENTS["shipments_between"], (start, end))
+    rows = merge(receipts, shipments)
+
+    replayed = 0
+    for _, is_shipment, _, item_id, quantity, price, price_after_tax in rows:
+        item = state.setdefault(item_id, [0, 0, 0])
+        if is_shipment:
+            # A back-dated shipment can go below zero until its receipt is replayed, quantities stay exact
+            item[0] -= quantity
+        elif item[0] <= 0:
+            # Nothing on hand to average with, the receipt sets the cost
+            item[0] += quantity
+            item[1], item[2] = price, price_after_tax
+        else:
+            updated_quantity = item[0] + quantity
+            if updated_quantity != 0:
+                item[1] = (item[0] * item[1] + quantity * price) / updated_quantity
+                item[2] = (item[0] * item[2] + quantity * price_after_tax) / updated_quantity
+            item[0] = updated_quantity
+        replayed += 1
+    return replayed
+
+
+def state_as_of(conn, day):
+    # {item_id: [total_quantity, average_price_before_tax, average_price_after_tax]} at the end of `day`
+    day = parse_day(day)
+    checkpoint_date = nearest_checkpoint(conn, day)
+    if checkpoint_date:
+        state = load_checkpoint(conn, checkpoint_date)
+        start_day = parse_day(checkpoint_date) + timedelta(days=1)
+    else:
+        state = {}
+        start_day = None
+    replay(conn, state, start_day, day)
+    return state
+
+
+def inventory_as_of(conn, day):
+    # Rows of (store, item_no, item_name, total_quantity, average_price_before_tax, average_price_after_tax)
+    # as they stood at the end of `day`
+    state = state_as_of(conn, day)
+    names = item_names(conn)
+    return sorted((*names[item_id], *values) for item_id, values in state.items())
+
+
+def valuation_as_of(conn, day):
+    rows = inventory_as_of(conn, day)
+    return {
+        "day": parse_day(day).strftime(DAY_FORMAT),
+        "items": sum(1 for row in rows if row[3]),
+        "total_quantity": sum(row[3] for row in rows),
+        "total_cost": sum(row[3] * row[4] for row in rows),
+        "total_cost_after_tax": sum(row[3] * row[5] for row in rows),
+    }
+
+
+def create_checkpoint(conn, day):
+    day = parse_day(day)
+    with transaction(conn):
+        state = state_as_of(conn, day)
+        checkpoint_date = day.strftime(DAY_FORMAT)
+        conn.execute(STATEMENTS["delete_checkpoint"], (checkpoint_date,))
+        conn.executemany(STATEMENTS["insert_checkpoint_row"],
+                         [(checkpoint_date, item_id, *values) for item_id, values in state.items()])
+        conn.execute(STATEMENTS["insert_checkpoint_date"],
+                     (checkpoint_date, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+    return len(state)
+
+
+def period_ends(first_day, last_day, period):
+    # Last day of every day or month from first_day up to and including last_day
+    if period == "daily":
+        day = first_day
+        while day <= last_day:
+            yield day
+            day += timedelta(days=1)
+        return
+    month = date(first_day.year, first_day.month, 1)
+    while True:
+        next_month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+        month_end = next_month - timedelta(days=1)
+        if month_end > last_day:
+            return
+        yield month_end
+        month = next_month
+
+
+def create_checkpoints(conn, period="monthly", until=None):
+    # Create every missing daily or month-end checkpoint up to `until` (default: yesterday), oldest first,
+    # so each one replays only the rows since the previous checkpoint
+    if period not in ("daily", "monthly"):
+        raise ValueError(f"Unknown checkpoint period {period!r}, expected daily or monthly.")
+    until = parse_day(until) if until else date.today() - timedelta(days=1)
+
+    first = conn.execute(STATEMENTS["first_entry_time"]).fetchone()[0]
+    if first is None:
+        return []
+
+    existing = {row[0] for row in conn.execute(STATEMENTS["checkpoint_dates"])}
+    created = []
+    for day in period_ends(parse_day(epoch_to_date(first)), until, period):
+        if day.strftime(DAY_FORMAT) not in existing:
+            create_checkpoint(conn, day)
+            created.append(day.strftime(DAY_FORMAT))
+    return created
+
+
+if __name__ == "__main__":
+    from db import connect
+    from engine import InventoryEngine
+
+    usage = ("Usage: python checkpoints.py create [daily|monthly] [UNTIL_DAY]\n"
+             "       python checkpoints.py as-of DAY")
+    if len(sys.argv) < 2 or sys.argv[1] not in ("create", "as-of"):
+        print(usage)
+        sys.exit(1)
+
+    engine = InventoryEngine(connect())
+    if sys.argv[1] == "create":
+        created = create_checkpoints(engine.conn, *sys.argv[2:4])
+        print(f"Created {len(created)} checkpoint(s)" + (f": {created[0]} .. {created[-1]}" if created else ""))
+    else:
+        if len(sys.argv) < 3:
+            print(usage)
+            sys.exit(1)
+        for row in inventory_as_of(engine.conn, sys.argv[2]):
+            print(*row, sep="\t")
+        print(valuation_as_of(engine.conn, sys.argv[2]))
@@ -0,0 +1,93 @@
+import os
+import random
+import sqlite3
+import time
+from contextlib import contextmanager
+from urllib.parse import quote
+
+from instrumentation import connection_factory
+from statements import STATEMENT_CACHE_SIZE, STATEMENTS
+
+
+# The database file can be moved with the INVENTORY_DB environment variable or the --db option
+DEFAULT_DB_PATH = os.environ.get("INVENTORY_DB", "inventory.db")
+
+# WAL lets readers run alongside the writer and turns each commit into one sequential append.
+# synchronous=NORMAL only fsyncs at checkpoints in WAL mode: the database can never be corrupted,
+# a power cut can at worst lose the last few commits.
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -65536,  # KiB, i.e. 64 MB of page cache
+    "mmap_size": 268435456,  # 256 MB
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,  # ms to wait for another writer before failing with SQLITE_BUSY
+}
+
+# A write that failed with SQLITE_BUSY after busy_timeout, or lost a conflicting update to another
+# connection, is run again up to RETRY_ATTEMPTS times in all, after RETRY_BASE_DELAY * 2 ** attempt seconds
+# give or take half, so stations that collided do not retry in lockstep
+RETRY_ATTEMPTS = 5
+RETRY_BASE_DELAY = 0.05
+
+
+def connect(path=None, readonly=False, **pragmas):
+    path = path or DEFAULT_DB_PATH
+    if readonly:
+        # Read-only connections can never take the write lock, in WAL mode they read alongside the writer
+        conn = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True, factory=connection_factory(),
+                               cached_statements=STATEMENT_CACHE_SIZE)
+    else:
+        conn = sqlite3.connect(path, factory=connection_factory(), cached_statements=STATEMENT_CACHE_SIZE)
+    for name, value in {**DEFAULT_PRAGMAS, **pragmas}.items():
+        conn.execute(f'PRAGMA {name} = {value}')
+    return conn
+
+
+@contextmanager
+def transaction(conn):
+    # Run the block as one atomic transaction, committed at the end or rolled back on any error.
+    # BEGIN IMMEDIATE takes the write lock up front, so the reads inside the block (stock checks,
+    # current averages) cannot be changed by another writer before the block commits.
+    # Nested blocks join the outer transaction.
+    if conn.in_transaction:
+        yield conn
+        return
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+def cache_generation(conn):
+    # 0 until bump_cache_generation(conn). It lives in the connection's temp schema, so it is private to the
+    # connection and rolls back with the transaction that bumped it.
+    return conn.execute(STATEMENTS["cache_generation"]).fetchone()[0]
+
+
+def bump_cache_generation(conn):
+    # Called after rewriting tables behind the engine's caches on conn: PRAGMA data_version only changes
+    # for commits of other connections, so an engine on conn itself would not notice them otherwise
+    conn.execute(f'PRAGMA temp.user_version = {cache_generation(conn) + 1}')
+
+
+def is_busy(error):
+    # SQLITE_BUSY and its extended codes, e.g. a deferred transaction whose snapshot went stale
+    return (isinstance(error, sqlite3.OperationalError)
+            and (getattr(error, "sqlite_errorcode", 0) & 0xFF) in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED))
+
+
+def run_with_retries(conn, function, retryable=is_busy, attempts=RETRY_ATTEMPTS, base_delay=RETRY_BASE_DELAY):
+    # Call function() again with backoff while it fails with an error retryable(error) accepts. Not inside a
+    # transaction of the caller's: only the caller can roll that back and run the whole transaction again.
+    for attempt in range(attempts):
+        try:
+            return function()
+        except Exception as error:
+            if conn.in_transaction or attempt == attempts - 1 or not retryable(error):
+                raise
+        time.sleep(base_delay * 2 ** attempt * random.uniform(0.5, 1.5))
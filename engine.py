@@ -0,0 +1,1794 @@
+import sqlite3
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from functools import wraps
+
+from db import cache_generation, is_busy, run_with_retries, transaction
+from statements import (LEDGER_COLUMNS, STATEMENTS, fifo_cost_statement, ledger_page_statement,
+                        shipment_report_statement)
+
+
+SHIPPING_TO_OPTIONS = ["USA FBA", "USA MFN", "CAN FBA", "CAN MFN"]
+
+INPUT_DATE_FORMAT = "%m/%d/%Y"
+STORED_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+DAY_FORMAT = "%Y-%m-%d"
+EPOCH = datetime(1970, 1, 1)
+SECONDS_PER_DAY = 86400
+
+
+class InventoryError(Exception):
+    pass
+
+
+class ItemNotFoundError(InventoryError):
+    pass
+
+
+class InsufficientQuantityError(InventoryError):
+
+    def __init__(self, message, available_quantity):
+        super().__init__(message)
+        self.available_quantity = available_quantity
+
+
+class ConcurrentUpdateError(InventoryError):
+    # An inventory row changed between being read and being written back
+    pass
+
+
+@dataclass
+class IncomingItem:
+    store: str
+    item_no: str
+    item_name: str
+    quantity: int
+    price: float
+    tax_rate: float
+    entry_date: str = None
+
+
+@dataclass
+class OutgoingShipment:
+    store: str
+    item_no: str
+    item_name: str
+    quantity: int
+    shipping_to: str
+    entry_date: str = None
+    average_price_at_shipment: float = None
+    average_price_at_shipment_after_tax: float = None
+
+
+@dataclass
+class ExpenseEntry:
+    store: str
+    item_name: str
+    quantity: int
+    price: float
+    tax_rate: float
+    entry_date: str = None
+
+
+def clean_input(text):
+    return str(text).strip().upper()
+
+
+def calculate_after_tax_price(price_before_tax, tax_rate):
+    return price_before_tax + price_before_tax*tax_rate/100
+
+
+def parse_entry_date(entry_date_str):
+    # Dates are typed as mm/dd/yyyy and stored as "%Y-%m-%d %H:%M:%S", today's date is used if not provided
+    entry_date_str = clean_input(entry_date_str) if entry_date_str else ""
+    if not entry_date_str:
+        return datetime.now().strftime(STORED_DATE_FORMAT)
+    return datetime.strptime(entry_date_str, INPUT_DATE_FORMAT).strftime(STORED_DATE_FORMAT)
+
+
+def date_to_epoch(value):
+    # Entry dates are stored as whole seconds since 1970-01-01 of the wall-clock time, no time zone is applied.
+    # Takes a "%Y-%m-%d %H:%M:%S" string, a "%Y-%m-%d" day, a date or a datetime.
+    if isinstance(value, datetime):
+        moment = value
+    elif isinstance(value, date):
+        moment = datetime(value.year, value.month, value.day)
+    else:
+        text = str(value).strip()
+        moment = datetime.strptime(text, STORED_DATE_FORMAT if len(text) > 10 else DAY_FORMAT)
+    return (moment.replace(microsecond=0) - EPOCH) // timedelta(seconds=1)
+
+
+def epoch_to_date(seconds):
+    return (EPOCH + timedelta(seconds=seconds)).strftime(STORED_DATE_FORMAT)
+
+
+def parse_date_range(start_str, end_str, date_format=INPUT_DATE_FORMAT):
+    # From/to days as typed, both included and either may be left blank. Returns (start_date, end_date)
+    # for start_date <= entry_date < end_date, None where the range is open.
+    start_str = clean_input(start_str) if start_str else ""
+    end_str = clean_input(end_str) if end_str else ""
+    start_date = datetime.strptime(start_str, date_format) if start_str else None
+    end_date = datetime.strptime(end_str, date_format) + timedelta(days=1) if end_str else None
+    return start_date, end_date
+
+
+def apply_event(row, kind, ledger, quantity, unit_cost, unit_cost_after_tax):
+    # A projection row (total_quantity, average_price_before_tax, average_price_after_tax) after one event,
+    # None when the item is not (or no longer) in the projection
+    if kind == "shipped":
+        return (row[0] - quantity, row[1], row[2]) if row else None
+    # Reversed receipts and expenses come out at their own unit cost and remove the row once nothing is left,
+    # receipts, expenses and reversed shipments go in at theirs
+    removing = kind == "reversed" and ledger != "outgoing"
+    if removing:
+        if not row:
+            return None
+        quantity = -quantity
+    elif not row:
+        return (quantity, unit_cost if quantity != 0 else 0, unit_cost_after_tax if quantity != 0 else 0)
+    current_quantity = int(row[0])
+    updated_quantity = current_quantity + quantity
+    if updated_quantity == 0:
+        return None if removing else (0, 0, 0)
+    return (updated_quantity,
+            (current_quantity * float(row[1]) + quantity * unit_cost) / updated_quantity,
+            (current_quantity * float(row[2]) + quantity * unit_cost_after_tax) / updated_quantity)
+
+
+def is_conflict(error):
+    return isinstance(error, ConcurrentUpdateError) or is_busy(error)
+
+
+def retries_conflicts(posting):
+    # Several stations (processes) may post against the same database. A posting that loses a race, by
+    # waiting out busy_timeout or by finding its inventory rows changed, is run again from the start,
+    # stock checks included.
+    @wraps(posting)
+    def run(self, *args, **kwargs):
+        return run_with_retries(self.conn, lambda: posting(self, *args, **kwargs), is_conflict)
+    return run
+
+
+def create_tables(conn):
+    with transaction(conn):
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS incoming_items (
+                id INTEGER PRIMARY KEY,
+                store TEXT,
+                item_no TEXT,
+                item_name TEXT,
+                quantity INTEGER,
+                price REAL,
+                tax_rate REAL,
+                entry_date TEXT
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS outgoing_shipments (
+                id INTEGER PRIMARY KEY,
+                store TEXT,
+                item_name TEXT,
+                item_no TEXT,
+                quantity INTEGER,
+                average_price_at_shipment REAL,
+                average_price_at_shipment_after_tax REAL,
+                shipping_to TEXT,
+                entry_date TEXT
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS expense_entries (
+                id INTEGER PRIMARY KEY,
+                store TEXT,
+                item_name TEXT,
+                quantity INTEGER,
+                price REAL,
+                tax_rate REAL,
+                entry_date TEXT
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS expenses (
+                store TEXT,
+                item_name TEXT,
+                total_quantity INTEGER,
+                average_price_before_tax REAL,
+                average_price_after_tax REAL,
+                PRIMARY KEY (store, item_name)
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS inventory (
+                store TEXT,
+                item_no TEXT,
+                item_name TEXT,
+                total_quantity INTEGER,
+                average_price_before_tax REAL,
+                average_price_after_tax REAL,
+                PRIMARY KEY (store, item_no, item_name)
+            )
+        ''')
+
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version
+MIGRATIONS = [
+    # 1: secondary indexes for deletes, report filters and date-range queries on the ledger tables
+    [
+        'CREATE INDEX IF NOT EXISTS idx_incoming_items_item ON incoming_items (store, item_no, item_name)',
+        'CREATE INDEX IF NOT EXISTS idx_incoming_items_entry_date ON incoming_items (entry_date)',
+        'CREATE INDEX IF NOT EXISTS idx_outgoing_shipments_item ON outgoing_shipments (store, item_no, item_name)',
+        'CREATE INDEX IF NOT EXISTS idx_outgoing_shipments_shipping_to ON outgoing_shipments (shipping_to)',
+        'CREATE INDEX IF NOT EXISTS idx_outgoing_shipments_entry_date ON outgoing_shipments (entry_date)',
+        'CREATE INDEX IF NOT EXISTS idx_expense_entries_item ON expense_entries (store, item_name)',
+        'CREATE INDEX IF NOT EXISTS idx_expense_entries_entry_date ON expense_entries (entry_date)',
+    ],
+    # 2: shipment_summary, a per destination, item and day rollup of outgoing_shipments for generate_report,
+    # kept current by triggers so it is updated inside the same transaction as the shipment or reversal
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS shipment_summary (
+            shipping_to TEXT,
+            store TEXT,
+            item_no TEXT,
+            item_name TEXT,
+            day TEXT,
+            shipment_count INTEGER,
+            total_quantity INTEGER,
+            total_cost REAL,
+            total_cost_after_tax REAL,
+            PRIMARY KEY (shipping_to, store, item_no, item_name, day)
+        ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_shipment_summary_item ON shipment_summary (store, item_no, item_name)',
+        '''
+        INSERT INTO shipment_summary (shipping_to, store, item_no, item_name, day, shipment_count, total_quantity, total_cost, total_cost_after_tax)
+        SELECT shipping_to, store, item_no, item_name, date(entry_date), COUNT(*), SUM(quantity),
+               SUM(quantity * average_price_at_shipment), SUM(quantity * average_price_at_shipment_after_tax)
+        FROM outgoing_shipments
+        GROUP BY shipping_to, store, item_no, item_name, date(entry_date)
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_shipment_summary_insert AFTER INSERT ON outgoing_shipments
+        BEGIN
+            INSERT INTO shipment_summary (shipping_to, store, item_no, item_name, day, shipment_count, total_quantity, total_cost, total_cost_after_tax)
+            VALUES (NEW.shipping_to, NEW.store, NEW.item_no, NEW.item_name, date(NEW.entry_date), 1, NEW.quantity,
+                    NEW.quantity * NEW.average_price_at_shipment, NEW.quantity * NEW.average_price_at_shipment_after_tax)
+            ON CONFLICT (shipping_to, store, item_no, item_name, day) DO UPDATE
+            SET shipment_count = shipment_count + 1,
+                total_quantity = total_quantity + excluded.total_quantity,
+                total_cost = total_cost + excluded.total_cost,
+                total_cost_after_tax = total_cost_after_tax + excluded.total_cost_after_tax;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_shipment_summary_delete AFTER DELETE ON outgoing_shipments
+        BEGIN
+            UPDATE shipment_summary
+            SET shipment_count = shipment_count - 1,
+                total_quantity = total_quantity - OLD.quantity,
+                total_cost = total_cost - OLD.quantity * OLD.average_price_at_shipment,
+                total_cost_after_tax = total_cost_after_tax - OLD.quantity * OLD.average_price_at_shipment_after_tax
+            WHERE shipping_to = OLD.shipping_to AND store = OLD.store AND item_no = OLD.item_no AND item_name = OLD.item_name
+                AND day = date(OLD.entry_date);
+            DELETE FROM shipment_summary
+            WHERE shipping_to = OLD.shipping_to AND store = OLD.store AND item_no = OLD.item_no AND item_name = OLD.item_name
+                AND day = date(OLD.entry_date) AND shipment_count = 0;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_shipment_summary_update AFTER UPDATE ON outgoing_shipments
+        BEGIN
+            UPDATE shipment_summary
+            SET shipment_count = shipment_count - 1,
+                total_quantity = total_quantity - OLD.quantity,
+                total_cost = total_cost - OLD.quantity * OLD.average_price_at_shipment,
+                total_cost_after_tax = total_cost_after_tax - OLD.quantity * OLD.average_price_at_shipment_after_tax
+            WHERE shipping_to = OLD.shipping_to AND store = OLD.store AND item_no = OLD.item_no AND item_name = OLD.item_name
+                AND day = date(OLD.entry_date);
+            DELETE FROM shipment_summary
+            WHERE shipping_to = OLD.shipping_to AND store = OLD.store AND item_no = OLD.item_no AND item_name = OLD.item_name
+                AND day = date(OLD.entry_date) AND shipment_count = 0;
+            INSERT INTO shipment_summary (shipping_to, store, item_no, item_name, day, shipment_count, total_quantity, total_cost, total_cost_after_tax)
+            VALUES (NEW.shipping_to, NEW.store, NEW.item_no, NEW.item_name, date(NEW.entry_date), 1, NEW.quantity,
+                    NEW.quantity * NEW.average_price_at_shipment, NEW.quantity * NEW.average_price_at_shipment_after_tax)
+            ON CONFLICT (shipping_to, store, item_no, item_name, day) DO UPDATE
+            SET shipment_count = shipment_count + 1,
+                total_quantity = total_quantity + excluded.total_quantity,
+                total_cost = total_cost + excluded.total_cost,
+                total_cost_after_tax = total_cost_after_tax + excluded.total_cost_after_tax;
+        END
+        ''',
+    ],
+    # 3: end-of-day inventory checkpoints for as-of queries. A ledger row added or removed on or before
+    # a checkpoint's day makes that checkpoint and every later one stale, so triggers drop them.
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS inventory_checkpoint_dates (
+            checkpoint_date TEXT PRIMARY KEY,
+            created_at TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS inventory_checkpoints (
+            checkpoint_date TEXT,
+            store TEXT,
+            item_no TEXT,
+            item_name TEXT,
+            total_quantity INTEGER,
+            average_price_before_tax REAL,
+            average_price_after_tax REAL,
+            PRIMARY KEY (checkpoint_date, store, item_no, item_name)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_incoming_items_checkpoints_insert AFTER INSERT ON incoming_items
+        BEGIN
+            DELETE FROM inventory_checkpoints WHERE checkpoint_date >= date(NEW.entry_date);
+            DELETE FROM inventory_checkpoint_dates WHERE checkpoint_date >= date(NEW.entry_date);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_incoming_items_checkpoints_delete AFTER DELETE ON incoming_items
+        BEGIN
+            DELETE FROM inventory_checkpoints WHERE checkpoint_date >= date(OLD.entry_date);
+            DELETE FROM inventory_checkpoint_dates WHERE checkpoint_date >= date(OLD.entry_date);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_outgoing_shipments_checkpoints_insert AFTER INSERT ON outgoing_shipments
+        BEGIN
+            DELETE FROM inventory_checkpoints WHERE checkpoint_date >= date(NEW.entry_date);
+            DELETE FROM inventory_checkpoint_dates WHERE checkpoint_date >= date(NEW.entry_date);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_outgoing_shipments_checkpoints_delete AFTER DELETE ON outgoing_shipments
+        BEGIN
+            DELETE FROM inventory_checkpoints WHERE checkpoint_date >= date(OLD.entry_date);
+            DELETE FROM inventory_checkpoint_dates WHERE checkpoint_date >= date(OLD.entry_date);
+        END
+        ''',
+    ],
+    # 4: FIFO cost layers for the optional lot-tracking mode. Every receipt opens a layer, shipments take
+    # from the oldest open layers first and record what they took in shipment_cost_layers.
+    # The partial index only holds open layers, so the oldest one is a single index seek per item.
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS settings (
+            name TEXT PRIMARY KEY,
+            value TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS cost_layers (
+            id INTEGER PRIMARY KEY,  -- the incoming_items id of the receipt
+            store TEXT,
+            item_no TEXT,
+            item_name TEXT,
+            entry_date TEXT,
+            quantity INTEGER,
+            remaining_quantity INTEGER,
+            price REAL,
+            price_after_tax REAL
+        )
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_cost_layers_open ON cost_layers (store, item_no, item_name, entry_date, id)
+        WHERE remaining_quantity > 0
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS shipment_cost_layers (
+            shipment_id INTEGER,
+            layer_id INTEGER,
+            quantity INTEGER,
+            PRIMARY KEY (shipment_id, layer_id)
+        ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_shipment_cost_layers_layer ON shipment_cost_layers (layer_id)',
+    ],
+    # 5: stores and items dimension tables. The ledgers, balances, rollups, checkpoints and cost layers
+    # reference items by integer id instead of repeating the (store, item_no, item_name) text, so an
+    # item can be renamed in one place. The old table names stay as views with the old columns.
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS stores (
+            id INTEGER PRIMARY KEY,
+            name TEXT UNIQUE
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS items (
+            id INTEGER PRIMARY KEY,
+            store_id INTEGER REFERENCES stores (id),
+            item_no TEXT,
+            item_name TEXT,
+            UNIQUE (store_id, item_no, item_name)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_items_item_no ON items (item_no)',
+        'CREATE INDEX IF NOT EXISTS idx_items_item_name ON items (item_name)',
+        '''
+        INSERT INTO stores (name)
+        SELECT store FROM incoming_items UNION SELECT store FROM outgoing_shipments UNION SELECT store FROM inventory
+        UNION SELECT store FROM expense_entries UNION SELECT store FROM expenses UNION SELECT store FROM shipment_summary
+        UNION SELECT store FROM inventory_checkpoints UNION SELECT store FROM cost_layers
+        ''',
+        '''
+        INSERT INTO items (store_id, item_no, item_name)
+        SELECT s.id, t.item_no, t.item_name
+        FROM (
+            SELECT store, item_no, item_name FROM incoming_items UNION SELECT store, item_no, item_name FROM outgoing_shipments
+            UNION SELECT store, item_no, item_name FROM inventory UNION SELECT store, item_no, item_name FROM shipment_summary
+            UNION SELECT store, item_no, item_name FROM inventory_checkpoints UNION SELECT store, item_no, item_name FROM cost_layers
+        ) t
+        JOIN stores s ON s.name IS t.store
+        ''',
+
+        # Ledgers and balances, copied over with their ids
+        '''
+        CREATE TABLE IF NOT EXISTS incoming_ledger (
+            id INTEGER PRIMARY KEY,
+            item_id INTEGER REFERENCES items (id),
+            quantity INTEGER,
+            price REAL,
+            tax_rate REAL,
+            entry_date TEXT
+        )
+        ''',
+        '''
+        INSERT INTO incoming_ledger (id, item_id, quantity, price, tax_rate, entry_date)
+        SELECT t.id, i.id, t.quantity, t.price, t.tax_rate, t.entry_date
+        FROM incoming_items t JOIN stores s ON s.name IS t.store
+        JOIN items i ON i.store_id = s.id AND i.item_no IS t.item_no AND i.item_name IS t.item_name
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS outgoing_ledger (
+            id INTEGER PRIMARY KEY,
+            item_id INTEGER REFERENCES items (id),
+            quantity INTEGER,
+            average_price_at_shipment REAL,
+            average_price_at_shipment_after_tax REAL,
+            shipping_to TEXT,
+            entry_date TEXT
+        )
+        ''',
+        '''
+        INSERT INTO outgoing_ledger (id, item_id, quantity, average_price_at_shipment, average_price_at_shipment_after_tax, shipping_to, entry_date)
+        SELECT t.id, i.id, t.quantity, t.average_price_at_shipment, t.average_price_at_shipment_after_tax, t.shipping_to, t.entry_date
+        FROM outgoing_shipments t JOIN stores s ON s.name IS t.store
+        JOIN items i ON i.store_id = s.id AND i.item_no IS t.item_no AND i.item_name IS t.item_name
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS expense_ledger (
+            id INTEGER PRIMARY KEY,
+            store_id INTEGER REFERENCES stores (id),
+            item_name TEXT,
+            quantity INTEGER,
+            price REAL,
+            tax_rate REAL,
+            entry_date TEXT
+        )
+        ''',
+        '''
+        INSERT INTO expense_ledger (id, store_id, item_name, quantity, price, tax_rate, entry_date)
+        SELECT t.id, s.id, t.item_name, t.quantity, t.price, t.tax_rate, t.entry_date
+        FROM expense_entries t JOIN stores s ON s.name IS t.store
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS inventory_balances (
+            item_id INTEGER PRIMARY KEY REFERENCES items (id),
+            total_quantity INTEGER,
+            average_price_before_tax REAL,
+            average_price_after_tax REAL
+        )
+        ''',
+        '''
+        INSERT INTO inventory_balances (item_id, total_quantity, average_price_before_tax, average_price_after_tax)
+        SELECT i.id, t.total_quantity, t.average_price_before_tax, t.average_price_after_tax
+        FROM inventory t JOIN stores s ON s.name IS t.store
+        JOIN items i ON i.store_id = s.id AND i.item_no IS t.item_no AND i.item_name IS t.item_name
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS expense_balances (
+            store_id INTEGER REFERENCES stores (id),
+            item_name TEXT,
+            total_quantity INTEGER,
+            average_price_before_tax REAL,
+            average_price_after_tax REAL,
+            PRIMARY KEY (store_id, item_name)
+        )
+        ''',
+        '''
+        INSERT INTO expense_balances (store_id, item_name, total_quantity, average_price_before_tax, average_price_after_tax)
+        SELECT s.id, t.item_name, t.total_quantity, t.average_price_before_tax, t.average_price_after_tax
+        FROM expenses t JOIN stores s ON s.name IS t.store
+        ''',
+
+        # Rollups, checkpoints and cost layers keyed by item id
+        'ALTER TABLE shipment_summary RENAME TO shipment_summary_old',
+        'ALTER TABLE inventory_checkpoints RENAME TO inventory_checkpoints_old',
+        'ALTER TABLE cost_layers RENAME TO cost_layers_old',
+        '''
+        CREATE TABLE shipment_summary (
+            shipping_to TEXT,
+            item_id INTEGER,
+            day TEXT,
+            shipment_count INTEGER,
+            total_quantity INTEGER,
+            total_cost REAL,
+            total_cost_after_tax REAL,
+            PRIMARY KEY (shipping_to, item_id, day)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        INSERT INTO shipment_summary (shipping_to, item_id, day, shipment_count, total_quantity, total_cost, total_cost_after_tax)
+        SELECT shipping_to, item_id, date(entry_date), COUNT(*), SUM(quantity),
+               SUM(quantity * average_price_at_shipment), SUM(quantity * average_price_at_shipment_after_tax)
+        FROM outgoing_ledger
+        GROUP BY shipping_to, item_id, date(entry_date)
+        ''',
+        '''
+        CREATE TABLE inventory_checkpoints (
+            checkpoint_date TEXT,
+            item_id INTEGER,
+            total_quantity INTEGER,
+            average_price_before_tax REAL,
+            average_price_after_tax REAL,
+            PRIMARY KEY (checkpoint_date, item_id)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        INSERT INTO inventory_checkpoints (checkpoint_date, item_id, total_quantity, average_price_before_tax, average_price_after_tax)
+        SELECT t.checkpoint_date, i.id, t.total_quantity, t.average_price_before_tax, t.average_price_after_tax
+        FROM inventory_checkpoints_old t JOIN stores s ON s.name IS t.store
+        JOIN items i ON i.store_id = s.id AND i.item_no IS t.item_no AND i.item_name IS t.item_name
+        ''',
+        '''
+        CREATE TABLE cost_layers (
+            id INTEGER PRIMARY KEY,  -- the incoming_ledger id of the receipt
+            item_id INTEGER,
+            entry_date TEXT,
+            quantity INTEGER,
+            remaining_quantity INTEGER,
+            price REAL,
+            price_after_tax REAL
+        )
+        ''',
+        '''
+        INSERT INTO cost_layers (id, item_id, entry_date, quantity, remaining_quantity, price, price_after_tax)
+        SELECT t.id, i.id, t.entry_date, t.quantity, t.remaining_quantity, t.price, t.price_after_tax
+        FROM cost_layers_old t JOIN stores s ON s.name IS t.store
+        JOIN items i ON i.store_id = s.id AND i.item_no IS t.item_no AND i.item_name IS t.item_name
+        ''',
+
+        # Dropping the old tables drops their indexes and triggers too
+        'DROP TABLE incoming_items',
+        'DROP TABLE outgoing_shipments',
+        'DROP TABLE expense_entries',
+        'DROP TABLE inventory',
+        'DROP TABLE expenses',
+        'DROP TABLE shipment_summary_old',
+        'DROP TABLE inventory_checkpoints_old',
+        'DROP TABLE cost_layers_old',
+
+        # Compatibility views with the old names and columns, for exports and anything reading the tables directly
+        '''
+        CREATE VIEW incoming_items AS
+        SELECT l.id, s.name AS store, i.item_no, i.item_name, l.quantity, l.price, l.tax_rate, l.entry_date
+        FROM incoming_ledger l JOIN items i ON i.id = l.item_id JOIN stores s ON s.id = i.store_id
+        ''',
+        '''
+        CREATE VIEW outgoing_shipments AS
+        SELECT l.id, s.name AS store, i.item_name, i.item_no, l.quantity, l.average_price_at_shipment,
+               l.average_price_at_shipment_after_tax, l.shipping_to, l.entry_date
+        FROM outgoing_ledger l JOIN items i ON i.id = l.item_id JOIN stores s ON s.id = i.store_id
+        ''',
+        '''
+        CREATE VIEW expense_entries AS
+        SELECT l.id, s.name AS store, l.item_name, l.quantity, l.price, l.tax_rate, l.entry_date
+        FROM expense_ledger l JOIN stores s ON s.id = l.store_id
+        ''',
+        '''
+        CREATE VIEW inventory AS
+        SELECT s.name AS store, i.item_no, i.item_name, b.total_quantity, b.average_price_before_tax, b.average_price_after_tax
+        FROM inventory_balances b JOIN items i ON i.id = b.item_id JOIN stores s ON s.id = i.store_id
+        ''',
+        '''
+        CREATE VIEW expenses AS
+        SELECT s.name AS store, b.item_name, b.total_quantity, b.average_price_before_tax, b.average_price_after_tax
+        FROM expense_balances b JOIN stores s ON s.id = b.store_id
+        ''',
+
+        'CREATE INDEX idx_incoming_ledger_item ON incoming_ledger (item_id)',
+        'CREATE INDEX idx_incoming_ledger_entry_date ON incoming_ledger (entry_date)',
+        'CREATE INDEX idx_outgoing_ledger_item ON outgoing_ledger (item_id)',
+        'CREATE INDEX idx_outgoing_ledger_shipping_to ON outgoing_ledger (shipping_to)',
+        'CREATE INDEX idx_outgoing_ledger_entry_date ON outgoing_ledger (entry_date)',
+        'CREATE INDEX idx_expense_ledger_item ON expense_ledger (store_id, item_name)',
+        'CREATE INDEX idx_expense_ledger_entry_date ON expense_ledger (entry_date)',
+        'CREATE INDEX idx_shipment_summary_item ON shipment_summary (item_id)',
+        'CREATE INDEX idx_cost_layers_open ON cost_layers (item_id, entry_date, id) WHERE remaining_quantity > 0',
+
+        # The triggers of migrations 2 and 3, now on the ledger tables
+        '''
+        CREATE TRIGGER trg_shipment_summary_insert AFTER INSERT ON outgoing_ledger
+        BEGIN
+            INSERT INTO shipment_summary (shipping_to, item_id, day, shipment_count, total_quantity, total_cost, total_cost_after_tax)
+            VALUES (NEW.shipping_to, NEW.item_id, date(NEW.entry_date), 1, NEW.quantity,
+                    NEW.quantity * NEW.average_price_at_shipment, NEW.quantity * NEW.average_price_at_shipment_after_tax)
+            ON CONFLICT (shipping_to, item_id, day) DO UPDATE
+            SET shipment_count = shipment_count + 1,
+                total_quantity = total_quantity + excluded.total_quantity,
+                total_cost = total_cost + excluded.total_cost,
+                total_cost_after_tax = total_cost_after_tax + excluded.total_cost_after_tax;
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_shipment_summary_delete AFTER DELETE ON outgoing_ledger
+        BEGIN
+            UPDATE shipment_summary
+            SET shipment_count = shipment_count - 1,
+                total_quantity = total_quantity - OLD.quantity,
+                total_cost = total_cost - OLD.quantity * OLD.average_price_at_shipment,
+                total_cost_after_tax = total_cost_after_tax - OLD.quantity * OLD.average_price_at_shipment_after_tax
+            WHERE shipping_to = OLD.shipping_to AND item_id = OLD.item_id AND day = date(OLD.entry_date);
+            DELETE FROM shipment_summary
+            WHERE shipping_to = OLD.shipping_to AND item_id = OLD.item_id AND day = date(OLD.entry_date) AND shipment_count = 0;
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_shipment_summary_update AFTER UPDATE ON outgoing_ledger
+        BEGIN
+            UPDATE shipment_summary
+            SET shipment_count = shipment_count - 1,
+                total_quantity = total_quantity - OLD.quantity,
+                total_cost = total_cost - OLD.quantity * OLD.average_price_at_shipment,
+                total_cost_after_tax = total_cost_after_tax - OLD.quantity * OLD.average_price_at_shipment_after_tax
+            WHERE shipping_to = OLD.shipping_to AND item_id = OLD.item_id AND day = date(OLD.entry_date);
+            DELETE FROM shipment_summary
+            WHERE shipping_to = OLD.shipping_to AND item_id = OLD.item_id AND day = date(OLD.entry_date) AND shipment_count = 0;
+            INSERT INTO shipment_summary (shipping_to, item_id, day, shipment_count, total_quantity, total_cost, total_cost_after_tax)
+            VALUES (NEW.shipping_to, NEW.item_id, date(NEW.entry_date), 1, NEW.quantity,
+                    NEW.quantity * NEW.average_price_at_shipment, NEW.quantity * NEW.average_price_at_shipment_after_tax)
+            ON CONFLICT (shipping_to, item_id, day) DO UPDATE
+            SET shipment_count = shipment_count + 1,
+                total_quantity = total_quantity + excluded.total_quantity,
+                total_cost = total_cost + excluded.total_cost,
+                total_cost_after_tax = total_cost_after_tax + excluded.total_cost_after_tax;
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_incoming_ledger_checkpoints_insert AFTER INSERT ON incoming_ledger
+        BEGIN
+            DELETE FROM inventory_checkpoints WHERE checkpoint_date >= date(NEW.entry_date);
+            DELETE FROM inventory_checkpoint_dates WHERE checkpoint_date >= date(NEW.entry_date);
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_incoming_ledger_checkpoints_delete AFTER DELETE ON incoming_ledger
+        BEGIN
+            DELETE FROM inventory_checkpoints WHERE checkpoint_date >= date(OLD.entry_date);
+            DELETE FROM inventory_checkpoint_dates WHERE checkpoint_date >= date(OLD.entry_date);
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_outgoing_ledger_checkpoints_insert AFTER INSERT ON outgoing_ledger
+        BEGIN
+            DELETE FROM inventory_checkpoints WHERE checkpoint_date >= date(NEW.entry_date);
+            DELETE FROM inventory_checkpoint_dates WHERE checkpoint_date >= date(NEW.entry_date);
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_outgoing_ledger_checkpoints_delete AFTER DELETE ON outgoing_ledger
+        BEGIN
+            DELETE FROM inventory_checkpoints WHERE checkpoint_date >= date(OLD.entry_date);
+            DELETE FROM inventory_checkpoint_dates WHERE checkpoint_date >= date(OLD.entry_date);
+        END
+        ''',
+    ],
+    # 6: entry dates stored as entry_time, whole seconds since 1970-01-01 of the wall-clock time, and the
+    # shipment rollup keyed by epoch day (entry_time / 86400), so date ranges are integer index ranges.
+    # The views keep showing entry_date as "%Y-%m-%d %H:%M:%S" text.
+    [
+        # Views, triggers and indexes that reference entry_date have to go before the column can
+        'DROP VIEW incoming_items',
+        'DROP VIEW outgoing_shipments',
+        'DROP VIEW expense_entries',
+        'DROP TRIGGER trg_shipment_summary_insert',
+        'DROP TRIGGER trg_shipment_summary_delete',
+        'DROP TRIGGER trg_shipment_summary_update',
+        'DROP TRIGGER trg_incoming_ledger_checkpoints_insert',
+        'DROP TRIGGER trg_incoming_ledger_checkpoints_delete',
+        'DROP TRIGGER trg_outgoing_ledger_checkpoints_insert',
+        'DROP TRIGGER trg_outgoing_ledger_checkpoints_delete',
+        'DROP INDEX idx_incoming_ledger_entry_date',
+        'DROP INDEX idx_outgoing_ledger_entry_date',
+        'DROP INDEX idx_expense_ledger_entry_date',
+        'DROP INDEX idx_cost_layers_open',
+
+        'ALTER TABLE incoming_ledger ADD COLUMN entry_time INTEGER',
+        'UPDATE incoming_ledger SET entry_time = unixepoch(entry_date)',
+        'ALTER TABLE incoming_ledger DROP COLUMN entry_date',
+        'ALTER TABLE outgoing_ledger ADD COLUMN entry_time INTEGER',
+        'UPDATE outgoing_ledger SET entry_time = unixepoch(entry_date)',
+        'ALTER TABLE outgoing_ledger DROP COLUMN entry_date',
+        'ALTER TABLE expense_ledger ADD COLUMN entry_time INTEGER',
+        'UPDATE expense_ledger SET entry_time = unixepoch(entry_date)',
+        'ALTER TABLE expense_ledger DROP COLUMN entry_date',
+        'ALTER TABLE cost_layers ADD COLUMN entry_time INTEGER',
+        'UPDATE cost_layers SET entry_time = unixepoch(entry_date)',
+        'ALTER TABLE cost_layers DROP COLUMN entry_date',
+
+        'CREATE INDEX idx_incoming_ledger_entry_time ON incoming_ledger (entry_time)',
+        'CREATE INDEX idx_outgoing_ledger_entry_time ON outgoing_ledger (entry_time)',
+        'CREATE INDEX idx_expense_ledger_entry_time ON expense_ledger (entry_time)',
+        'CREATE INDEX idx_cost_layers_open ON cost_layers (item_id, entry_time, id) WHERE remaining_quantity > 0',
+
+        'DROP TABLE shipment_summary',
+        '''
+        CREATE TABLE shipment_summary (
+            shipping_to TEXT,
+            item_id INTEGER,
+            day INTEGER,
+            shipment_count INTEGER,
+            total_quantity INTEGER,
+            total_cost REAL,
+            total_cost_after_tax REAL,
+            PRIMARY KEY (shipping_to, item_id, day)
+        ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX idx_shipment_summary_item ON shipment_summary (item_id)',
+        'CREATE INDEX idx_shipment_summary_day ON shipment_summary (day)',
+        '''
+        INSERT INTO shipment_summary (shipping_to, item_id, day, shipment_count, total_quantity, total_cost, total_cost_after_tax)
+        SELECT shipping_to, item_id, entry_time / 86400, COUNT(*), SUM(quantity),
+               SUM(quantity * average_price_at_shipment), SUM(quantity * average_price_at_shipment_after_tax)
+        FROM outgoing_ledger
+        GROUP BY shipping_to, item_id, entry_time / 86400
+        ''',
+
+        '''
+        CREATE VIEW incoming_items AS
+        SELECT l.id, s.name AS store, i.item_no, i.item_name, l.quantity, l.price, l.tax_rate,
+               datetime(l.entry_time, 'unixepoch') AS entry_date
+        FROM incoming_ledger l JOIN items i ON i.id = l.item_id JOIN stores s ON s.id = i.store_id
+        ''',
+        '''
+        CREATE VIEW outgoing_shipments AS
+        SELECT l.id, s.name AS store, i.item_name, i.item_no, l.quantity, l.average_price_at_shipment,
+               l.average_price_at_shipment_after_tax, l.shipping_to, datetime(l.entry_time, 'unixepoch') AS entry_date
+        FROM outgoing_ledger l JOIN items i ON i.id = l.item_id JOIN stores s ON s.id = i.store_id
+        ''',
+        '''
+        CREATE VIEW expense_entries AS
+        SELECT l.id, s.name AS store, l.item_name, l.quantity, l.price, l.tax_rate,
+               datetime(l.entry_time, 'unixepoch') AS entry_date
+        FROM expense_ledger l JOIN stores s ON s.id = l.store_id
+        ''',
+
+        '''
+        CREATE TRIGGER trg_shipment_summary_insert AFTER INSERT ON outgoing_ledger
+        BEGIN
+            INSERT INTO shipment_summary (shipping_to, item_id, day, shipment_count, total_quantity, total_cost, total_cost_after_tax)
+            VALUES (NEW.shipping_to, NEW.item_id, NEW.entry_time / 86400, 1, NEW.quantity,
+                    NEW.quantity * NEW.average_price_at_shipment, NEW.quantity * NEW.average_price_at_shipment_after_tax)
+            ON CONFLICT (shipping_to, item_id, day) DO UPDATE
+            SET shipment_count = shipment_count + 1,
+                total_quantity = total_quantity + excluded.total_quantity,
+                total_cost = total_cost + excluded.total_cost,
+                total_cost_after_tax = total_cost_after_tax + excluded.total_cost_after_tax;
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_shipment_summary_delete AFTER DELETE ON outgoing_ledger
+        BEGIN
+            UPDATE shipment_summary
+            SET shipment_count = shipment_count - 1,
+                total_quantity = total_quantity - OLD.quantity,
+                total_cost = total_cost - OLD.quantity * OLD.average_price_at_shipment,
+                total_cost_after_tax = total_cost_after_tax - OLD.quantity * OLD.average_price_at_shipment_after_tax
+            WHERE shipping_to = OLD.shipping_to AND item_id = OLD.item_id AND day = OLD.entry_time / 86400;
+            DELETE FROM shipment_summary
+            WHERE shipping_to = OLD.shipping_to AND item_id = OLD.item_id AND day = OLD.entry_time / 86400 AND shipment_count = 0;
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_shipment_summary_update AFTER UPDATE ON outgoing_ledger
+        BEGIN
+            UPDATE shipment_summary
+            SET shipment_count = shipment_count - 1,
+                total_quantity = total_quantity - OLD.quantity,
+                total_cost = total_cost - OLD.quantity * OLD.average_price_at_shipment,
+                total_cost_after_tax = total_cost_after_tax - OLD.quantity * OLD.average_price_at_shipment_after_tax
+            WHERE shipping_to = OLD.shipping_to AND item_id = OLD.item_id AND day = OLD.entry_time / 86400;
+            DELETE FROM shipment_summary
+            WHERE shipping_to = OLD.shipping_to AND item_id = OLD.item_id AND day = OLD.entry_time / 86400 AND shipment_count = 0;
+            INSERT INTO shipment_summary (shipping_to, item_id, day, shipment_count, total_quantity, total_cost, total_cost_after_tax)
+            VALUES (NEW.shipping_to, NEW.item_id, NEW.entry_time / 86400, 1, NEW.quantity,
+                    NEW.quantity * NEW.average_price_at_shipment, NEW.quantity * NEW.average_price_at_shipment_after_tax)
+            ON CONFLICT (shipping_to, item_id, day) DO UPDATE
+            SET shipment_count = shipment_count + 1,
+                total_quantity = total_quantity + excluded.total_quantity,
+                total_cost = total_cost + excluded.total_cost,
+                total_cost_after_tax = total_cost_after_tax + excluded.total_cost_after_tax;
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_incoming_ledger_checkpoints_insert AFTER INSERT ON incoming_ledger
+        BEGIN
+            DELETE FROM inventory_checkpoints WHERE checkpoint_date >= date(NEW.entry_time, 'unixepoch');
+            DELETE FROM inventory_checkpoint_dates WHERE checkpoint_date >= date(NEW.entry_time, 'unixepoch');
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_incoming_ledger_checkpoints_delete AFTER DELETE ON incoming_ledger
+        BEGIN
+            DELETE FROM inventory_checkpoints WHERE checkpoint_date >= date(OLD.entry_time, 'unixepoch');
+            DELETE FROM inventory_checkpoint_dates WHERE checkpoint_date >= date(OLD.entry_time, 'unixepoch');
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_outgoing_ledger_checkpoints_insert AFTER INSERT ON outgoing_ledger
+        BEGIN
+            DELETE FROM inventory_checkpoints WHERE checkpoint_date >= date(NEW.entry_time, 'unixepoch');
+            DELETE FROM inventory_checkpoint_dates WHERE checkpoint_date >= date(NEW.entry_time, 'unixepoch');
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_outgoing_ledger_checkpoints_delete AFTER DELETE ON outgoing_ledger
+        BEGIN
+            DELETE FROM inventory_checkpoints WHERE checkpoint_date >= date(OLD.entry_time, 'unixepoch');
+            DELETE FROM inventory_checkpoint_dates WHERE checkpoint_date >= date(OLD.entry_time, 'unixepoch');
+        END
+        ''',
+    ],
+    # 7: an append-only, sequence-numbered log of every posting and reversal. inventory_balances and
+    # expense_balances become projections of it: projection_state holds the last seq applied to each, and a
+    # projection snapshot holds both as of a seq, so recovery replays only the events after it.
+    # Entries posted before the log are logged from their ledger rows in date order, and the balances as
+    # they stand are the first snapshot.
+    [
+        '''
+        CREATE TABLE events (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL CHECK (kind IN ('received', 'shipped', 'expensed', 'reversed')),
+            ledger TEXT NOT NULL CHECK (ledger IN ('incoming', 'outgoing', 'expense')),
+            entry_id INTEGER NOT NULL,
+            item_id INTEGER REFERENCES items (id),
+            store_id INTEGER REFERENCES stores (id),
+            item_name TEXT,
+            quantity INTEGER NOT NULL,
+            unit_cost REAL NOT NULL,
+            unit_cost_after_tax REAL NOT NULL,
+            entry_time INTEGER NOT NULL,
+            recorded_time INTEGER NOT NULL DEFAULT (unixepoch())
+        )
+        ''',
+        '''
+        INSERT INTO events (kind, ledger, entry_id, item_id, store_id, item_name, quantity, unit_cost, unit_cost_after_tax, entry_time)
+        SELECT kind, ledger, id, item_id, store_id, item_name, quantity, unit_cost, unit_cost_after_tax, entry_time
+        FROM (
+            SELECT 'received' AS kind, 'incoming' AS ledger, 0 AS position, id, item_id, NULL AS store_id,
+                   NULL AS item_name, quantity, price AS unit_cost, price + price * tax_rate / 100 AS unit_cost_after_tax, entry_time
+            FROM incoming_ledger
+            UNION ALL
+            SELECT 'shipped', 'outgoing', 1, id, item_id, NULL, NULL, quantity, average_price_at_shipment,
+                   average_price_at_shipment_after_tax, entry_time
+            FROM outgoing_ledger
+            UNION ALL
+            SELECT 'expensed', 'expense', 2, id, NULL, store_id, item_name, quantity, price, price + price * tax_rate / 100, entry_time
+            FROM expense_ledger
+        )
+        ORDER BY entry_time, position, id
+        ''',
+        '''
+        CREATE TRIGGER trg_events_no_update BEFORE UPDATE ON events
+        BEGIN
+            SELECT RAISE(ABORT, 'events are append-only');
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_events_no_delete BEFORE DELETE ON events
+        BEGIN
+            SELECT RAISE(ABORT, 'events are append-only');
+        END
+        ''',
+
+        '''
+        CREATE TABLE projection_state (
+            name TEXT PRIMARY KEY,
+            last_seq INTEGER NOT NULL
+        )
+        ''',
+        '''
+        INSERT INTO projection_state (name, last_seq)
+        SELECT 'inventory_balances', COALESCE(MAX(seq), 0) FROM events
+        UNION ALL
+        SELECT 'expense_balances', COALESCE(MAX(seq), 0) FROM events
+        ''',
+
+        '''
+        CREATE TABLE projection_snapshots (
+            seq INTEGER PRIMARY KEY,
+            created_time INTEGER NOT NULL DEFAULT (unixepoch())
+        )
+        ''',
+        '''
+        CREATE TABLE inventory_snapshots (
+            seq INTEGER,
+            item_id INTEGER,
+            total_quantity INTEGER,
+            average_price_before_tax REAL,
+            average_price_after_tax REAL,
+            PRIMARY KEY (seq, item_id)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE expense_snapshots (
+            seq INTEGER,
+            store_id INTEGER,
+            item_name TEXT,
+            total_quantity INTEGER,
+            average_price_before_tax REAL,
+            average_price_after_tax REAL,
+            PRIMARY KEY (seq, store_id, item_name)
+        ) WITHOUT ROWID
+        ''',
+        'INSERT INTO projection_snapshots (seq) SELECT COALESCE(MAX(seq), 0) FROM events',
+        '''
+        INSERT INTO inventory_snapshots (seq, item_id, total_quantity, average_price_before_tax, average_price_after_tax)
+        SELECT (SELECT MAX(seq) FROM projection_snapshots), item_id, total_quantity, average_price_before_tax, average_price_after_tax
+        FROM inventory_balances
+        ''',
+        '''
+        INSERT INTO expense_snapshots (seq, store_id, item_name, total_quantity, average_price_before_tax, average_price_after_tax)
+        SELECT (SELECT MAX(seq) FROM projection_snapshots), store_id, item_name, total_quantity, average_price_before_tax, average_price_after_tax
+        FROM expense_balances
+        ''',
+    ],
+    # 8: a version on every inventory row, bumped whenever the row is written. Postings write a row back only
+    # if its version is still the one they read, so two stations can never both spend the same stock.
+    [
+        'ALTER TABLE inventory_balances ADD COLUMN version INTEGER NOT NULL DEFAULT 0',
+    ],
+    # 9: ledger ids that are never handed out twice. Without AUTOINCREMENT, reversing the newest entry frees
+    # its id for the next posting, and the events of both then share an entry_id. The tables are rebuilt
+    # with their ids, and the sequences start past every id the event log has seen.
+    [
+        # The views go first, a table can't be renamed while a view names a table that is gone
+        'DROP VIEW incoming_items',
+        'DROP VIEW outgoing_shipments',
+        'DROP VIEW expense_entries',
+
+        '''
+        CREATE TABLE incoming_ledger_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            item_id INTEGER REFERENCES items (id),
+            quantity INTEGER,
+            price REAL,
+            tax_rate REAL,
+            entry_time INTEGER
+        )
+        ''',
+        '''
+        INSERT INTO incoming_ledger_new (id, item_id, quantity, price, tax_rate, entry_time)
+        SELECT id, item_id, quantity, price, tax_rate, entry_time FROM incoming_ledger
+        ''',
+        '''
+        CREATE TABLE outgoing_ledger_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            item_id INTEGER REFERENCES items (id),
+            quantity INTEGER,
+            average_price_at_shipment REAL,
+            average_price_at_shipment_after_tax REAL,
+            shipping_to TEXT,
+            entry_time INTEGER
+        )
+        ''',
+        '''
+        INSERT INTO outgoing_ledger_new (id, item_id, quantity, average_price_at_shipment, average_price_at_shipment_after_tax, shipping_to, entry_time)
+        SELECT id, item_id, quantity, average_price_at_shipment, average_price_at_shipment_after_tax, shipping_to, entry_time
+        FROM outgoing_ledger
+        ''',
+        '''
+        CREATE TABLE expense_ledger_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            store_id INTEGER REFERENCES stores (id),
+            item_name TEXT,
+            quantity INTEGER,
+            price REAL,
+            tax_rate REAL,
+            entry_time INTEGER
+        )
+        ''',
+        '''
+        INSERT INTO expense_ledger_new (id, store_id, item_name, quantity, price, tax_rate, entry_time)
+        SELECT id, store_id, item_name, quantity, price, tax_rate, entry_time FROM expense_ledger
+        ''',
+
+        # Dropping the old tables drops their indexes and triggers too
+        'DROP TABLE incoming_ledger',
+        'DROP TABLE outgoing_ledger',
+        'DROP TABLE expense_ledger',
+        'ALTER TABLE incoming_ledger_new RENAME TO incoming_ledger',
+        'ALTER TABLE outgoing_ledger_new RENAME TO outgoing_ledger',
+        'ALTER TABLE expense_ledger_new RENAME TO expense_ledger',
+
+        "DELETE FROM sqlite_sequence WHERE name IN ('incoming_ledger', 'outgoing_ledger', 'expense_ledger')",
+        '''
+        INSERT INTO sqlite_sequence (name, seq)
+        SELECT name, MAX(id) FROM (
+            SELECT 'incoming_ledger' AS name, id FROM incoming_ledger
+            UNION ALL
+            SELECT 'outgoing_ledger', id FROM outgoing_ledger
+            UNION ALL
+            SELECT 'expense_ledger', id FROM expense_ledger
+            UNION ALL
+            SELECT ledger || '_ledger', entry_id FROM events
+        )
+        GROUP BY name
+        ''',
+
+        'CREATE INDEX idx_incoming_ledger_item ON incoming_ledger (item_id)',
+        'CREATE INDEX idx_incoming_ledger_entry_time ON incoming_ledger (entry_time)',
+        'CREATE INDEX idx_outgoing_ledger_item ON outgoing_ledger (item_id)',
+        'CREATE INDEX idx_outgoing_ledger_shipping_to ON outgoing_ledger (shipping_to)',
+        'CREATE INDEX idx_outgoing_ledger_entry_time ON outgoing_ledger (entry_time)',
+        'CREATE INDEX idx_expense_ledger_item ON expense_ledger (store_id, item_name)',
+        'CREATE INDEX idx_expense_ledger_entry_time ON expense_ledger (entry_time)',
+
+        # The views and triggers of migration 6, on the rebuilt tables
+        '''
+        CREATE VIEW incoming_items AS
+        SELECT l.id, s.name AS store, i.item_no, i.item_name, l.quantity, l.price, l.tax_rate,
+               datetime(l.entry_time, 'unixepoch') AS entry_date
+        FROM incoming_ledger l JOIN items i ON i.id = l.item_id JOIN stores s ON s.id = i.store_id
+        ''',
+        '''
+        CREATE VIEW outgoing_shipments AS
+        SELECT l.id, s.name AS store, i.item_name, i.item_no, l.quantity, l.average_price_at_shipment,
+               l.average_price_at_shipment_after_tax, l.shipping_to, datetime(l.entry_time, 'unixepoch') AS entry_date
+        FROM outgoing_ledger l JOIN items i ON i.id = l.item_id JOIN stores s ON s.id = i.store_id
+        ''',
+        '''
+        CREATE VIEW expense_entries AS
+        SELECT l.id, s.name AS store, l.item_name, l.quantity, l.price, l.tax_rate,
+               datetime(l.entry_time, 'unixepoch') AS entry_date
+        FROM expense_ledger l JOIN stores s ON s.id = l.store_id
+        ''',
+
+        '''
+        CREATE TRIGGER trg_shipment_summary_insert AFTER INSERT ON outgoing_ledger
+        BEGIN
+            INSERT INTO shipment_summary (shipping_to, item_id, day, shipment_count, total_quantity, total_cost, total_cost_after_tax)
+            VALUES (NEW.shipping_to, NEW.item_id, NEW.entry_time / 86400, 1, NEW.quantity,
+                    NEW.quantity * NEW.average_price_at_shipment, NEW.quantity * NEW.average_price_at_shipment_after_tax)
+            ON CONFLICT (shipping_to, item_id, day) DO UPDATE
+            SET shipment_count = shipment_count + 1,
+                total_quantity = total_quantity + excluded.total_quantity,
+                total_cost = total_cost + excluded.total_cost,
+                total_cost_after_tax = total_cost_after_tax + excluded.total_cost_after_tax;
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_shipment_summary_delete AFTER DELETE ON outgoing_ledger
+        BEGIN
+            UPDATE shipment_summary
+            SET shipment_count = shipment_count - 1,
+                total_quantity = total_quantity - OLD.quantity,
+                total_cost = total_cost - OLD.quantity * OLD.average_price_at_shipment,
+                total_cost_after_tax = total_cost_after_tax - OLD.quantity * OLD.average_price_at_shipment_after_tax
+            WHERE shipping_to = OLD.shipping_to AND item_id = OLD.item_id AND day = OLD.entry_time / 86400;
+            DELETE FROM shipment_summary
+            WHERE shipping_to = OLD.shipping_to AND item_id = OLD.item_id AND day = OLD.entry_time / 86400 AND shipment_count = 0;
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_shipment_summary_update AFTER UPDATE ON outgoing_ledger
+        BEGIN
+            UPDATE shipment_summary
+            SET shipment_count = shipment_count - 1,
+                total_quantity = total_quantity - OLD.quantity,
+                total_cost = total_cost - OLD.quantity * OLD.average_price_at_shipment,
+                total_cost_after_tax = total_cost_after_tax - OLD.quantity * OLD.average_price_at_shipment_after_tax
+            WHERE shipping_to = OLD.shipping_to AND item_id = OLD.item_id AND day = OLD.entry_time / 86400;
+            DELETE FROM shipment_summary
+            WHERE shipping_to = OLD.shipping_to AND item_id = OLD.item_id AND day = OLD.entry_time / 86400 AND shipment_count = 0;
+            INSERT INTO shipment_summary (shipping_to, item_id, day, shipment_count, total_quantity, total_cost, total_cost_after_tax)
+            VALUES (NEW.shipping_to, NEW.item_id, NEW.entry_time / 86400, 1, NEW.quantity,
+                    NEW.quantity * NEW.average_price_at_shipment, NEW.quantity * NEW.average_price_at_shipment_after_tax)
+            ON CONFLICT (shipping_to, item_id, day) DO UPDATE
+            SET shipment_count = shipment_count + 1,
+                total_quantity = total_quantity + excluded.total_quantity,
+                total_cost = total_cost + excluded.total_cost,
+                total_cost_after_tax = total_cost_after_tax + excluded.total_cost_after_tax;
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_incoming_ledger_checkpoints_insert AFTER INSERT ON incoming_ledger
+        BEGIN
+            DELETE FROM inventory_checkpoints WHERE checkpoint_date >= date(NEW.entry_time, 'unixepoch');
+            DELETE FROM inventory_checkpoint_dates WHERE checkpoint_date >= date(NEW.entry_time, 'unixepoch');
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_incoming_ledger_checkpoints_delete AFTER DELETE ON incoming_ledger
+        BEGIN
+            DELETE FROM inventory_checkpoints WHERE checkpoint_date >= date(OLD.entry_time, 'unixepoch');
+            DELETE FROM inventory_checkpoint_dates WHERE checkpoint_date >= date(OLD.entry_time, 'unixepoch');
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_outgoing_ledger_checkpoints_insert AFTER INSERT ON outgoing_ledger
+        BEGIN
+            DELETE FROM inventory_checkpoints WHERE checkpoint_date >= date(NEW.entry_time, 'unixepoch');
+            DELETE FROM inventory_checkpoint_dates WHERE checkpoint_date >= date(NEW.entry_time, 'unixepoch');
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_outgoing_ledger_checkpoints_delete AFTER DELETE ON outgoing_ledger
+        BEGIN
+            DELETE FROM inventory_checkpoints WHERE checkpoint_date >= date(OLD.entry_time, 'unixepoch');
+            DELETE FROM inventory_checkpoint_dates WHERE checkpoint_date >= date(OLD.entry_time, 'unixepoch');
+        END
+        ''',
+    ],
+]
+
+
+def migrate(conn):
+    cursor = conn.cursor()
+    version = cursor.execute('PRAGMA user_version').fetchone()[0]
+    for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+        # Each migration and its version bump commit together
+        with transaction(conn):
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.execute(f'PRAGMA user_version = {number}')
+
+
+class InventoryEngine:
+
+    def __init__(self, conn, setup=True):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.lot_tracking = False
+        # Write-through cache of inventory rows (None for items not in the inventory) keyed by item id,
+        # so stock checks are a dict lookup, and the version of each row as it was read or written
+        self.inventory_cache = {}
+        self.inventory_versions = {}
+        self.inventory_cache_stats = {"hits": 0, "misses": 0}
+        # Ids of the stores and items looked up so far, keyed by name and by (store, item_no, item_name)
+        self.store_ids = {}
+        self.item_ids = {}
+        self.data_version = None
+        if setup:
+            self.setup()
+
+    def setup(self):
+        # Create the tables and apply pending migrations, the app defers this until after first paint
+        create_tables(self.conn)
+        migrate(self.conn)
+        self.lot_tracking = self.get_setting("lot_tracking") == "1"
+
+    def get_setting(self, name, default=None):
+        self.cursor.execute(STATEMENTS["get_setting"], (name,))
+        row = self.cursor.fetchone()
+        return row[0] if row else default
+
+    def set_setting(self, name, value):
+        self.cursor.execute(STATEMENTS["set_setting"], (name, str(value)))
+
+    # ---- Inventory cache ----
+
+    def clear_inventory_cache(self):
+        # Callers that run postings inside a transaction of their own must call this when it rolls back
+        self.inventory_cache.clear()
+        self.inventory_versions.clear()
+        self.store_ids.clear()
+        self.item_ids.clear()
+
+    def _sync_inventory_cache(self):
+        # data_version changes when another connection commits, which may have changed any row or turned
+        # lot tracking on or off, and the cache generation when a rebuild or recovery rewrote the tables on this one
+        version = (self.conn.execute(STATEMENTS["data_version"]).fetchone()[0], cache_generation(self.conn))
+        if version != self.data_version:
+            self.clear_inventory_cache()
+            self.lot_tracking = self.get_setting("lot_tracking") == "1"
+            self.data_version = version
+
+    @contextmanager
+    def _inventory_transaction(self):
+        # Postings that change the inventory: the cache is checked against other connections once the
+        # write lock is held, and dropped if the posting fails, since it may hold rows that were rolled back
+        try:
+            with transaction(self.conn):
+                self._sync_inventory_cache()
+                yield
+        except BaseException:
+            self.clear_inventory_cache()
+            raise
+
+    def _cache_inventory_item(self, item_id, row, version):
+        self.inventory_cache[item_id] = tuple(row) if row else None
+        self.inventory_versions[item_id] = version
+
+    # ---- Stores and items ----
+
+    def _store_id(self, store, create=False):
+        # Id of the store, None if it is unknown, unless create is set
+        store_id = self.store_ids.get(store)
+        if store_id is not None:
+            return store_id
+        self.cursor.execute(STATEMENTS["store_id"], (store,))
+        row = self.cursor.fetchone()
+        if row:
+            store_id = row[0]
+        elif create:
+            self.cursor.execute(STATEMENTS["insert_store"], (store,))
+            store_id = self.cursor.lastrowid
+        else:
+            return None
+        self.store_ids[store] = store_id
+        return store_id
+
+    def _item_id(self, store, item_no, item_name, create=False):
+        # Id of the item, None if it is unknown, unless create is set
+        key = (store, item_no, item_name)
+        item_id = self.item_ids.get(key)
+        if item_id is not None:
+            return item_id
+        store_id = self._store_id(store, create)
+        if store_id is None:
+            return None
+        self.cursor.execute(STATEMENTS["item_id"], (store_id, item_no, item_name))
+        row = self.cursor.fetchone()
+        if row:
+            item_id = row[0]
+        elif create:
+            self.cursor.execute(STATEMENTS["insert_item"], (store_id, item_no, item_name))
+            item_id = self.cursor.lastrowid
+        else:
+            return None
+        self.item_ids[key] = item_id
+        return item_id
+
+    def rename_item(self, store, item_no, item_name, new_item_no, new_item_name):
+        # Ledgers, balances and reports reference the item by id, so they all follow the new name
+        with transaction(self.conn):
+            store, item_no, item_name = clean_input(store), clean_input(item_no), clean_input(item_name)
+            new_item_no, new_item_name = clean_input(new_item_no), clean_input(new_item_name)
+            item_id = self._item_id(store, item_no, item_name)
+            if item_id is None:
+                raise ItemNotFoundError(f"Item ({store}, {item_no}, {item_name}) not found.")
+            existing_id = self._item_id(store, new_item_no, new_item_name)
+            if existing_id is not None and existing_id != item_id:
+                raise InventoryError(f"Item ({store}, {new_item_no}, {new_item_name}) already exists.")
+            self.cursor.execute(STATEMENTS["rename_item"], (new_item_no, new_item_name, item_id))
+            self.clear_inventory_cache()
+            return (store, new_item_no, new_item_name)
+
+    # ---- Postings ----
+
+    @retries_conflicts
+    def receive(self, item):
+        with self._inventory_transaction():
+            store = clean_input(item.store)
+            item_no = clean_input(item.item_no)
+            item_name = clean_input(item.item_name)
+            quantity = int(item.quantity)
+            price = float(item.price)
+            tax_rate = float(item.tax_rate)
+            entry_time = date_to_epoch(item.entry_date or datetime.now())
+
+            item_id = self._item_id(store, item_no, item_name, create=True)
+            self.cursor.execute(STATEMENTS["incoming_insert"], (item_id, quantity, price, tax_rate, entry_time))
+            entry_id = self.cursor.lastrowid
+
+            self._log_postings("incoming", entry_id - 1)
+            self._catch_up()
+            if self.lot_tracking:
+                self._open_cost_layers(entry_id - 1)
+            return entry_id
+
+    @retries_conflicts
+    def ship(self, shipment):
+        with self._inventory_transaction():
+            store = clean_input(shipment.store)
+            item_no = clean_input(shipment.item_no)
+            item_name = clean_input(shipment.item_name)
+            quantity = int(shipment.quantity)
+            shipping_to = clean_input(shipment.shipping_to)
+            entry_time = date_to_epoch(shipment.entry_date or datetime.now())
+
+            # Check if there is enough quantity in the inventory
+            item_id = self._item_id(store, item_no, item_name)
+            result = self._inventory_row(item_id) if item_id is not None else None
+            if not result:
+                raise ItemNotFoundError(
+                    f"Item ({store}, {item_no}, {item_name}) not found in the inventory.")
+            if result[0] < quantity:
+                raise InsufficientQuantityError(
+                    f"Not enough quantity in the inventory. Available quantity for ({store}, {item_no}, {item_name}): {result[0]}.", result[0])
+
+            average_price_at_shipment = result[1]
+            average_price_after_tax_at_shipment = result[2]
+
+            self.cursor.execute(STATEMENTS["outgoing_insert"], (
+                item_id, quantity, shipping_to, average_price_at_shipment, average_price_after_tax_at_shipment, entry_time))
+            entry_id = self.cursor.lastrowid
+
+            self._log_postings("outgoing", entry_id - 1)
+            self._catch_up()
+            if self.lot_tracking:
+                self._consume_cost_layers(entry_id, item_id, quantity)
+
+            shipment.average_price_at_shipment = average_price_at_shipment
+            shipment.average_price_at_shipment_after_tax = average_price_after_tax_at_shipment
+            return entry_id
+
+    @retries_conflicts
+    def add_expense(self, entry):
+        with self._inventory_transaction():
+            store = clean_input(entry.store)
+            item_name = clean_input(entry.item_name)
+            quantity = int(entry.quantity)
+            price = float(entry.price)
+            tax_rate = float(entry.tax_rate)
+            entry_time = date_to_epoch(entry.entry_date or datetime.now())
+
+            store_id = self._store_id(store, create=True)
+            self.cursor.execute(STATEMENTS["expense_insert"], (store_id, item_name, quantity, price, tax_rate, entry_time))
+            entry_id = self.cursor.lastrowid
+
+            self._log_postings("expense", entry_id - 1)
+            self._catch_up()
+            return entry_id
+
+    # ---- Batch postings, one transaction per batch ----
+
+    @retries_conflicts
+    def receive_batch(self, items):
+        # Returns the entry ids of the receipts, in order
+        with self._inventory_transaction():
+            rows = [(self._item_id(clean_input(item.store), clean_input(item.item_no), clean_input(item.item_name), create=True),
+                     int(item.quantity), float(item.price), float(item.tax_rate),
+                     date_to_epoch(item.entry_date or datetime.now()))
+                    for item in items]
+            if not rows:
+                return []
+
+            last_id = self._last_id("incoming")
+            self.cursor.executemany(STATEMENTS["incoming_insert"], rows)
+
+            self._log_postings("incoming", last_id)
+            self._catch_up()
+            if self.lot_tracking:
+                self._open_cost_layers(last_id)
+            return self._ids_since("incoming", last_id)
+
+    @retries_conflicts
+    def ship_batch(self, shipments):
+        # Returns the entry ids of the shipments that were posted, in order, and the ones that were rejected
+        # as (shipment, error) pairs
+        with self._inventory_transaction():
+            ids = []
+            rows = []
+            rejected = []
+            stock = {}
+            for shipment in shipments:
+                key = (clean_input(shipment.store), clean_input(shipment.item_no), clean_input(shipment.item_name))
+                quantity = int(shipment.quantity)
+
+                # Check the running quantity, so rows earlier in the batch count against later ones
+                item_id = self._item_id(*key)
+                if item_id not in stock:
+                    stock[item_id] = self._inventory_row(item_id) if item_id is not None else None
+                result = stock[item_id]
+                if not result:
+                    rejected.append((shipment, ItemNotFoundError(
+                        f"Item ({key[0]}, {key[1]}, {key[2]}) not found in the inventory.")))
+                    continue
+                if result[0] < quantity:
+                    rejected.append((shipment, InsufficientQuantityError(
+                        f"Not enough quantity in the inventory. Available quantity for ({key[0]}, {key[1]}, {key[2]}): {result[0]}.", result[0])))
+                    continue
+                stock[item_id] = (result[0] - quantity, result[1], result[2])
+
+                shipment.average_price_at_shipment = result[1]
+                shipment.average_price_at_shipment_after_tax = result[2]
+                rows.append((item_id, quantity, clean_input(shipment.shipping_to), result[1], result[2],
+                             date_to_epoch(shipment.entry_date or datetime.now())))
+
+            if rows:
+                last_id = self._last_id("outgoing")
+                self.cursor.executemany(STATEMENTS["outgoing_insert"], rows)
+                self._log_postings("outgoing", last_id)
+                self._catch_up()
+                if self.lot_tracking:
+                    self.cursor.execute(STATEMENTS["outgoing_since"], (last_id,))
+                    for shipment_id, item_id, quantity in self.cursor.fetchall():
+                        self._consume_cost_layers(shipment_id, item_id, quantity)
+                ids = self._ids_since("outgoing", last_id)
+            return ids, rejected
+
+    @retries_conflicts
+    def add_expense_batch(self, entries):
+        # Returns the entry ids of the expenses, in order
+        with self._inventory_transaction():
+            rows = [(self._store_id(clean_input(entry.store), create=True), clean_input(entry.item_name), int(entry.quantity),
+                     float(entry.price), float(entry.tax_rate), date_to_epoch(entry.entry_date or datetime.now()))
+                    for entry in entries]
+            if not rows:
+                return []
+
+            last_id = self._last_id("expense")
+            self.cursor.executemany(STATEMENTS["expense_insert"], rows)
+
+            self._log_postings("expense", last_id)
+            self._catch_up()
+            return self._ids_since("expense", last_id)
+
+    # ---- Reversals ----
+
+    @retries_conflicts
+    def reverse_incoming(self, entry_id):
+        # Returns the (store, item_no, item_name) key and whether store_item_triplets() still lists the item
+        with self._inventory_transaction():
+            self.cursor.execute(STATEMENTS["incoming_entry"], (entry_id,))
+            entry = self.cursor.fetchone()
+            if not entry:
+                raise ItemNotFoundError("Selected entry no longer exists.")
+            item_id, store, item_no, item_name, quantity = entry
+
+            # Get the inventory details for this item item's values
+            inventory_info = self._inventory_row(item_id)
+            if not inventory_info:
+                raise ItemNotFoundError("Selected item is not in the inventory.")
+
+            current_quantity = int(inventory_info[0])
+            if current_quantity < quantity:
+                raise InsufficientQuantityError(
+                    f"Selected entry cannot be deleted because some of them are already shipped. Remaining quantity in the inventory is {current_quantity}.", current_quantity)
+
+            # Log the reversal from the entry, then delete the selected entry from the incoming ledger
+            self._log_reversal("incoming", entry_id)
+            self.cursor.execute(STATEMENTS["incoming_delete"], (entry_id,))
+            if self.lot_tracking:
+                self._close_cost_layer(entry_id)
+            self._catch_up()
+
+            return (store, item_no, item_name), self._is_listed(item_id)
+
+    @retries_conflicts
+    def reverse_shipment(self, entry_id):
+        # Returns the (store, item_no, item_name) key and whether store_item_triplets() still lists the item
+        with self._inventory_transaction():
+            self.cursor.execute(STATEMENTS["outgoing_entry"], (entry_id,))
+            entry = self.cursor.fetchone()
+            if not entry:
+                raise ItemNotFoundError("Selected entry no longer exists.")
+            item_id, store, item_no, item_name = entry
+
+            # The shipped quantity goes back into the inventory at the cost it left with
+            self._log_reversal("outgoing", entry_id)
+            self.cursor.execute(STATEMENTS["outgoing_delete"], (entry_id,))
+            if self.lot_tracking:
+                self._restore_cost_layers(entry_id)
+            self._catch_up()
+
+            return (store, item_no, item_name), self._is_listed(item_id)
+
+    @retries_conflicts
+    def reverse_expense(self, entry_id):
+        with self._inventory_transaction():
+            self.cursor.execute(STATEMENTS["expense_entry"], (entry_id,))
+            entry = self.cursor.fetchone()
+            if not entry:
+                raise ItemNotFoundError("Selected entry no longer exists.")
+            store_id, store, item_name = entry
+
+            if not self._expense_row(store_id, item_name):
+                raise ItemNotFoundError("Selected expense is not in the expense summary.")
+
+            # Log the reversal from the entry, then delete the selected entry from the expense ledger
+            self._log_reversal("expense", entry_id)
+            self.cursor.execute(STATEMENTS["expense_delete"], (entry_id,))
+            self._catch_up()
+
+            return (store, item_name)
+
+    # ---- Event log and projections ----
+
+    def _log_postings(self, ledger, after_id):
+        # Log the ledger rows just inserted (every id after after_id), in id order
+        self.cursor.execute(STATEMENTS[f"{ledger}_log_postings"], (after_id,))
+
+    def _log_reversal(self, ledger, entry_id):
+        # Log the reversal of a ledger row before it is deleted, with the quantity and costs it was posted at
+        self.cursor.execute(STATEMENTS[f"{ledger}_log_reversal"], (entry_id,))
+
+    def _expense_row(self, store_id, item_name):
+        self.cursor.execute(STATEMENTS["expense_row"], (store_id, item_name))
+        return self.cursor.fetchone()
+
+    def _catch_up(self):
+        # Apply the events logged since each projection's last_seq to it, in seq order, and return how many
+        # were applied. Every posting calls this inside its own transaction, so the projections only fall
+        # behind the log when something else appended to it.
+        last_seqs = dict(self.conn.execute(STATEMENTS["projection_state"]))
+        events = self.conn.execute(STATEMENTS["events_after"], (min(last_seqs.values()),)).fetchall()
+        if not events:
+            return 0
+
+        inventory, expenses = {}, {}
+        applied = 0
+        for seq, kind, ledger, item_id, store_id, item_name, quantity, unit_cost, unit_cost_after_tax in events:
+            if ledger == "expense":
+                if seq <= last_seqs["expense_balances"]:
+                    continue
+                key = (store_id, item_name)
+                row = expenses[key] if key in expenses else self._expense_row(*key)
+                expenses[key] = apply_event(row, kind, ledger, quantity, unit_cost, unit_cost_after_tax)
+            else:
+                if seq <= last_seqs["inventory_balances"]:
+                    continue
+                row = inventory[item_id] if item_id in inventory else self._inventory_row(item_id)
+                inventory[item_id] = apply_event(row, kind, ledger, quantity, unit_cost, unit_cost_after_tax)
+            applied += 1
+
+        # Each row is written back only if its version is still the one read, and a row that lost stock only
+        # if the stock is still there, otherwise another connection got to it first
+        removed, updated, added = [], [], []
+        for item_id, row in inventory.items():
+            version = self.inventory_versions.get(item_id)
+            if version is None:
+                if row is not None:
+                    added.append((item_id, *row))
+            elif row is None:
+                removed.append((item_id, version))
+            else:
+                taken = max(0, self.inventory_cache[item_id][0] - row[0])
+                updated.append((*row, item_id, version, taken))
+        self._write_inventory_rows(STATEMENTS["delete_inventory_row"], removed)
+        self._write_inventory_rows(STATEMENTS["update_inventory_row"], updated)
+        self._write_inventory_rows(STATEMENTS["insert_inventory_row"], added)
+        for item_id, row in inventory.items():
+            version = self.inventory_versions.get(item_id)
+            self._cache_inventory_item(item_id, row, None if row is None else 0 if version is None else version + 1)
+
+        removed = [key for key, row in expenses.items() if row is None]
+        if removed:
+            self.cursor.executemany(STATEMENTS["delete_expense_row"], removed)
+        updated = [(*key, *row) for key, row in expenses.items() if row is not None]
+        if updated:
+            self.cursor.executemany(STATEMENTS["upsert_expense_row"], updated)
+        self.cursor.execute(STATEMENTS["set_projection_seq"], (events[-1][0],))
+        return applied
+
+    def _write_inventory_rows(self, statement, rows):
+        if not rows:
+            return
+        try:
+            self.cursor.executemany(statement, rows)
+            written = self.cursor.rowcount
+        except sqlite3.IntegrityError:
+            written = -1
+        if written != len(rows):
+            raise ConcurrentUpdateError("The inventory was changed by another station while posting.")
+
+    @retries_conflicts
+    def catch_up(self):
+        # Bring the projections up to the end of the log, for recovery after they were restored from a snapshot
+        with self._inventory_transaction():
+            return self._catch_up()
+
+    # ---- FIFO cost layers (lot-tracking mode) ----
+
+    def _last_id(self, ledger):
+        self.cursor.execute(STATEMENTS[f"{ledger}_last_id"])
+        return self.cursor.fetchone()[0] or 0
+
+    def _ids_since(self, ledger, last_id):
+        # Ids of the rows a batch just inserted after last_id, executemany leaves no lastrowid per row
+        self.cursor.execute(STATEMENTS[f"{ledger}_ids_since"], (last_id,))
+        return [entry_id for entry_id, in self.cursor.fetchall()]
+
+    def _open_cost_layers(self, after_id):
+        # One layer for every receipt posted after incoming_ledger id `after_id`
+        self.cursor.execute(STATEMENTS["open_cost_layers"], (after_id,))
+
+    def _consume_cost_layers(self, shipment_id, item_id, quantity):
+        # Take the shipped quantity from the oldest open layers, one index seek per layer touched
+        while quantity > 0:
+            self.cursor.execute(STATEMENTS["oldest_open_layer"], (item_id,))
+            layer = self.cursor.fetchone()
+            if not layer:
+                # Stock received before lot tracking was enabled and not rebuilt has no layers
+                break
+            taken = min(quantity, layer[1])
+            self.cursor.execute(STATEMENTS["take_from_layer"], (taken, layer[0]))
+            self.cursor.execute(STATEMENTS["record_layer_taken"], (shipment_id, layer[0], taken))
+            quantity -= taken
+
+    def _restore_cost_layers(self, shipment_id):
+        # Give a reversed shipment's quantities back to the layers it took them from
+        self.cursor.execute(STATEMENTS["restore_layers"], (shipment_id, shipment_id))
+        self.cursor.execute(STATEMENTS["delete_shipment_layers"], (shipment_id,))
+
+    def _close_cost_layer(self, layer_id):
+        # A reversed receipt's layer goes away, shipments that took from it take from the next open layers instead
+        self.cursor.execute(STATEMENTS["layer_consumers"], (layer_id,))
+        consumers = self.cursor.fetchall()
+        self.cursor.execute(STATEMENTS["delete_layer_consumers"], (layer_id,))
+        self.cursor.execute(STATEMENTS["delete_layer"], (layer_id,))
+        for shipment_id, quantity, item_id in consumers:
+            self._consume_cost_layers(shipment_id, item_id, quantity)
+
+    def rebuild_cost_layers(self):
+        # Recreate every layer from the ledgers: receipts in date order, then shipments in date order take
+        # from the oldest layers. Done in memory and written back in bulk.
+        with transaction(self.conn):
+            self.cursor.execute(STATEMENTS["receipts_by_date"])
+            layers = []
+            open_layers = {}
+            for layer_id, item_id, entry_time, quantity, price, price_after_tax in self.cursor.fetchall():
+                layer = [layer_id, item_id, entry_time, quantity, quantity, price, price_after_tax]
+                layers.append(layer)
+                open_layers.setdefault(item_id, deque()).append(layer)
+
+            consumed = []
+            self.cursor.execute(STATEMENTS["shipments_by_date"])
+            for shipment_id, item_id, quantity in self.cursor.fetchall():
+                queue = open_layers.get(item_id)
+                while quantity > 0 and queue:
+                    layer = queue[0]
+                    taken = min(quantity, layer[4])
+                    layer[4] -= taken
+                    quantity -= taken
+                    consumed.append((shipment_id, layer[0], taken))
+                    if layer[4] <= 0:
+                        queue.popleft()
+
+            self.cursor.execute(STATEMENTS["delete_all_shipment_layers"])
+            self.cursor.execute(STATEMENTS["delete_all_layers"])
+            self.cursor.executemany(STATEMENTS["insert_layer"], layers)
+            self.cursor.executemany(STATEMENTS["insert_shipment_layer"], consumed)
+            return len(layers)
+
+    def set_lot_tracking(self, enabled):
+        # Turning lot tracking on builds the layers for everything posted so far
+        with transaction(self.conn):
+            if enabled and not self.lot_tracking:
+                self.rebuild_cost_layers()
+            self.set_setting("lot_tracking", 1 if enabled else 0)
+            self.lot_tracking = bool(enabled)
+
+    def open_cost_layers(self, store, item_no, item_name):
+        # (id, entry_date, remaining_quantity, price, price_after_tax) of the layers still in stock, oldest first
+        item_id = self._item_id(store, item_no, item_name)
+        if item_id is None:
+            return []
+        self.cursor.execute(STATEMENTS["item_open_layers"], (item_id,))
+        return self.cursor.fetchall()
+
+    def fifo_cost_of_shipments(self, start_date=None, end_date=None):
+        # Per item: quantity shipped, its FIFO cost before and after tax and, alongside, its moving-average
+        # cost, for shipments with start_date <= entry_date < end_date (anything date_to_epoch takes)
+        query_params = [date_to_epoch(value) for value in (start_date, end_date) if value]
+        self.cursor.execute(fifo_cost_statement(bool(start_date), bool(end_date)), query_params)
+        return self.cursor.fetchall()
+
+    # ---- Queries ----
+
+    def _inventory_row(self, item_id):
+        if item_id in self.inventory_cache:
+            self.inventory_cache_stats["hits"] += 1
+            return self.inventory_cache[item_id]
+
+        self.inventory_cache_stats["misses"] += 1
+        self.cursor.execute(STATEMENTS["inventory_row"], (item_id,))
+        row = self.cursor.fetchone()
+        self._cache_inventory_item(item_id, row[:3] if row else None, row[3] if row else None)
+        return self.inventory_cache[item_id]
+
+    def get_inventory_item(self, store, item_no, item_name):
+        # Inside a posting the cache was already checked when the transaction began
+        if not self.conn.in_transaction:
+            self._sync_inventory_cache()
+        item_id = self._item_id(store, item_no, item_name)
+        if item_id is None:
+            return None
+        return self._inventory_row(item_id)
+
+    def inventory_rows(self):
+        self.cursor.execute(STATEMENTS["inventory_rows"])
+        return self.cursor.fetchall()
+
+    def expense_summary_rows(self):
+        self.cursor.execute(STATEMENTS["expense_summary_rows"])
+        return self.cursor.fetchall()
+
+    def ledger_page(self, ledger, sort_column="id", descending=False, after=None, limit=200, filters=None,
+                    start_date=None, end_date=None):
+        # One page of a ledger table using keyset pagination on (sort_column, id), so the cost
+        # of a page does not depend on how deep into the table it is. start_date <= entry_date < end_date
+        # (anything date_to_epoch takes, None for no bound) limits it to a date range.
+        # Rows are returned as (id, *LEDGER_COLUMNS[ledger][1])
+        _, columns = LEDGER_COLUMNS[ledger]
+        if sort_column != "id" and sort_column not in columns:
+            raise ValueError(f"Cannot sort {ledger} by {sort_column!r}.")
+
+        filter_columns = []
+        query_params = []
+
+        # Filters match a prefix of the (upper-cased) column value
+        for column, value in (filters or {}).items():
+            if column not in columns:
+                raise ValueError(f"Cannot filter {ledger} by {column!r}.")
+            value = clean_input(value)
+            if not value:
+                continue
+            filter_columns.append(column)
+            query_params.extend([value, value[:-1] + chr(ord(value[-1]) + 1)])
+
+        if start_date:
+            query_params.append(date_to_epoch(start_date))
+        if end_date:
+            query_params.append(date_to_epoch(end_date))
+
+        if after is not None:
+            if sort_column == "id":
+                query_params.append(after[1])
+            else:
+                # Rows show entry_date as text, the key continues from its entry_time
+                after_value = date_to_epoch(after[0]) if sort_column == "entry_date" else after[0]
+                query_params.extend([after_value, after[1]])
+        query_params.append(limit)
+
+        self.cursor.execute(ledger_page_statement(
+            ledger, sort_column, bool(descending), after is not None, tuple(filter_columns),
+            bool(start_date), bool(end_date)), query_params)
+        return self.cursor.fetchall()
+
+    def shipment_report(self, shipping_to="ALL", item=None, start_date=None, end_date=None):
+        # Totals per item from the shipment_summary rollup, for one destination or "ALL", one
+        # (store, item_no, item_name) item or None for all of them, and start_date <= entry_date < end_date
+        query_params = []
+        if shipping_to != "ALL":
+            query_params.append(shipping_to)
+
+        if item is not None:
+            item_id = self._item_id(*item)
+            if item_id is None:
+                return []
+            query_params.append(item_id)
+
+        # Widened to the whole days the range touches, since the rollup is per day
+        if start_date:
+            query_params.append(date_to_epoch(start_date) // SECONDS_PER_DAY)
+        if end_date:
+            query_params.append(-(-date_to_epoch(end_date) // SECONDS_PER_DAY))
+
+        self.cursor.execute(shipment_report_statement(
+            shipping_to != "ALL", item is not None, bool(start_date), bool(end_date)), query_params)
+        return self.cursor.fetchall()
+
+    def store_item_triplets(self):
+        # Items in stock or shipped at some point
+        self.cursor.execute(STATEMENTS["store_item_triplets"])
+        return self.cursor.fetchall()
+
+    def _is_listed(self, item_id):
+        # Whether store_item_triplets() lists the item: in stock or shipped at some point
+        self.cursor.execute(STATEMENTS["is_store_item_triplet"], (item_id, item_id))
+        return bool(self.cursor.fetchone()[0])
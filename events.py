@@ -0,0 +1,119 @@
+import sys
+
+from db import bump_cache_generation, transaction
+from engine import apply_event, epoch_to_date
+from statements import STATEMENTS
+
+
+# Every posting and reversal is appended to the events table with a sequence number (seq), and
+# inventory_balances and expense_balances are projections of that log. A snapshot copies both projections
+# as of a seq. project() starts from the latest snapshot and replays only the events logged after it,
+# recover() writes that back over the projections, rebuild.audit() compares it with them.
+
+# Older snapshots are dropped when a new one is taken
+SNAPSHOTS_KEPT = 3
+
+
+def latest_snapshot(conn, until_seq=None):
+    # seq of the latest snapshot at or before until_seq (default: the latest), None if there is none
+    return conn.execute(STATEMENTS["latest_snapshot"], (until_seq,)).fetchone()[0]
+
+
+def load_snapshot(conn, seq):
+    inventory = {item_id: tuple(row) for item_id, *row in conn.execute(STATEMENTS["snapshot_inventory_rows"], (seq,))}
+    expenses = {(store_id, item_name): tuple(row)
+                for store_id, item_name, *row in conn.execute(STATEMENTS["snapshot_expense_rows"], (seq,))}
+    return inventory, expenses
+
+
+def replay_events(conn, inventory, expenses, after_seq=0, until_seq=None):
+    # Apply the events after after_seq up to until_seq (no bound when None) onto inventory and expenses,
+    # returns the seq of the last event applied, after_seq if there were none
+    last_seq = after_seq
+    for seq, kind, ledger, item_id, store_id, item_name, quantity, unit_cost, unit_cost_after_tax in conn.execute(
+            STATEMENTS["events_between"], (after_seq, until_seq)):
+        state, key = (expenses, (store_id, item_name)) if ledger == "expense" else (inventory, item_id)
+        row = apply_event(state.get(key), kind, ledger, quantity, unit_cost, unit_cost_after_tax)
+        if row is None:
+            state.pop(key, None)
+        else:
+            state[key] = row
+        last_seq = seq
+    return last_seq
+
+
+def project(conn, until_seq=None):
+    # Both projections as of until_seq (default: the end of the log) as ({item_id: row},
+    # {(store_id, item_name): row}, seq), from the latest snapshot before it and the events after it
+    snapshot_seq = latest_snapshot(conn, until_seq)
+    if snapshot_seq is None:
+        inventory, expenses, snapshot_seq = {}, {}, 0
+    else:
+        inventory, expenses = load_snapshot(conn, snapshot_seq)
+    seq = replay_events(conn, inventory, expenses, snapshot_seq, until_seq)
+    return inventory, expenses, seq
+
+
+def create_snapshot(conn):
+    # Copy both projections as of the seq they are caught up to, returns that seq. The projections must
+    # be caught up to the same seq, InventoryEngine.catch_up() brings both to the end of the log.
+    with transaction(conn):
+        seqs = {seq for _, seq in conn.execute(STATEMENTS["projection_state"])}
+        if len(seqs) != 1:
+            raise RuntimeError("The projections are caught up to different events, catch them up first.")
+        seq = seqs.pop()
+        conn.execute(STATEMENTS["insert_snapshot"], (seq,))
+        conn.execute(STATEMENTS["delete_inventory_snapshot"], (seq,))
+        conn.execute(STATEMENTS["delete_expense_snapshot"], (seq,))
+        conn.execute(STATEMENTS["snapshot_inventory"], (seq,))
+        conn.execute(STATEMENTS["snapshot_expenses"], (seq,))
+
+        kept = [seq for seq, in conn.execute(STATEMENTS["kept_snapshots"], (SNAPSHOTS_KEPT,))]
+        for table in ("projection_snapshots", "inventory_snapshots", "expense_snapshots"):
+            conn.execute(STATEMENTS[f"{table}_delete_before"], (kept[-1],))
+        return seq
+
+
+def recover(conn):
+    # Replace both projections with the latest snapshot plus the events after it, returns the seq they
+    # are then caught up to. Engines on other connections notice the commit and drop their caches, engines on
+    # conn notice the cache generation.
+    with transaction(conn):
+        inventory, expenses, seq = project(conn)
+        conn.execute(STATEMENTS["inventory_balances_delete_all"])
+        conn.execute(STATEMENTS["expense_balances_delete_all"])
+        conn.executemany(STATEMENTS["insert_inventory_row"], [(item_id, *row) for item_id, row in inventory.items()])
+        conn.executemany(STATEMENTS["upsert_expense_row"], [(*key, *row) for key, row in expenses.items()])
+        conn.execute(STATEMENTS["set_projection_seq"], (seq,))
+        bump_cache_generation(conn)
+        return seq
+
+
+def tail(conn, count):
+    # The last count events, oldest first, with names instead of ids
+    rows = conn.execute(STATEMENTS["event_tail"], (count,)).fetchall()
+    return [(*row[:-1], epoch_to_date(row[-1])) for row in reversed(rows)]
+
+
+if __name__ == "__main__":
+    from db import connect
+    from engine import InventoryEngine
+
+    usage = ("Usage: python events.py snapshot|recover|catch-up\n"
+             "       python events.py tail [COUNT (default: 20)]")
+    if len(sys.argv) < 2 or sys.argv[1] not in ("snapshot", "recover", "catch-up", "tail"):
+        print(usage)
+        sys.exit(1)
+
+    engine = InventoryEngine(connect())
+    if sys.argv[1] == "snapshot":
+        with transaction(engine.conn):
+            engine.catch_up()
+            print(f"Snapshot taken at event {create_snapshot(engine.conn):,}")
+    elif sys.argv[1] == "recover":
+        print(f"Projections recovered up to event {recover(engine.conn):,}")
+    elif sys.argv[1] == "catch-up":
+        print(f"{engine.catch_up():,} event(s) applied")
+    else:
+        for row in tail(engine.conn, int(sys.argv[2]) if len(sys.argv) > 2 else 20):
+            print(*row, sep="\t")
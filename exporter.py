@@ -0,0 +1,169 @@
+import csv
+import gzip
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+
+from statements import EXPORT_TABLES, STATEMENTS
+
+
+EXPORT_FORMATS = ["xlsx", "csv.gz", "parquet"]
+
+DEFAULT_CHUNK_SIZE = 10000
+
+# Excel caps a sheet at 1,048,576 rows including the header, longer tables continue on another sheet
+EXCEL_MAX_ROWS = 1048575
+
+
+@dataclass
+class ExportResult:
+    format: str
+    paths: list = field(default_factory=list)
+    rows: int = 0
+    seconds: float = 0.0
+
+    @property
+    def bytes(self):
+        return sum(os.path.getsize(path) for path in self.paths)
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        return (f"Exported {self.rows:,} rows to {len(self.paths)} file(s) in {self.seconds:.2f}s "
+                f"({self.rows_per_second:,.0f} rows/sec, {self.bytes / 1024 / 1024:,.2f} MB).")
+
+
+def iter_chunks(conn, table, chunk_size=DEFAULT_CHUNK_SIZE):
+    # Yield the column names, then lists of rows, holding at most one chunk in memory
+    cursor = conn.cursor()
+    cursor.execute(STATEMENTS[f"{table}_export"])
+    yield [column[0] for column in cursor.description]
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield rows
+
+
+def count_rows(conn):
+    # Rows export_database writes, the total for its progress reports
+    return sum(conn.execute(STATEMENTS[f"{table}_export_count"]).fetchone()[0] for table in EXPORT_TABLES)
+
+
+def export_xlsx(conn, path, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise RuntimeError("Exporting to Excel requires openpyxl (pip install openpyxl).")
+
+    result = ExportResult("xlsx")
+    started = time.perf_counter()
+
+    # A write-only workbook streams rows to disk instead of building every cell in memory
+    workbook = Workbook(write_only=True)
+    for table in EXPORT_TABLES:
+        chunks = iter_chunks(conn, table, chunk_size)
+        header = next(chunks)
+        sheet = workbook.create_sheet(table)
+        sheet.append(header)
+        sheet_rows, sheet_number = 0, 1
+        for rows in chunks:
+            for row in rows:
+                if sheet_rows == EXCEL_MAX_ROWS:
+                    sheet_number += 1
+                    sheet = workbook.create_sheet(f"{table} ({sheet_number})")
+                    sheet.append(header)
+                    sheet_rows = 0
+                sheet.append(row)
+                sheet_rows += 1
+            result.rows += len(rows)
+            if progress:
+                progress(result.rows)
+    workbook.save(path)
+
+    result.paths.append(path)
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def export_csv_gz(conn, path_prefix, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    result = ExportResult("csv.gz")
+    started = time.perf_counter()
+
+    for table in EXPORT_TABLES:
+        path = f"{path_prefix}_{table}.csv.gz"
+        with gzip.open(path, "wt", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            chunks = iter_chunks(conn, table, chunk_size)
+            writer.writerow(next(chunks))
+            for rows in chunks:
+                writer.writerows(rows)
+                result.rows += len(rows)
+                if progress:
+                    progress(result.rows)
+        result.paths.append(path)
+
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def export_parquet(conn, path_prefix, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Exporting to Parquet requires pyarrow (pip install pyarrow).")
+
+    arrow_types = {"INTEGER": pa.int64(), "REAL": pa.float64(), "TEXT": pa.string()}
+
+    result = ExportResult("parquet")
+    started = time.perf_counter()
+
+    for table in EXPORT_TABLES:
+        path = f"{path_prefix}_{table}.parquet"
+        declared_types = {row[1]: row[2].upper() for row in conn.execute(STATEMENTS[f"{table}_column_types"])}
+        chunks = iter_chunks(conn, table, chunk_size)
+        columns = next(chunks)
+        schema = pa.schema([(column, arrow_types.get(declared_types.get(column), pa.string())) for column in columns])
+
+        # Each chunk becomes one row group
+        with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+            for rows in chunks:
+                batch = pa.record_batch([list(values) for values in zip(*rows)], schema=schema)
+                writer.write_batch(batch)
+                result.rows += len(rows)
+                if progress:
+                    progress(result.rows)
+        result.paths.append(path)
+
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def export_database(conn, export_format, path_prefix="inventory_data", chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    # progress, if given, is called with the number of rows written so far after every chunk
+    if export_format == "xlsx":
+        return export_xlsx(conn, f"{path_prefix}.xlsx", chunk_size, progress)
+    if export_format == "csv.gz":
+        return export_csv_gz(conn, path_prefix, chunk_size, progress)
+    if export_format == "parquet":
+        return export_parquet(conn, path_prefix, chunk_size, progress)
+    raise ValueError(f"Unknown export format {export_format!r}, expected one of {', '.join(EXPORT_FORMATS)}.")
+
+
+if __name__ == "__main__":
+    from db import connect
+    from engine import InventoryEngine
+
+    if len(sys.argv) < 2 or sys.argv[1] not in EXPORT_FORMATS:
+        print(f"Usage: python exporter.py {{{'|'.join(EXPORT_FORMATS)}}} [PATH_PREFIX]")
+        sys.exit(1)
+
+    engine = InventoryEngine(connect())
+    result = export_database(engine.conn, sys.argv[1], *sys.argv[2:3])
+    for path in result.paths:
+        print(path)
+    print(result.summary())
@@ -0,0 +1,156 @@
+import csv
+import os
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from engine import (IncomingItem, OutgoingShipment, ExpenseEntry, INPUT_DATE_FORMAT, STORED_DATE_FORMAT,
+                    clean_input)
+
+
+DEFAULT_BATCH_SIZE = 5000
+
+# Columns each kind of file must provide, entry_date is optional and defaults to today
+COLUMNS = {
+    "incoming": ["store", "item_no", "item_name", "quantity", "price", "tax_rate"],
+    "outgoing": ["store", "item_no", "item_name", "quantity", "shipping_to"],
+    "expense": ["store", "item_name", "quantity", "price", "tax_rate"],
+}
+
+ACCEPTED_DATE_FORMATS = [INPUT_DATE_FORMAT, STORED_DATE_FORMAT, "%Y-%m-%d"]
+
+
+@dataclass
+class ImportResult:
+    kind: str
+    imported: int = 0
+    batches: int = 0
+    rejected: list = field(default_factory=list)  # (line number, message) pairs
+    keys: set = field(default_factory=set)  # (store, item_no, item_name) or (store, item_name) keys touched
+
+
+def normalize_header(name):
+    return str(name).strip().lower().replace(" ", "_") if name is not None else ""
+
+
+def normalize_date(value):
+    if value is None or str(value).strip() == "":
+        return datetime.now().strftime(STORED_DATE_FORMAT)
+    if isinstance(value, datetime):
+        return value.strftime(STORED_DATE_FORMAT)
+    for date_format in ACCEPTED_DATE_FORMATS:
+        try:
+            return datetime.strptime(clean_input(value), date_format).strftime(STORED_DATE_FORMAT)
+        except ValueError:
+            pass
+    raise ValueError(f"unrecognized date {value!r}")
+
+
+def read_rows(path):
+    # Yield (line number, {column: value}) one row at a time, so files of any size use constant memory
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".xlsx", ".xlsm"):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise RuntimeError("Reading Excel files requires openpyxl (pip install openpyxl).")
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [normalize_header(name) for name in next(rows, [])]
+            for line_no, values in enumerate(rows, start=2):
+                if values and any(value is not None for value in values):
+                    yield line_no, dict(zip(header, values))
+        finally:
+            workbook.close()
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.reader(f)
+            header = [normalize_header(name) for name in next(reader, [])]
+            for values in reader:
+                if any(value.strip() for value in values):
+                    yield reader.line_num, dict(zip(header, values))
+
+
+def parse_row(kind, row):
+    # Validate and normalize one row the same way the entry tabs do
+    for column in COLUMNS[kind]:
+        if row.get(column) is None or str(row[column]).strip() == "":
+            raise ValueError(f"missing {column}")
+
+    entry_date = normalize_date(row.get("entry_date"))
+    if kind == "incoming":
+        return IncomingItem(
+            clean_input(row["store"]), clean_input(row["item_no"]), clean_input(row["item_name"]),
+            int(clean_input(row["quantity"])), float(clean_input(row["price"])), float(clean_input(row["tax_rate"])),
+            entry_date)
+    if kind == "outgoing":
+        return OutgoingShipment(
+            clean_input(row["store"]), clean_input(row["item_no"]), clean_input(row["item_name"]),
+            int(clean_input(row["quantity"])), clean_input(row["shipping_to"]), entry_date)
+    return ExpenseEntry(
+        clean_input(row["store"]), clean_input(row["item_name"]),
+        int(clean_input(row["quantity"])), float(clean_input(row["price"])), float(clean_input(row["tax_rate"])),
+        entry_date)
+
+
+def import_file(engine, path, kind, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    # Post the rows of the file in batches of batch_size, each batch one transaction. progress(rows) is
+    # called with the rows handled so far after each batch.
+    if kind not in COLUMNS:
+        raise ValueError(f"Unknown import kind {kind!r}, expected one of {', '.join(COLUMNS)}.")
+
+    result = ImportResult(kind)
+    batch = []
+    line_numbers = []
+
+    def flush():
+        if kind == "expense":
+            result.keys.update((entry.store, entry.item_name) for entry in batch)
+        else:
+            result.keys.update((item.store, item.item_no, item.item_name) for item in batch)
+
+        if kind == "incoming":
+            result.imported += len(engine.receive_batch(batch))
+        elif kind == "outgoing":
+            posted, rejected = engine.ship_batch(batch)
+            line_by_shipment = {id(shipment): line_no for shipment, line_no in zip(batch, line_numbers)}
+            result.rejected.extend((line_by_shipment[id(shipment)], str(error)) for shipment, error in rejected)
+            result.imported += len(posted)
+        else:
+            result.imported += len(engine.add_expense_batch(batch))
+        result.batches += 1
+        batch.clear()
+        line_numbers.clear()
+        if progress:
+            progress(result.imported + len(result.rejected))
+
+    for line_no, row in read_rows(path):
+        try:
+            batch.append(parse_row(kind, row))
+            line_numbers.append(line_no)
+        except ValueError as e:
+            result.rejected.append((line_no, str(e)))
+            continue
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    return result
+
+
+if __name__ == "__main__":
+    from db import connect
+    from engine import InventoryEngine
+
+    if len(sys.argv) < 3 or sys.argv[1] not in COLUMNS:
+        print(f"Usage: python importer.py {{{'|'.join(COLUMNS)}}} FILE [FILE ...]")
+        sys.exit(1)
+
+    engine = InventoryEngine(connect())
+    for path in sys.argv[2:]:
+        result = import_file(engine, path, sys.argv[1])
+        print(f"{path}: imported {result.imported:,} rows in {result.batches} batches, rejected {len(result.rejected):,}")
+        for line_no, message in result.rejected:
+            print(f"  line {line_no}: {message}")
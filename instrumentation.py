@@ -0,0 +1,242 @@
+import atexit
+import cProfile
+import io
+import os
+import pstats
+import re
+import sqlite3
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+
+
+# Where the time goes: every statement, commit, worker job and Treeview rebuild is recorded in memory as an
+# operation with a latency histogram and a row count. Connections opened by db.connect record their own
+# statements and commits, statements under their fingerprint (the SQL with its literals replaced by ?).
+# report() lists count, total, p50/p95/p99 and rows per operation, for the app's Diagnostics tab, or printed
+# at exit by any of the command-line tools when INVENTORY_DIAGNOSTICS=1.
+# INVENTORY_INSTRUMENT=0 opens plain connections instead.
+
+ENABLED = os.environ.get("INVENTORY_INSTRUMENT", "1") != "0"
+
+# Upper bounds of the histogram buckets in seconds, 10 per decade from 1 µs to 100 s. A percentile is the
+# upper bound of the bucket it falls in, so it reads at most ~26% high.
+BUCKET_BOUNDS = [10 ** (exponent / 10) for exponent in range(-60, 21)]
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r"(?<![\w.])\d+(?:\.\d+)?\b")
+PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass
+class OperationStats:
+    name: str
+    count: int
+    total: float
+    p50: float
+    p95: float
+    p99: float
+    max: float
+    rows: int
+
+
+class Histogram:
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction):
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else self.max, self.max)
+        return 0.0
+
+
+class Recorder:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.rows = {}
+
+    def record(self, name, seconds, rows=0):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(seconds)
+            if rows > 0:
+                self.rows[name] = self.rows.get(name, 0) + rows
+
+    def add_rows(self, name, rows):
+        # Rows fetched after the statement ran, counted without the lock: a lost update only undercounts
+        self.rows[name] = self.rows.get(name, 0) + rows
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.rows.clear()
+
+    def report(self):
+        # One OperationStats per operation, the most total time first
+        with self.lock:
+            stats = [OperationStats(name, histogram.count, histogram.total, histogram.percentile(0.5),
+                                    histogram.percentile(0.95), histogram.percentile(0.99), histogram.max,
+                                    self.rows.get(name, 0))
+                     for name, histogram in self.histograms.items()]
+        return sorted(stats, key=lambda operation: operation.total, reverse=True)
+
+
+RECORDER = Recorder()
+record = RECORDER.record
+reset = RECORDER.reset
+report = RECORDER.report
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql):
+    # The same statement with other values, or another number of values in an IN (...) or VALUES (...)
+    # list, has the same fingerprint
+    sql = STRING_LITERAL.sub("?", sql)
+    sql = NUMBER_LITERAL.sub("?", sql)
+    sql = PLACEHOLDER_LIST.sub("?, ...", sql)
+    return WHITESPACE.sub(" ", sql).strip()
+
+
+@contextmanager
+def timed(name, rows=0):
+    # Record the block as one call of operation name
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        RECORDER.record(name, time.perf_counter() - started, rows)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    # Statements are timed up to their first row, rows fetched afterwards are added to the statement's count
+    operation = None
+
+    def execute(self, sql, parameters=()):
+        self.operation = "sql: " + fingerprint(sql)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            RECORDER.record(self.operation, time.perf_counter() - started, self.rowcount)
+
+    def executemany(self, sql, seq_of_parameters):
+        self.operation = "sql: " + fingerprint(sql)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            RECORDER.record(self.operation, time.perf_counter() - started, self.rowcount)
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None and self.operation:
+            RECORDER.add_rows(self.operation, 1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        if rows and self.operation:
+            RECORDER.add_rows(self.operation, len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        if rows and self.operation:
+            RECORDER.add_rows(self.operation, len(rows))
+        return rows
+
+    def __next__(self):
+        row = super().__next__()
+        if self.operation:
+            RECORDER.add_rows(self.operation, 1)
+        return row
+
+
+class InstrumentedConnection(sqlite3.Connection):
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    # sqlite3's own Connection.execute would bypass the cursor's execute
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        with timed("commit"):
+            super().commit()
+
+
+def connection_factory():
+    # factory for sqlite3.connect
+    return InstrumentedConnection if ENABLED else sqlite3.Connection
+
+
+# ---- cProfile toggle ----
+
+# cProfile only sees the thread that enabled it: in the app that is the Tk main thread, the worker jobs
+# show up in report() as "job: ..." operations
+profiler = None
+
+
+def start_profiling():
+    global profiler
+    if profiler is None:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+
+def stop_profiling(limit=30):
+    # The limit functions with the most cumulative time since start_profiling(), as text
+    global profiler
+    if profiler is None:
+        return ""
+    profiler.disable()
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(limit)
+    profiler = None
+    return output.getvalue()
+
+
+def is_profiling():
+    return profiler is not None
+
+
+def format_report(stats=None):
+    stats = report() if stats is None else stats
+    lines = [f"{'Count':>8} {'Total ms':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'Max ms':>8} {'Rows':>10}  Operation"]
+    for operation in stats:
+        lines.append(f"{operation.count:>8,} {operation.total * 1000:>10,.1f} {operation.p50 * 1000:>8.2f} "
+                     f"{operation.p95 * 1000:>8.2f} {operation.p99 * 1000:>8.2f} {operation.max * 1000:>8.2f} "
+                     f"{operation.rows:>10,}  {operation.name}")
+    return "\n".join(lines)
+
+
+if os.environ.get("INVENTORY_DIAGNOSTICS") == "1":
+    atexit.register(lambda: print(format_report(), file=sys.stderr))
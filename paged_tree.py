@@ -0,0 +1,228 @@
+import tkinter as tk
+from tkinter import ttk
+
+from engine import parse_date_range
+from instrumentation import timed
+
+
+class PagedTreeview(ttk.Frame):
+    # A Treeview over a ledger table that only ever holds a window of rows.
+    # Pages are fetched with InventoryEngine.ledger_page as the user scrolls, rows that scroll
+    # far out of view are dropped, and sorting, filtering and the from/to date range are pushed down into SQL.
+    # Given a WorkerPool, pages are fetched on a worker and inserted once they arrive.
+
+    def __init__(self, parent, engine, ledger, columns, page_size=200, max_rows=1000, workers=None, **tree_options):
+        super().__init__(parent)
+        self.engine = engine
+        self.workers = workers
+        self.job = None
+        self.ledger = ledger
+        self.columns = columns  # (db column, heading, width, anchor)
+        self.page_size = page_size
+        self.max_rows = max_rows
+
+        self.sort_column = "id"
+        self.descending = False
+        self.filters = {}
+        self.start_date = None
+        self.end_date = None
+
+        self.row_keys = {}  # iid -> (sort value, id)
+        self.more_before = False
+        self.more_after = False
+        self.loading = False
+
+        # Filter bar
+        filter_bar = ttk.Frame(self)
+        headings = [heading for _, heading, _, _ in columns]
+        self.filter_column_var = tk.StringVar(self, headings[0])
+        filter_column_menu = tk.OptionMenu(filter_bar, self.filter_column_var, *headings)
+        self.entry_filter = tk.Entry(filter_bar)
+        self.entry_filter.bind("<Return>", lambda event: self.apply_filter())
+        self.entry_from = tk.Entry(filter_bar, width=12)
+        self.entry_to = tk.Entry(filter_bar, width=12)
+        self.entry_from.bind("<Return>", lambda event: self.apply_filter())
+        self.entry_to.bind("<Return>", lambda event: self.apply_filter())
+        btn_apply_filter = tk.Button(filter_bar, text="Filter", command=self.apply_filter)
+        btn_clear_filter = tk.Button(filter_bar, text="Clear Filter", command=self.clear_filter)
+        self.status_var = tk.StringVar(self)
+        label_status = tk.Label(filter_bar, textvariable=self.status_var)
+
+        tk.Label(filter_bar, text="Filter by:").grid(row=0, column=0, padx=5)
+        filter_column_menu.grid(row=0, column=1, padx=5)
+        self.entry_filter.grid(row=0, column=2, padx=5)
+        tk.Label(filter_bar, text="From (mm/dd/yyyy):").grid(row=0, column=3, padx=5)
+        self.entry_from.grid(row=0, column=4, padx=5)
+        tk.Label(filter_bar, text="To:").grid(row=0, column=5, padx=5)
+        self.entry_to.grid(row=0, column=6, padx=5)
+        btn_apply_filter.grid(row=0, column=7, padx=5)
+        btn_clear_filter.grid(row=0, column=8, padx=5)
+        label_status.grid(row=0, column=9, padx=20)
+        filter_bar.grid(row=0, column=0, columnspan=2, sticky="w", pady=5)
+
+        # Treeview and scrollbar
+        self.tree = ttk.Treeview(self, columns=headings, **tree_options)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.on_scroll)
+
+        self.tree.column("#0", width=60, anchor="w")
+        self.tree.heading("#0", text="#", command=lambda: self.sort_by("id"))
+        for index, (column, heading, width, anchor) in enumerate(columns, start=1):
+            self.tree.column(f"#{index}", width=width, anchor=anchor)
+            self.tree.heading(f"#{index}", text=heading, command=lambda column=column: self.sort_by(column))
+
+        self.tree.grid(row=1, column=0, sticky="nsew")
+        self.scrollbar.grid(row=1, column=1, sticky="ns")
+        self.rowconfigure(1, weight=1)
+        self.columnconfigure(0, weight=1)
+
+        # A page arriving after the window was closed is dropped
+        self.bind("<Destroy>", lambda event: self.cancel_fetch() if event.widget is self else None)
+
+    def selection_ids(self):
+        return [int(iid) for iid in self.tree.selection()]
+
+    def sort_by(self, column):
+        # Clicking the sorted column again flips the direction
+        if column == self.sort_column:
+            self.descending = not self.descending
+        else:
+            self.sort_column = column
+            self.descending = False
+        self.reload()
+
+    def apply_filter(self):
+        heading = self.filter_column_var.get()
+        column = next(column for column, column_heading, _, _ in self.columns if column_heading == heading)
+        value = self.entry_filter.get().strip()
+        try:
+            self.start_date, self.end_date = parse_date_range(self.entry_from.get(), self.entry_to.get())
+        except ValueError:
+            self.status_var.set("Dates must be mm/dd/yyyy.")
+            return
+        self.filters = {column: value} if value else {}
+        self.reload()
+
+    def clear_filter(self):
+        self.entry_filter.delete(0, tk.END)
+        self.entry_from.delete(0, tk.END)
+        self.entry_to.delete(0, tk.END)
+        self.filters = {}
+        self.start_date = self.end_date = None
+        self.reload()
+
+    def reload(self):
+        self.loading = True
+        self.status_var.set("Loading...")
+        self.fetch(None, self.descending, self.show_first_page)
+
+    def show_first_page(self, rows):
+        with timed(f"ui: {self.ledger} ledger page", len(rows)):
+            self.tree.delete(*self.tree.get_children())
+            self.row_keys.clear()
+            self.more_before = False
+            self.more_after = len(rows) == self.page_size
+            self.insert_rows(rows, "end")
+            self.update_status()
+        self.loading = False
+
+    def fetch(self, after, descending, on_rows):
+        # on_rows(rows) runs on the Tk thread, right away without a worker pool. A new fetch replaces one
+        # still running, so a reload is never followed by a page of the old sort or filter.
+        args = (self.ledger, self.sort_column, descending, after, self.page_size, self.filters,
+                self.start_date, self.end_date)
+        if self.workers is None:
+            on_rows(self.engine.ledger_page(*args))
+            return
+        self.cancel_fetch()
+        self.job = self.workers.submit(
+            "Loading rows", lambda engine, job: engine.ledger_page(*args), on_done=on_rows, on_error=self.show_error)
+
+    def cancel_fetch(self):
+        if self.job:
+            self.job.cancel()
+            self.job = None
+
+    def show_error(self, error):
+        self.status_var.set(f"Loading failed: {error}")
+        self.loading = False
+
+    def row_key(self, row):
+        if self.sort_column == "id":
+            return (row[0], row[0])
+        return (row[1 + [column for column, _, _, _ in self.columns].index(self.sort_column)], row[0])
+
+    def insert_rows(self, rows, position):
+        for row in rows:
+            iid = str(row[0])
+            self.tree.insert("", position, iid=iid, text=iid, values=row[1:])
+            self.row_keys[iid] = self.row_key(row)
+
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self.loading:
+            return
+        first, last = float(first), float(last)
+        if last > 0.9 and self.more_after:
+            self.load_next_page()
+        elif first < 0.1 and self.more_before:
+            self.load_previous_page()
+
+    def load_next_page(self):
+        children = self.tree.get_children()
+        if not children:
+            return
+        self.loading = True
+        self.fetch(self.row_keys[children[-1]], self.descending, self.append_page)
+
+    def append_page(self, rows):
+        try:
+            with timed(f"ui: {self.ledger} ledger page", len(rows)):
+                self.more_after = len(rows) == self.page_size
+                self.insert_rows(rows, "end")
+
+                # Drop rows from the top once the window is full
+                children = self.tree.get_children()
+                excess = len(children) - self.max_rows
+                if excess > 0:
+                    self.drop_rows(children[:excess])
+                    self.more_before = True
+                self.update_status()
+        finally:
+            self.loading = False
+
+    def load_previous_page(self):
+        children = self.tree.get_children()
+        if not children:
+            return
+        self.loading = True
+        # Walk backwards from the first loaded row, then insert above it in display order
+        self.fetch(self.row_keys[children[0]], not self.descending, self.prepend_page)
+
+    def prepend_page(self, rows):
+        try:
+            with timed(f"ui: {self.ledger} ledger page", len(rows)):
+                self.more_before = len(rows) == self.page_size
+                self.insert_rows(rows, 0)
+
+                # Drop rows from the bottom once the window is full
+                children = self.tree.get_children()
+                excess = len(children) - self.max_rows
+                if excess > 0:
+                    self.drop_rows(children[-excess:])
+                    self.more_after = True
+                if rows:
+                    self.tree.see(str(rows[0][0]))
+                self.update_status()
+        finally:
+            self.loading = False
+
+    def drop_rows(self, iids):
+        self.tree.delete(*iids)
+        for iid in iids:
+            del self.row_keys[iid]
+
+    def update_status(self):
+        loaded = len(self.row_keys)
+        more = " (scroll for more)" if self.more_after or self.more_before else ""
+        self.status_var.set(f"{loaded:,} rows loaded{more}")
@@ -0,0 +1,189 @@
+import sys
+import time
+from dataclasses import dataclass
+
+from checkpoints import item_names
+from db import bump_cache_generation, transaction
+from engine import SECONDS_PER_DAY, epoch_to_date
+from events import create_snapshot, project, replay_events
+from statements import STATEMENTS, SUMMARY_COLUMNS
+
+
+# inventory_balances, expense_balances and shipment_summary are derived from the ledger tables. rebuild()
+# recomputes all three, inventory_balances from the whole event log and the others from expense_ledger and
+# outgoing_ledger, verify() reports where the stored values have drifted from the recomputed ones. audit()
+# checks inventory_balances and expense_balances against the latest snapshot and the events after it.
+
+# Averages and costs may differ by this much before verify reports them
+DEFAULT_TOLERANCE = 0.005
+
+# Counts and quantities must match exactly
+EXACT_COLUMNS = {"total_quantity", "shipment_count"}
+
+
+@dataclass
+class Difference:
+    table: str
+    key: tuple
+    column: str
+    stored: object
+    expected: object
+
+    def __str__(self):
+        return f"{self.table} {' / '.join(map(str, self.key))}: {self.column} is {self.stored}, expected {self.expected}"
+
+
+def expected_inventory(conn):
+    # The moving-average costs depend on the order of receipts and shipments, so they come from replaying
+    # every event from the start of the log, in the posting order the engine averaged in. A date-ordered
+    # replay would report a backdated receipt as drift.
+    inventory = {}
+    replay_events(conn, inventory, {})
+    return {(item_id,): tuple(values) for item_id, values in inventory.items()}
+
+
+def expected_rows(conn, table):
+    if table == "inventory_balances":
+        return expected_inventory(conn)
+    key_count = len(SUMMARY_COLUMNS[table][0])
+    return {tuple(row[:key_count]): tuple(row[key_count:]) for row in conn.execute(STATEMENTS[f"{table}_expected"])}
+
+
+def stored_rows(conn, table):
+    key_count = len(SUMMARY_COLUMNS[table][0])
+    return {tuple(row[:key_count]): tuple(row[key_count:]) for row in conn.execute(STATEMENTS[f"{table}_rows"])}
+
+
+def diff_table(table, stored, expected, tolerance=DEFAULT_TOLERANCE):
+    _, value_columns = SUMMARY_COLUMNS[table]
+    empty = (0,) * len(value_columns)
+    differences = []
+    for key in stored.keys() | expected.keys():
+        stored_values = stored.get(key, empty)
+        expected_values = expected.get(key, empty)
+        if stored_values == expected_values:
+            continue
+        # A row sold or reversed down to zero may be kept or deleted, either way its averages mean nothing
+        if stored_values[0] == 0 and expected_values[0] == 0:
+            continue
+        for column, stored_value, expected_value in zip(value_columns, stored_values, expected_values):
+            stored_value = stored_value or 0
+            expected_value = expected_value or 0
+            if column in EXACT_COLUMNS:
+                mismatch = stored_value != expected_value
+            else:
+                mismatch = abs(stored_value - expected_value) > tolerance
+            if mismatch:
+                differences.append(Difference(table, key, column, stored_value, expected_value))
+    return sorted(differences, key=lambda difference: difference.key)
+
+
+def readable_key(table, key, items, stores):
+    # Differences name the store, item and day instead of their ids
+    if table == "inventory_balances":
+        return items.get(key[0], key)
+    if table == "expense_balances":
+        return (stores.get(key[0], key[0]), key[1])
+    return (key[0], *items.get(key[1], key[1:2]), epoch_to_date(key[2] * SECONDS_PER_DAY)[:10])
+
+
+def verify(conn, tolerance=DEFAULT_TOLERANCE):
+    # Read everything inside one transaction so the ledgers and the summaries come from the same snapshot
+    started_transaction = not conn.in_transaction
+    if started_transaction:
+        conn.execute('BEGIN')
+    try:
+        differences = []
+        for table in SUMMARY_COLUMNS:
+            differences.extend(diff_table(table, stored_rows(conn, table), expected_rows(conn, table), tolerance))
+        if differences:
+            items = item_names(conn)
+            stores = dict(conn.execute(STATEMENTS["store_names"]))
+            for difference in differences:
+                difference.key = readable_key(difference.table, difference.key, items, stores)
+        return differences
+    finally:
+        if started_transaction:
+            conn.rollback()
+
+
+def audit(conn, tolerance=DEFAULT_TOLERANCE):
+    # Compare each projection with the latest snapshot plus the events up to the seq it is caught up to
+    started_transaction = not conn.in_transaction
+    if started_transaction:
+        conn.execute('BEGIN')
+    try:
+        differences = []
+        projected = {}
+        for table, seq in conn.execute(STATEMENTS["projection_state"]).fetchall():
+            if seq not in projected:
+                projected[seq] = project(conn, seq)
+            inventory, expenses, _ = projected[seq]
+            if table == "inventory_balances":
+                expected = {(item_id,): row for item_id, row in inventory.items()}
+            else:
+                expected = expenses
+            differences.extend(diff_table(table, stored_rows(conn, table), expected, tolerance))
+        if differences:
+            items = item_names(conn)
+            stores = dict(conn.execute(STATEMENTS["store_names"]))
+            for difference in differences:
+                difference.key = readable_key(difference.table, difference.key, items, stores)
+        return differences
+    finally:
+        if started_transaction:
+            conn.rollback()
+
+
+def rebuild(conn):
+    # Replace the three summary tables with values recomputed from the ledgers, in one transaction.
+    # The rebuilt balances are the projections as of the end of the event log and its newest snapshot.
+    counts = {}
+    with transaction(conn):
+        for table in SUMMARY_COLUMNS:
+            conn.execute(STATEMENTS[f"{table}_delete_all"])
+            if table == "inventory_balances":
+                rows = [(*key, *values) for key, values in expected_inventory(conn).items()]
+                conn.executemany(STATEMENTS["insert_inventory_row"], rows)
+            else:
+                conn.execute(STATEMENTS[f"{table}_rebuild"])
+            counts[table] = conn.execute(STATEMENTS[f"{table}_count"]).fetchone()[0]
+        conn.execute(STATEMENTS["catch_up_projection_state"])
+        create_snapshot(conn)
+        # Engines on conn drop their caches of the old balances
+        bump_cache_generation(conn)
+    return counts
+
+
+if __name__ == "__main__":
+    from db import connect
+    from engine import InventoryEngine
+
+    usage = ("Usage: python rebuild.py rebuild\n"
+             f"       python rebuild.py verify|audit [TOLERANCE (default: {DEFAULT_TOLERANCE})]\n"
+             "       python rebuild.py lot-tracking on|off")
+    if len(sys.argv) < 2 or sys.argv[1] not in ("rebuild", "verify", "audit", "lot-tracking"):
+        print(usage)
+        sys.exit(1)
+
+    engine = InventoryEngine(connect())
+    started = time.perf_counter()
+    if sys.argv[1] == "rebuild":
+        counts = rebuild(engine.conn)
+        if engine.lot_tracking:
+            counts["cost_layers"] = engine.rebuild_cost_layers()
+        print(", ".join(f"{count:,} {table} rows" for table, count in counts.items()) +
+              f" rebuilt in {time.perf_counter() - started:.2f}s")
+    elif sys.argv[1] == "lot-tracking":
+        if len(sys.argv) < 3 or sys.argv[2] not in ("on", "off"):
+            print(usage)
+            sys.exit(1)
+        engine.set_lot_tracking(sys.argv[2] == "on")
+        print(f"Lot tracking is {sys.argv[2]} ({time.perf_counter() - started:.2f}s)")
+    else:
+        check = verify if sys.argv[1] == "verify" else audit
+        differences = check(engine.conn, float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_TOLERANCE)
+        for difference in differences[:100]:
+            print(difference)
+        print(f"{len(differences):,} difference(s) found in {time.perf_counter() - started:.2f}s")
+        sys.exit(1 if differences else 0)
@@ -0,0 +1,382 @@
+import argparse
+import asyncio
+import json
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from db import DEFAULT_DB_PATH, connect, transaction
+from engine import (InventoryEngine, InventoryError, ItemNotFoundError, InsufficientQuantityError,
+                    IncomingItem, OutgoingShipment, ExpenseEntry, DAY_FORMAT, LEDGER_COLUMNS, clean_input, parse_date_range)
+from exporter import iter_chunks
+
+
+# A local HTTP/JSON service over the inventory database, standard library only.
+# Writes go through one queue to a single writer thread, which commits everything queued up while the
+# previous batch was running as one transaction (each request in its own savepoint, so a rejected one
+# does not undo the others). Reads run on a pool of threads with read-only connections, which in WAL mode
+# never wait for the writer. Large results are streamed as chunked JSON, a chunk at a time.
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+DEFAULT_READERS = 4
+MAX_WRITE_BATCH = 500
+STREAM_CHUNK_SIZE = 1000
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+INVENTORY_COLUMNS = ["store", "item_no", "item_name", "total_quantity", "average_price_before_tax", "average_price_after_tax"]
+EXPENSE_SUMMARY_COLUMNS = ["store", "item_name", "total_quantity", "average_price_before_tax", "average_price_after_tax", "total_cost"]
+SHIPMENT_REPORT_COLUMNS = ["store", "item_no", "item_name", "total_quantity", "total_cost", "total_cost_after_tax"]
+
+
+class HTTPError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def error_status(error):
+    if isinstance(error, HTTPError):
+        return error.status
+    if isinstance(error, ItemNotFoundError):
+        return 404
+    if isinstance(error, InventoryError):
+        return 409
+    if isinstance(error, (ValueError, TypeError, KeyError)):
+        return 400
+    return 500
+
+
+def error_body(error):
+    body = {"error": str(error)}
+    if isinstance(error, InsufficientQuantityError):
+        body["available_quantity"] = error.available_quantity
+    return body
+
+
+def ship(engine, payload):
+    shipment = OutgoingShipment(**payload)
+    entry_id = engine.ship(shipment)
+    return {"id": entry_id, "average_price_at_shipment": shipment.average_price_at_shipment,
+            "average_price_at_shipment_after_tax": shipment.average_price_at_shipment_after_tax}
+
+
+def reverse(engine, payload):
+    reversals = {"incoming": engine.reverse_incoming, "outgoing": engine.reverse_shipment,
+                 "expense": engine.reverse_expense}
+    if payload.get("ledger") not in reversals:
+        raise ValueError(f"Unknown ledger {payload.get('ledger')!r}, expected one of {', '.join(reversals)}.")
+    reversals[payload["ledger"]](int(payload["id"]))
+    return {"reversed": int(payload["id"])}
+
+
+def inventory_chunks(engine):
+    chunks = iter_chunks(engine.conn, "inventory", STREAM_CHUNK_SIZE)
+    return next(chunks), chunks
+
+
+WRITE_OPERATIONS = {
+    "receive": lambda engine, payload: {"id": engine.receive(IncomingItem(**payload))},
+    "ship": ship,
+    "expense": lambda engine, payload: {"id": engine.add_expense(ExpenseEntry(**payload))},
+    "reverse": reverse,
+}
+
+
+class InventoryServer:
+
+    def __init__(self, path=DEFAULT_DB_PATH, readers=DEFAULT_READERS, max_write_batch=MAX_WRITE_BATCH):
+        self.path = path
+        self.max_write_batch = max_write_batch
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inventory-writer")
+        self.readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="inventory-reader")
+        self.reader_state = threading.local()
+        self.write_engine = None
+        self.write_queue = None
+        self.stats = {"write_batches": 0, "writes": 0, "reads": 0}
+
+    # ---- Writer ----
+
+    def open_writer(self):
+        # Runs on the writer thread, which owns the only read-write connection
+        self.write_engine = InventoryEngine(connect(self.path))
+
+    def run_write_batch(self, batch):
+        # Runs on the writer thread: every queued request in one transaction, each in its own savepoint
+        conn = self.write_engine.conn
+        results = []
+        try:
+            with transaction(conn):
+                for operation, payload in batch:
+                    conn.execute('SAVEPOINT request')
+                    try:
+                        result = WRITE_OPERATIONS[operation](self.write_engine, payload)
+                    except Exception as error:
+                        # The engine's cache may hold rows of the request that just rolled back
+                        conn.execute('ROLLBACK TO request')
+                        self.write_engine.clear_inventory_cache()
+                        result = error
+                    conn.execute('RELEASE request')
+                    results.append(result)
+        except BaseException:
+            # The whole batch rolled back, the engine's cache may hold some of it
+            self.write_engine.clear_inventory_cache()
+            raise
+        return results
+
+    async def write_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            requests = [await self.write_queue.get()]
+            # Everything that queued up while the last batch was committing goes into the next one
+            while len(requests) < self.max_write_batch and not self.write_queue.empty():
+                requests.append(self.write_queue.get_nowait())
+
+            try:
+                results = await loop.run_in_executor(
+                    self.writer, self.run_write_batch, [(operation, payload) for operation, payload, _ in requests])
+            except Exception as error:
+                results = [error] * len(requests)
+            self.stats["write_batches"] += 1
+            self.stats["writes"] += len(requests)
+
+            for (_, _, future), result in zip(requests, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    async def write(self, operation, payload):
+        if not isinstance(payload, dict):
+            raise ValueError("Expected a JSON object.")
+        future = asyncio.get_running_loop().create_future()
+        await self.write_queue.put((operation, payload, future))
+        return await future
+
+    # ---- Readers ----
+
+    def reader_engine(self):
+        # One read-only connection per reader thread, opened on first use
+        if getattr(self.reader_state, "engine", None) is None:
+            self.reader_state.engine = InventoryEngine(connect(self.path, readonly=True), setup=False)
+        return self.reader_state.engine
+
+    async def read(self, query, *args):
+        self.stats["reads"] += 1
+        return await asyncio.get_running_loop().run_in_executor(
+            self.readers, lambda: query(self.reader_engine(), *args))
+
+    async def stream(self, writer, keep_alive, produce, *args):
+        # produce(engine, *args) returns the column names and an iterable of row lists. It runs on a reader
+        # thread and hands encoded chunks over through a small queue, so a slow client holds back the query
+        # instead of the whole result piling up in memory.
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue(maxsize=8)
+        self.stats["reads"] += 1
+
+        def put(item):
+            asyncio.run_coroutine_threadsafe(chunks.put(item), loop).result()
+
+        def run():
+            try:
+                columns, row_chunks = produce(self.reader_engine(), *args)
+                put(None)
+                first = True
+                for rows in row_chunks:
+                    if not rows:
+                        continue
+                    text = ",".join(json.dumps(dict(zip(columns, row))) for row in rows)
+                    put((("[" if first else ",") + text).encode())
+                    first = False
+                put(b"[]" if first else b"]")
+            except Exception as error:
+                put(error)
+            put(StopIteration)
+
+        task = loop.run_in_executor(self.readers, run)
+        first = await chunks.get()
+        if isinstance(first, Exception):
+            await task
+            await self.send_json(writer, error_status(first), error_body(first), keep_alive)
+            return
+
+        chunk = None
+        try:
+            writer.write(self.head(200, keep_alive, {"Content-Type": "application/json",
+                                                     "Transfer-Encoding": "chunked"}))
+            while True:
+                chunk = await chunks.get()
+                if chunk is StopIteration:
+                    break
+                if isinstance(chunk, Exception):
+                    # The status line is already sent, closing without the last chunk tells the client
+                    # the response is incomplete
+                    writer.close()
+                    return
+                writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                await writer.drain()
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        finally:
+            # If the client went away, keep taking chunks so the reader thread can finish and be reused
+            while chunk is not StopIteration:
+                chunk = await chunks.get()
+            await task
+
+    # ---- HTTP ----
+
+    def head(self, status, keep_alive, headers):
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def send_json(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode()
+        writer.write(self.head(status, keep_alive, {"Content-Type": "application/json",
+                                                    "Content-Length": len(body)}) + body)
+        await writer.drain()
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self.send_json(writer, 400, {"error": "Malformed request line."}, False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY_BYTES:
+                    await self.send_json(writer, 413, {"error": "Request body too large."}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                try:
+                    await self.dispatch(method.upper(), target, body, writer, keep_alive)
+                except Exception as error:
+                    await self.send_json(writer, error_status(error), error_body(error), keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, target, body, writer, keep_alive):
+        url = urlsplit(target)
+        path = [unquote(part) for part in url.path.strip("/").split("/") if part]
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+
+        if method == "GET":
+            if path == ["health"]:
+                return await self.send_json(writer, 200, {
+                    "ok": True, "pending_writes": self.write_queue.qsize(), **self.stats}, keep_alive)
+            if path == ["inventory"]:
+                return await self.stream(writer, keep_alive, inventory_chunks)
+            if path == ["inventory", "item"]:
+                key = tuple(clean_input(params.get(name, "")) for name in ("store", "item_no", "item_name"))
+                row = await self.read(InventoryEngine.get_inventory_item, *key)
+                if not row:
+                    raise ItemNotFoundError(f"Item ({key[0]}, {key[1]}, {key[2]}) not found in the inventory.")
+                return await self.send_json(writer, 200, dict(zip(INVENTORY_COLUMNS, key + tuple(row))), keep_alive)
+            if path == ["expenses"]:
+                return await self.stream(writer, keep_alive, lambda engine: (
+                    EXPENSE_SUMMARY_COLUMNS, [engine.expense_summary_rows()]))
+            if path == ["shipments", "report"]:
+                item = None
+                if params.get("item_no"):
+                    item = tuple(clean_input(params.get(name, "")) for name in ("store", "item_no", "item_name"))
+                shipping_to = params.get("shipping_to", "ALL")
+                start_date, end_date = parse_date_range(params.get("from"), params.get("to"), DAY_FORMAT)
+                return await self.stream(writer, keep_alive, lambda engine: (
+                    SHIPMENT_REPORT_COLUMNS, [engine.shipment_report(shipping_to, item, start_date, end_date)]))
+            if len(path) == 2 and path[0] == "ledger" and path[1] in LEDGER_COLUMNS:
+                after = None
+                if params.get("after_id"):
+                    after = (params.get("after_value"), int(params["after_id"]))
+                start_date, end_date = parse_date_range(params.get("from"), params.get("to"), DAY_FORMAT)
+                rows = await self.read(
+                    InventoryEngine.ledger_page, path[1], params.get("sort", "id"), params.get("descending") == "1",
+                    after, min(int(params.get("limit", 200)), 10000),
+                    {column: params[column] for column in LEDGER_COLUMNS[path[1]][1] if params.get(column)},
+                    start_date, end_date)
+                columns = ["id"] + LEDGER_COLUMNS[path[1]][1]
+                return await self.send_json(writer, 200, [dict(zip(columns, row)) for row in rows], keep_alive)
+            raise HTTPError(404, f"No such resource {url.path!r}.")
+
+        if method == "POST":
+            operation = path[0] if len(path) == 1 else None
+            if operation not in WRITE_OPERATIONS:
+                raise HTTPError(404, f"No such resource {url.path!r}.")
+            try:
+                payload = json.loads(body or b"null")
+            except ValueError:
+                raise HTTPError(400, "Request body is not valid JSON.")
+
+            # A list posts every entry as its own request, each gets its own result
+            if isinstance(payload, list):
+                results = await asyncio.gather(*(self.write(operation, entry) for entry in payload),
+                                               return_exceptions=True)
+                return await self.send_json(writer, 200, [
+                    {"status": error_status(result), **error_body(result)} if isinstance(result, Exception)
+                    else {"status": 200, **result} for result in results], keep_alive)
+            return await self.send_json(writer, 200, await self.write(operation, payload), keep_alive)
+
+        raise HTTPError(405, f"Method {method} is not allowed.")
+
+    # ---- Lifecycle ----
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, ready=None):
+        loop = asyncio.get_running_loop()
+        # The writer creates the schema before any read-only connection opens the file
+        await loop.run_in_executor(self.writer, self.open_writer)
+        self.write_queue = asyncio.Queue()
+        write_task = asyncio.create_task(self.write_loop())
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        if ready:
+            ready(server)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            write_task.cancel()
+            self.writer.shutdown(wait=True)
+            self.readers.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP/JSON API over the inventory database")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH,
+                        help=f"path of the SQLite database (default: {DEFAULT_DB_PATH})")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--readers", type=int, default=DEFAULT_READERS,
+                        help=f"read-only connections serving queries (default: {DEFAULT_READERS})")
+    args = parser.parse_args()
+
+    server = InventoryServer(args.db, args.readers)
+    try:
+        asyncio.run(server.serve(args.host, args.port, lambda s: print(
+            f"Serving {args.db} on http://{args.host}:{args.port}", file=sys.stderr)))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,547 @@
+import re
+import sys
+from functools import lru_cache
+from itertools import product
+
+
+# Every statement InventoryEngine and the modules around it run lives here, by name, so the text of each
+# one is the same on every call and sqlite3 prepares it once per connection. Statements whose WHERE clause depends on the filters
+# in use are built by the *_statement() functions below, once per combination of filters.
+# explain() shows how SQLite runs a statement, check_plans() lists the hot statements that would read a
+# whole table (python benchmark.py --check-plans runs it on a synthetic ledger).
+
+# Ledgers shown in the detail windows (the compatibility views of migration 5) and the columns they display, in display order
+LEDGER_COLUMNS = {
+    "incoming": ("incoming_items", ["entry_date", "store", "item_no", "item_name", "quantity", "price", "tax_rate"]),
+    "outgoing": ("outgoing_shipments", ["entry_date", "shipping_to", "store", "item_no", "item_name", "quantity",
+                                        "average_price_at_shipment", "average_price_at_shipment_after_tax"]),
+    "expense": ("expense_entries", ["entry_date", "store", "item_name", "quantity", "price", "tax_rate"]),
+}
+
+# The tables behind those views, for ledger_page, with the expression of every column not read straight
+# from the ledger row. entry_date sorts and ranges on the indexed integer entry_time and shows as text.
+ITEM_COLUMNS = {"store": "s.name", "item_no": "i.item_no", "item_name": "i.item_name"}
+# Text columns stored on the ledger rows themselves, every other column of the rows is a number or a date
+TEXT_LEDGER_COLUMNS = {"shipping_to", "item_name"}
+LEDGER_SOURCES = {
+    "incoming": ("incoming_ledger l JOIN items i ON i.id = l.item_id JOIN stores s ON s.id = i.store_id", ITEM_COLUMNS),
+    "outgoing": ("outgoing_ledger l JOIN items i ON i.id = l.item_id JOIN stores s ON s.id = i.store_id", ITEM_COLUMNS),
+    "expense": ("expense_ledger l JOIN stores s ON s.id = l.store_id", {"store": "s.name"}),
+}
+
+# Postings and reversals are logged to the events table straight from their ledger rows: the kind of event
+# a posting logs, and the expressions of the event columns after kind and ledger over the ledger table
+EVENT_COLUMNS = "kind, ledger, entry_id, item_id, store_id, item_name, quantity, unit_cost, unit_cost_after_tax, entry_time"
+LEDGER_EVENTS = {
+    "incoming": ("received", "incoming_ledger",
+                 "id, item_id, NULL, NULL, quantity, price, price + price * tax_rate / 100, entry_time"),
+    "outgoing": ("shipped", "outgoing_ledger",
+                 "id, item_id, NULL, NULL, quantity, average_price_at_shipment, average_price_at_shipment_after_tax, entry_time"),
+    "expense": ("expensed", "expense_ledger",
+                "id, NULL, store_id, item_name, quantity, price, price + price * tax_rate / 100, entry_time"),
+}
+
+# Summary tables derived from the ledgers, with their key and value columns (see rebuild.py)
+SUMMARY_COLUMNS = {
+    "inventory_balances": (["item_id"],
+                           ["total_quantity", "average_price_before_tax", "average_price_after_tax"]),
+    "expense_balances": (["store_id", "item_name"],
+                         ["total_quantity", "average_price_before_tax", "average_price_after_tax"]),
+    "shipment_summary": (["shipping_to", "item_id", "day"],
+                         ["shipment_count", "total_quantity", "total_cost", "total_cost_after_tax"]),
+}
+
+# Tables and views exporter.py writes out, in this order
+EXPORT_TABLES = ["incoming_items", "outgoing_shipments", "expense_entries", "expenses", "inventory"]
+
+
+def ledger_column(ledger, column, display=False):
+    # SQL expression of a column of LEDGER_COLUMNS[ledger] over LEDGER_SOURCES[ledger]
+    if column == "entry_date":
+        return "datetime(l.entry_time, 'unixepoch')" if display else "l.entry_time"
+    return LEDGER_SOURCES[ledger][1].get(column, f"l.{column}")
+
+
+STATEMENTS = {
+    # Settings and stores and items
+    "get_setting": 'SELECT value FROM settings WHERE name = ?',
+    "set_setting": 'INSERT OR REPLACE INTO settings (name, value) VALUES (?, ?)',
+    "data_version": 'PRAGMA data_version',
+    "cache_generation": 'PRAGMA temp.user_version',
+    "store_id": 'SELECT id FROM stores WHERE name = ?',
+    "insert_store": 'INSERT INTO stores (name) VALUES (?)',
+    "item_id": 'SELECT id FROM items WHERE store_id = ? AND item_no = ? AND item_name = ?',
+    "insert_item": 'INSERT INTO items (store_id, item_no, item_name) VALUES (?, ?, ?)',
+    "rename_item": 'UPDATE items SET item_no = ?, item_name = ? WHERE id = ?',
+
+    # Postings and reversals
+    "incoming_insert": '''
+        INSERT INTO incoming_ledger (item_id, quantity, price, tax_rate, entry_time)
+        VALUES (?, ?, ?, ?, ?)
+    ''',
+    "outgoing_insert": '''
+        INSERT INTO outgoing_ledger (item_id, quantity, shipping_to, average_price_at_shipment, average_price_at_shipment_after_tax, entry_time)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''',
+    "expense_insert": '''
+        INSERT INTO expense_ledger (store_id, item_name, quantity, price, tax_rate, entry_time)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''',
+    "outgoing_since": 'SELECT id, item_id, quantity FROM outgoing_ledger WHERE id > ? ORDER BY id',
+    "incoming_entry": '''
+        SELECT l.item_id, s.name, i.item_no, i.item_name, l.quantity
+        FROM incoming_ledger l JOIN items i ON i.id = l.item_id JOIN stores s ON s.id = i.store_id
+        WHERE l.id = ?
+    ''',
+    "outgoing_entry": '''
+        SELECT l.item_id, s.name, i.item_no, i.item_name
+        FROM outgoing_ledger l JOIN items i ON i.id = l.item_id JOIN stores s ON s.id = i.store_id
+        WHERE l.id = ?
+    ''',
+    "expense_entry": '''
+        SELECT l.store_id, s.name, l.item_name
+        FROM expense_ledger l JOIN stores s ON s.id = l.store_id
+        WHERE l.id = ?
+    ''',
+
+    # Event log and projections
+    "expense_row": '''
+        SELECT total_quantity, average_price_before_tax, average_price_after_tax
+        FROM expense_balances WHERE store_id = ? AND item_name = ?
+    ''',
+    "projection_state": 'SELECT name, last_seq FROM projection_state',
+    "events_after": '''
+        SELECT seq, kind, ledger, item_id, store_id, item_name, quantity, unit_cost, unit_cost_after_tax
+        FROM events WHERE seq > ? ORDER BY seq
+    ''',
+    "delete_inventory_row": 'DELETE FROM inventory_balances WHERE item_id = ? AND version = ?',
+    "update_inventory_row": '''
+        UPDATE inventory_balances
+        SET total_quantity = ?, average_price_before_tax = ?, average_price_after_tax = ?, version = version + 1
+        WHERE item_id = ? AND version = ? AND total_quantity >= ?
+    ''',
+    "insert_inventory_row": '''
+        INSERT INTO inventory_balances (item_id, total_quantity, average_price_before_tax, average_price_after_tax)
+        VALUES (?, ?, ?, ?)
+    ''',
+    "delete_expense_row": 'DELETE FROM expense_balances WHERE store_id = ? AND item_name = ?',
+    "upsert_expense_row": '''
+        INSERT OR REPLACE INTO expense_balances (store_id, item_name, total_quantity, average_price_before_tax, average_price_after_tax)
+        VALUES (?, ?, ?, ?, ?)
+    ''',
+    "set_projection_seq": 'UPDATE projection_state SET last_seq = ?',
+
+    # FIFO cost layers
+    "open_cost_layers": '''
+        INSERT INTO cost_layers (id, item_id, entry_time, quantity, remaining_quantity, price, price_after_tax)
+        SELECT id, item_id, entry_time, quantity, quantity, price, price + price * tax_rate / 100
+        FROM incoming_ledger WHERE id > ?
+    ''',
+    "oldest_open_layer": '''
+        SELECT id, remaining_quantity FROM cost_layers
+        WHERE item_id = ? AND remaining_quantity > 0
+        ORDER BY entry_time, id
+        LIMIT 1
+    ''',
+    "take_from_layer": 'UPDATE cost_layers SET remaining_quantity = remaining_quantity - ? WHERE id = ?',
+    "record_layer_taken": '''
+        INSERT INTO shipment_cost_layers (shipment_id, layer_id, quantity) VALUES (?, ?, ?)
+        ON CONFLICT (shipment_id, layer_id) DO UPDATE SET quantity = quantity + excluded.quantity
+    ''',
+    "restore_layers": '''
+        UPDATE cost_layers
+        SET remaining_quantity = remaining_quantity + (
+            SELECT quantity FROM shipment_cost_layers WHERE shipment_id = ? AND layer_id = cost_layers.id)
+        WHERE id IN (SELECT layer_id FROM shipment_cost_layers WHERE shipment_id = ?)
+    ''',
+    "delete_shipment_layers": 'DELETE FROM shipment_cost_layers WHERE shipment_id = ?',
+    "layer_consumers": '''
+        SELECT s.shipment_id, s.quantity, l.item_id
+        FROM shipment_cost_layers s JOIN cost_layers l ON l.id = s.layer_id
+        WHERE s.layer_id = ?
+        ORDER BY s.shipment_id
+    ''',
+    "delete_layer_consumers": 'DELETE FROM shipment_cost_layers WHERE layer_id = ?',
+    "delete_layer": 'DELETE FROM cost_layers WHERE id = ?',
+    "receipts_by_date": '''
+        SELECT id, item_id, entry_time, quantity, price, price + price * tax_rate / 100
+        FROM incoming_ledger ORDER BY entry_time, id
+    ''',
+    "shipments_by_date": 'SELECT id, item_id, quantity FROM outgoing_ledger ORDER BY entry_time, id',
+    "delete_all_shipment_layers": 'DELETE FROM shipment_cost_layers',
+    "delete_all_layers": 'DELETE FROM cost_layers',
+    "insert_layer": '''
+        INSERT INTO cost_layers (id, item_id, entry_time, quantity, remaining_quantity, price, price_after_tax)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''',
+    "insert_shipment_layer": 'INSERT INTO shipment_cost_layers (shipment_id, layer_id, quantity) VALUES (?, ?, ?)',
+    "item_open_layers": '''
+        SELECT id, datetime(entry_time, 'unixepoch'), remaining_quantity, price, price_after_tax FROM cost_layers
+        WHERE item_id = ? AND remaining_quantity > 0
+        ORDER BY entry_time, id
+    ''',
+
+    # Queries
+    "inventory_row": '''
+        SELECT total_quantity, average_price_before_tax, average_price_after_tax, version FROM inventory_balances WHERE item_id = ?
+    ''',
+    "inventory_rows": '''
+        SELECT s.name, i.item_no, i.item_name, b.total_quantity, b.average_price_before_tax, b.average_price_after_tax
+        FROM inventory_balances b
+        JOIN items i ON i.id = b.item_id
+        JOIN stores s ON s.id = i.store_id
+    ''',
+    "expense_summary_rows": '''
+        SELECT
+            s.name,
+            b.item_name,
+            b.total_quantity,
+            b.average_price_before_tax,
+            b.average_price_after_tax,
+            b.average_price_after_tax*b.total_quantity AS total_cost
+        FROM expense_balances b
+        JOIN stores s ON s.id = b.store_id
+    ''',
+    # Items in stock or shipped at some point, shipment_summary is probed through its item_id index
+    "store_item_triplets": '''
+        SELECT s.name, i.item_no, i.item_name
+        FROM items i JOIN stores s ON s.id = i.store_id
+        WHERE EXISTS (SELECT 1 FROM inventory_balances b WHERE b.item_id = i.id)
+           OR EXISTS (SELECT 1 FROM shipment_summary ss WHERE ss.item_id = i.id)
+    ''',
+    "is_store_item_triplet": '''
+        SELECT EXISTS (SELECT 1 FROM inventory_balances WHERE item_id = ?)
+            OR EXISTS (SELECT 1 FROM shipment_summary WHERE item_id = ?)
+    ''',
+    "store_names": 'SELECT id, name FROM stores',
+    "item_names": 'SELECT i.id, s.name, i.item_no, i.item_name FROM items i JOIN stores s ON s.id = i.store_id',
+
+    # Snapshots, recovery and the tail of the event log (events.py)
+    "latest_snapshot": 'SELECT MAX(seq) FROM projection_snapshots WHERE seq <= COALESCE(?, seq)',
+    "snapshot_inventory_rows": '''
+        SELECT item_id, total_quantity, average_price_before_tax, average_price_after_tax
+        FROM inventory_snapshots WHERE seq = ?
+    ''',
+    "snapshot_expense_rows": '''
+        SELECT store_id, item_name, total_quantity, average_price_before_tax, average_price_after_tax
+        FROM expense_snapshots WHERE seq = ?
+    ''',
+    "events_between": '''
+        SELECT seq, kind, ledger, item_id, store_id, item_name, quantity, unit_cost, unit_cost_after_tax
+        FROM events WHERE seq > ? AND seq <= COALESCE(?, seq) ORDER BY seq
+    ''',
+    "insert_snapshot": 'INSERT OR REPLACE INTO projection_snapshots (seq) VALUES (?)',
+    "delete_inventory_snapshot": 'DELETE FROM inventory_snapshots WHERE seq = ?',
+    "delete_expense_snapshot": 'DELETE FROM expense_snapshots WHERE seq = ?',
+    "snapshot_inventory": '''
+        INSERT INTO inventory_snapshots (seq, item_id, total_quantity, average_price_before_tax, average_price_after_tax)
+        SELECT ?, item_id, total_quantity, average_price_before_tax, average_price_after_tax FROM inventory_balances
+    ''',
+    "snapshot_expenses": '''
+        INSERT INTO expense_snapshots (seq, store_id, item_name, total_quantity, average_price_before_tax, average_price_after_tax)
+        SELECT ?, store_id, item_name, total_quantity, average_price_before_tax, average_price_after_tax FROM expense_balances
+    ''',
+    "kept_snapshots": 'SELECT seq FROM projection_snapshots ORDER BY seq DESC LIMIT ?',
+    "event_tail": '''
+        SELECT e.seq, e.kind, e.ledger, e.entry_id, s.name, i.item_no, COALESCE(i.item_name, e.item_name),
+               e.quantity, e.unit_cost, e.entry_time
+        FROM events e
+        LEFT JOIN items i ON i.id = e.item_id
+        LEFT JOIN stores s ON s.id = COALESCE(i.store_id, e.store_id)
+        ORDER BY e.seq DESC LIMIT ?
+    ''',
+
+    # Inventory checkpoints (checkpoints.py)
+    "nearest_checkpoint": 'SELECT MAX(checkpoint_date) FROM inventory_checkpoint_dates WHERE checkpoint_date <= ?',
+    "checkpoint_rows": '''
+        SELECT item_id, total_quantity, average_price_before_tax, average_price_after_tax
+        FROM inventory_checkpoints WHERE checkpoint_date = ?
+    ''',
+    # Both ledgers in (entry_time, id) order straight off their entry_time indexes, to be merged
+    "receipts_between": '''
+        SELECT entry_time, 0, id, item_id, quantity, price, price + price * tax_rate / 100
+        FROM incoming_ledger WHERE entry_time >= ? AND entry_time < ? ORDER BY entry_time, id
+    ''',
+    "shipments_between": '''
+        SELECT entry_time, 1, id, item_id, quantity, NULL, NULL
+        FROM outgoing_ledger WHERE entry_time >= ? AND entry_time < ? ORDER BY entry_time, id
+    ''',
+    "delete_checkpoint": 'DELETE FROM inventory_checkpoints WHERE checkpoint_date = ?',
+    "insert_checkpoint_row": '''
+        INSERT INTO inventory_checkpoints (checkpoint_date, item_id, total_quantity, average_price_before_tax, average_price_after_tax)
+        VALUES (?, ?, ?, ?, ?)
+    ''',
+    "insert_checkpoint_date": 'INSERT OR REPLACE INTO inventory_checkpoint_dates (checkpoint_date, created_at) VALUES (?, ?)',
+    "first_entry_time": '''
+        SELECT MIN(day) FROM (
+            SELECT MIN(entry_time) AS day FROM incoming_ledger
+            UNION ALL
+            SELECT MIN(entry_time) FROM outgoing_ledger
+        )
+    ''',
+    "checkpoint_dates": 'SELECT checkpoint_date FROM inventory_checkpoint_dates',
+
+    # Rebuilding and verifying the summary tables (rebuild.py). Expenses and shipment totals do not depend
+    # on the order of the entries, SQLite aggregates them directly.
+    "expense_balances_expected": '''
+        SELECT store_id, item_name, SUM(quantity),
+               COALESCE(SUM(quantity * price) / NULLIF(SUM(quantity), 0), 0),
+               COALESCE(SUM(quantity * (price + price * tax_rate / 100)) / NULLIF(SUM(quantity), 0), 0)
+        FROM expense_ledger
+        GROUP BY store_id, item_name
+    ''',
+    "shipment_summary_expected": '''
+        SELECT shipping_to, item_id, entry_time / 86400, COUNT(*), SUM(quantity),
+               SUM(quantity * average_price_at_shipment), SUM(quantity * average_price_at_shipment_after_tax)
+        FROM outgoing_ledger
+        GROUP BY shipping_to, item_id, entry_time / 86400
+    ''',
+    "catch_up_projection_state": 'UPDATE projection_state SET last_seq = (SELECT COALESCE(MAX(seq), 0) FROM events)',
+
+    # Sales analytics (analytics.py), item ids index its per-item arrays
+    "max_item_id": 'SELECT MAX(id) FROM items',
+    "window_shipments": '''
+        SELECT shipping_to, item_id, day, total_quantity, total_cost
+        FROM shipment_summary WHERE day BETWEEN ? AND ?
+    ''',
+    "window_receipts": 'SELECT item_id, quantity FROM incoming_ledger WHERE entry_time >= ? AND entry_time < ?',
+    "on_hand": 'SELECT item_id, total_quantity FROM inventory_balances',
+}
+
+# Per ledger: the last id, the ids and logging of the rows posted after an id, and logging and deleting one row
+for ledger, (kind, table, columns) in LEDGER_EVENTS.items():
+    STATEMENTS[f"{ledger}_last_id"] = f'SELECT MAX(id) FROM {table}'
+    STATEMENTS[f"{ledger}_ids_since"] = f'SELECT id FROM {table} WHERE id > ? ORDER BY id'
+    STATEMENTS[f"{ledger}_log_postings"] = f'''
+        INSERT INTO events ({EVENT_COLUMNS})
+        SELECT '{kind}', '{ledger}', {columns} FROM {table} WHERE id > ? ORDER BY id
+    '''
+    STATEMENTS[f"{ledger}_log_reversal"] = f'''
+        INSERT INTO events ({EVENT_COLUMNS})
+        SELECT 'reversed', '{ledger}', {columns} FROM {table} WHERE id = ?
+    '''
+    STATEMENTS[f"{ledger}_delete"] = f'DELETE FROM {table} WHERE id = ?'
+
+# Per snapshot table: dropping the snapshots older than a seq
+for table in ("projection_snapshots", "inventory_snapshots", "expense_snapshots"):
+    STATEMENTS[f"{table}_delete_before"] = f'DELETE FROM {table} WHERE seq < ?'
+
+# Per summary table: its stored rows, emptying it, counting it, and refilling it from the ledgers where
+# SQLite computes the expected rows
+for table, (key_columns, value_columns) in SUMMARY_COLUMNS.items():
+    columns = ", ".join(key_columns + value_columns)
+    STATEMENTS[f"{table}_rows"] = f'SELECT {columns} FROM {table}'
+    STATEMENTS[f"{table}_delete_all"] = f'DELETE FROM {table}'
+    STATEMENTS[f"{table}_count"] = f'SELECT COUNT(*) FROM {table}'
+    if f"{table}_expected" in STATEMENTS:
+        STATEMENTS[f"{table}_rebuild"] = f'INSERT INTO {table} ({columns}) {STATEMENTS[f"{table}_expected"]}'
+
+# Per exported table: its rows, its row count and its declared column types
+for table in EXPORT_TABLES:
+    STATEMENTS[f"{table}_export"] = f'SELECT * FROM {table}'
+    STATEMENTS[f"{table}_export_count"] = f'SELECT COUNT(*) FROM {table}'
+    STATEMENTS[f"{table}_column_types"] = f'PRAGMA table_info({table})'
+
+
+@lru_cache(maxsize=None)
+def shipment_report_statement(by_shipping_to, by_item, from_day, to_day):
+    # Read the rollup instead of the shipments, so the cost follows the number of items, not of shipments.
+    # Totals are grouped by item id and the names joined in once per item. Parameters: shipping_to,
+    # item_id, first day, day after the last, for the filters that are set.
+    where_conditions = [condition for condition, used in (
+        ("ss.shipping_to = ?", by_shipping_to), ("ss.item_id = ?", by_item),
+        ("ss.day >= ?", from_day), ("ss.day < ?", to_day)) if used]
+    # Left to itself SQLite walks the whole item_id index to group without sorting even when only one
+    # end of the day range is set, the unary + keeps it on the day index and sorts what it read instead
+    group_by = "+ss.item_id" if from_day or to_day else "ss.item_id"
+    return f'''
+        SELECT s.name, i.item_no, i.item_name, r.total_quantity, r.total_cost, r.total_cost_after_tax
+        FROM (
+            SELECT ss.item_id, SUM(ss.total_quantity) as total_quantity, SUM(ss.total_cost) as total_cost, SUM(ss.total_cost_after_tax) as total_cost_after_tax
+            FROM shipment_summary ss
+            {"WHERE " + " AND ".join(where_conditions) if where_conditions else ""}
+            GROUP BY {group_by}
+        ) r
+        JOIN items i ON i.id = r.item_id
+        JOIN stores s ON s.id = i.store_id
+    '''
+
+
+@lru_cache(maxsize=None)
+def fifo_cost_statement(from_time, to_time):
+    # The layers a shipment took from are found through the shipment_cost_layers primary key,
+    # item names are joined in once per item after grouping. Parameters: the first entry_time and the
+    # one after the last, for the bounds that are set.
+    where_conditions = [condition for condition, used in (
+        ("o.entry_time >= ?", from_time), ("o.entry_time < ?", to_time)) if used]
+    return f'''
+        SELECT st.name, i.item_no, i.item_name, f.quantity, f.fifo_cost, f.fifo_cost_after_tax, f.average_cost, f.average_cost_after_tax
+        FROM (
+            SELECT item_id, SUM(quantity) AS quantity, SUM(fifo_cost) AS fifo_cost, SUM(fifo_cost_after_tax) AS fifo_cost_after_tax,
+                   SUM(quantity * average_price_at_shipment) AS average_cost,
+                   SUM(quantity * average_price_at_shipment_after_tax) AS average_cost_after_tax
+            FROM (
+                SELECT o.item_id, o.quantity, o.average_price_at_shipment, o.average_price_at_shipment_after_tax,
+                       (SELECT SUM(s.quantity * l.price) FROM shipment_cost_layers s JOIN cost_layers l ON l.id = s.layer_id
+                        WHERE s.shipment_id = o.id) AS fifo_cost,
+                       (SELECT SUM(s.quantity * l.price_after_tax) FROM shipment_cost_layers s JOIN cost_layers l ON l.id = s.layer_id
+                        WHERE s.shipment_id = o.id) AS fifo_cost_after_tax
+                FROM outgoing_ledger o
+                {"WHERE " + " AND ".join(where_conditions) if where_conditions else ""}
+            )
+            GROUP BY item_id
+        ) f
+        JOIN items i ON i.id = f.item_id
+        JOIN stores st ON st.id = i.store_id
+    '''
+
+
+def ledger_filter(ledger, column):
+    # Condition matching the rows whose column starts with a prefix, taking the prefix and the string just
+    # past it. Stores and items are narrowed to ids through the stores and items indexes first, text
+    # columns of the ledger row compare as a string range, and numbers and dates are compared as the text
+    # they show as, so "1" finds quantities 1, 12 and 120.
+    if column == "store":
+        stores = "SELECT id FROM stores WHERE name >= ? AND name < ?"
+        if ledger == "expense":
+            return f"l.store_id IN ({stores})"
+        return f"l.item_id IN (SELECT id FROM items WHERE store_id IN ({stores}))"
+    if column in ITEM_COLUMNS and ledger != "expense":
+        return f"l.item_id IN (SELECT id FROM items WHERE {column} >= ? AND {column} < ?)"
+    if column in TEXT_LEDGER_COLUMNS:
+        return f"l.{column} >= ? AND l.{column} < ?"
+    expression = f"CAST({ledger_column(ledger, column, display=True)} AS TEXT)"
+    return f"{expression} >= ? AND {expression} < ?"
+
+
+@lru_cache(maxsize=1024)
+def ledger_page_statement(ledger, sort_column, descending, after, filter_columns, from_time, to_time):
+    # One page of a ledger using keyset pagination on (sort_column, id). Parameters: a prefix and the
+    # string just past it per column of filter_columns (see ledger_filter), the first entry_time and the one after the last for the
+    # bounds that are set, the key to continue after when after is set ((sort value, id), or only id when
+    # sorting by id), and the page size.
+    _, columns = LEDGER_COLUMNS[ledger]
+    where_conditions = []
+
+    for column in filter_columns:
+        where_conditions.append(ledger_filter(ledger, column))
+
+    # The date range is a range of the entry_time index
+    if from_time:
+        where_conditions.append("l.entry_time >= ?")
+    if to_time:
+        where_conditions.append("l.entry_time < ?")
+
+    comparison = "<" if descending else ">"
+    sort_expression = "l.id" if sort_column == "id" else ledger_column(ledger, sort_column)
+    if after:
+        if sort_column == "id":
+            where_conditions.append(f"l.id {comparison} ?")
+        else:
+            where_conditions.append(f"({sort_expression}, l.id) {comparison} (?, ?)")
+
+    direction = "DESC" if descending else "ASC"
+    order_by = f"l.id {direction}" if sort_column == "id" else f"{sort_expression} {direction}, l.id {direction}"
+    return f'''
+        SELECT l.id, {", ".join(ledger_column(ledger, column, display=True) for column in columns)}
+        FROM {LEDGER_SOURCES[ledger][0]}
+        {"WHERE " + " AND ".join(where_conditions) if where_conditions else ""}
+        ORDER BY {order_by}
+        LIMIT ?
+    '''
+
+
+# sqlite3 keeps this many prepared statements per connection (its default is 128): every registered
+# statement, every variant of the shipment and FIFO cost reports, and the unfiltered pages of every ledger
+# in every sort order, first and following pages. Filtered pages take the least recently used slots.
+REPORT_VARIANTS = 2 ** 4 + 2 ** 2
+LEDGER_PAGE_VARIANTS = sum((len(columns) + 1) * 2 * 2 for _, columns in LEDGER_COLUMNS.values())
+STATEMENT_CACHE_SIZE = len(STATEMENTS) + REPORT_VARIANTS + LEDGER_PAGE_VARIANTS
+
+
+# ---- Query plans ----
+
+def explain(conn, sql):
+    # EXPLAIN QUERY PLAN of sql as indented lines, with NULL for every parameter
+    rows = conn.execute('EXPLAIN QUERY PLAN ' + sql, [None] * sql.count("?")).fetchall()
+    depths = {0: -1}
+    lines = []
+    for node, parent, _, detail in rows:
+        depths[node] = depths.get(parent, -1) + 1
+        lines.append("  " * depths[node] + detail)
+    return lines
+
+
+def full_scans(plan):
+    # The lines of a plan that read a whole table or index. Scans of subquery results and of the
+    # temporary b-trees behind ORDER BY and GROUP BY are not counted.
+    derived = {match.group(2) for match in map(re.compile(r"\s*(CO-ROUTINE|MATERIALIZE) (\S+)").match, plan) if match}
+    return [line for line in plan
+            if (match := re.match(r"\s*SCAN (\S+)", line)) and match.group(1) not in derived | {"CONSTANT"}]
+
+
+def hot_statements():
+    # (name, sql) of the statements that must look rows up through an index: stock checks, postings,
+    # reversals and deletes by key, snapshot, checkpoint and date-range reads, and the shipment report and
+    # ledger pages once they are filtered. The unfiltered report, the summaries, rebuilds and exports
+    # read everything by design and are left out, as are the few rows of projection_snapshots.
+    names = [
+        "store_id", "item_id", "rename_item", "inventory_row", "outgoing_since", "is_store_item_triplet",
+        "incoming_entry", "outgoing_entry", "expense_entry",
+        "expense_row", "events_after", "delete_inventory_row", "update_inventory_row", "delete_expense_row",
+        "open_cost_layers", "oldest_open_layer", "take_from_layer", "restore_layers", "delete_shipment_layers",
+        "layer_consumers", "delete_layer_consumers", "delete_layer", "item_open_layers",
+        "snapshot_inventory_rows", "snapshot_expense_rows", "events_between", "delete_inventory_snapshot",
+        "delete_expense_snapshot",
+        "nearest_checkpoint", "checkpoint_rows", "receipts_between", "shipments_between", "delete_checkpoint",
+        "first_entry_time", "window_shipments", "window_receipts",
+    ] + [f"{ledger}_{action}" for ledger in LEDGER_EVENTS for action in ("log_postings", "log_reversal", "delete")] + [
+        f"{table}_delete_before" for table in ("projection_snapshots", "inventory_snapshots", "expense_snapshots")]
+    statements = [(name, STATEMENTS[name]) for name in names]
+    for variant in product((False, True), repeat=4):
+        if any(variant):
+            statements.append((f"shipment_report{variant}", shipment_report_statement(*variant)))
+    for ledger in LEDGER_COLUMNS:
+        for descending in (False, True):
+            statements.append((f"{ledger}_page after id", ledger_page_statement(
+                ledger, "id", descending, True, (), False, False)))
+            statements.append((f"{ledger}_page after entry_date", ledger_page_statement(
+                ledger, "entry_date", descending, True, (), False, False)))
+            statements.append((f"{ledger}_page in date range", ledger_page_statement(
+                ledger, "entry_date", descending, False, (), True, True)))
+    return statements
+
+
+def query_plans(conn):
+    # {name: plan} of every registered statement and the hot statement variants
+    plans = {name: explain(conn, sql) for name, sql in STATEMENTS.items()}
+    plans.update((name, explain(conn, sql)) for name, sql in hot_statements())
+    return plans
+
+
+def check_plans(conn):
+    # [(name, plan)] of the hot statements that would read a whole table, empty when they all use an index
+    regressions = []
+    for name, sql in hot_statements():
+        plan = explain(conn, sql)
+        if full_scans(plan):
+            regressions.append((name, plan))
+    return regressions
+
+
+if __name__ == "__main__":
+    from db import connect
+
+    if len(sys.argv) > 2 or (len(sys.argv) == 2 and sys.argv[1] != "check"):
+        print("Usage: python statements.py [check]")
+        sys.exit(1)
+
+    conn = connect(readonly=True)
+    if len(sys.argv) == 2:
+        regressions = check_plans(conn)
+        for name, plan in regressions:
+            print(f"{name} reads a whole table:", *plan, sep="\n    ")
+        print(f"{len(regressions)} of {len(hot_statements())} hot statements read a whole table")
+        sys.exit(1 if regressions else 0)
+    for name, plan in query_plans(conn).items():
+        print(name, *plan, sep="\n    ")
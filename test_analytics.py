@@ -0,0 +1,53 @@
+import math
+
+import pytest
+
+from analytics import analyze
+from db import connect
+from engine import IncomingItem, InventoryEngine, OutgoingShipment
+
+# analytics imports numpy on first use
+pytest.importorskip("numpy")
+
+
+def test_velocity_cover_reorder_points_and_channel_shares_over_a_fixed_window(tmp_path):
+    engine = InventoryEngine(connect(str(tmp_path / "inventory.db")))
+    engine.receive(IncomingItem("S1", "A1", "APPLE", 100, 1, 0, "2025-02-01 09:00:00"))
+    engine.receive(IncomingItem("S1", "B1", "PEAR", 10, 3, 0, "2025-03-03 09:00:00"))
+    for item_no, item_name, quantity, shipping_to, day in [
+            ("A1", "APPLE", 2, "USA FBA", "2025-02-28"),  # the day before the window
+            ("A1", "APPLE", 10, "USA FBA", "2025-03-02"),
+            ("A1", "APPLE", 5, "CAN FBA", "2025-03-02"),
+            ("A1", "APPLE", 5, "USA FBA", "2025-03-06"),
+            ("A1", "APPLE", 1, "USA FBA", "2025-03-11"),  # the day after
+            ("B1", "PEAR", 8, "USA FBA", "2025-03-04")]:
+        engine.ship(OutgoingShipment("S1", item_no, item_name, quantity, shipping_to, f"{day} 12:00:00"))
+
+    result = analyze(engine.conn, as_of="2025-03-10", window_days=10, lead_time_days=2)
+    assert (str(result.start_day), str(result.end_day)) == ("2025-03-01", "2025-03-10")
+
+    # Fewest days of cover first
+    pear, apple = result.items
+    assert (pear.item_name, pear.on_hand, pear.received, pear.shipped) == ("PEAR", 2, 10, 8)
+    assert pear.daily_velocity == pytest.approx(0.8)
+    assert pear.demand_stddev == pytest.approx(2.4)
+    assert pear.days_of_cover == pytest.approx(2.5)
+    assert pear.sell_through == pytest.approx(0.8)
+    assert pear.reorder_point == pytest.approx(0.8 * 2 + 1.65 * 2.4 * math.sqrt(2))
+    assert pear.suggested_order == 7
+
+    # 15 units on one day and 5 on another, the two destinations of the first day count as one day's demand
+    assert (apple.item_name, apple.on_hand, apple.received, apple.shipped) == ("APPLE", 77, 0, 20)
+    assert apple.daily_velocity == pytest.approx(2)
+    assert apple.demand_stddev == pytest.approx(math.sqrt(21))
+    assert apple.days_of_cover == pytest.approx(38.5)
+    assert math.isnan(apple.sell_through)
+    assert apple.reorder_point == pytest.approx(2 * 2 + 1.65 * math.sqrt(21) * math.sqrt(2))
+    assert apple.suggested_order == 0
+
+    usa, can = result.channels
+    assert (usa.shipping_to, usa.shipped, usa.total_cost) == ("USA FBA", 23, 39)
+    assert (can.shipping_to, can.shipped, can.total_cost) == ("CAN FBA", 5, 5)
+    assert (usa.share, can.share) == (pytest.approx(23 / 28), pytest.approx(5 / 28))
+    assert (usa.sell_through, can.sell_through) == (pytest.approx(2.3), pytest.approx(0.5))
+    engine.conn.close()
@@ -0,0 +1,30 @@
+from catalog import SkuCatalog
+from db import connect
+from engine import IncomingItem, InventoryEngine, OutgoingShipment
+
+
+def test_reversals_report_whether_the_item_is_still_listed_and_load_takes_triplets_read_elsewhere(tmp_path):
+    path = str(tmp_path / "inventory.db")
+    engine = InventoryEngine(connect(path))
+    apple = engine.receive(IncomingItem("S1", "A1", "APPLE", 10, 2, 0))
+    pear = engine.receive(IncomingItem("S1", "B1", "PEAR", 10, 2, 0))
+    shipped = engine.ship(OutgoingShipment("S1", "B1", "PEAR", 10, "USA FBA"))
+    catalog = SkuCatalog(engine)
+    assert catalog.search("") == [("S1", "A1", "APPLE"), ("S1", "B1", "PEAR")]
+
+    key, listed = engine.reverse_incoming(apple)
+    assert (key, listed) == (("S1", "A1", "APPLE"), False)
+    catalog.remove(key)
+    assert catalog.search("APP") == [] and catalog.search("S1 A1") == []
+
+    # Sold out but shipped, so still listed until the shipment is reversed and then its receipt
+    assert engine.reverse_shipment(shipped) == (("S1", "B1", "PEAR"), True)
+    assert engine.reverse_incoming(pear) == (("S1", "B1", "PEAR"), False)
+
+    other = InventoryEngine(connect(path))
+    other.receive(IncomingItem("S2", "C1", "PLUM", 1, 1, 0))
+    assert catalog.search("PL") == []
+    catalog.load(other.store_item_triplets())
+    assert catalog.search("") == [("S2", "C1", "PLUM")]
+    other.conn.close()
+    engine.conn.close()
@@ -0,0 +1,41 @@
+from checkpoints import create_checkpoints, inventory_as_of, nearest_checkpoint, parse_day, replay, state_as_of
+from db import connect
+from engine import IncomingItem, InventoryEngine, OutgoingShipment
+
+DAYS = ["2025-01-15", "2025-01-31", "2025-02-10", "2025-02-28", "2025-03-01", "2025-03-20"]
+
+
+def full_replay(conn, day):
+    state = {}
+    replay(conn, state, None, parse_day(day))
+    return state
+
+
+def test_a_checkpoint_and_the_rows_after_it_match_a_full_replay_even_after_a_backdated_receipt(tmp_path):
+    engine = InventoryEngine(connect(str(tmp_path / "inventory.db")))
+    for item_no, item_name, quantity, price, day in [
+            ("A1", "APPLE", 10, 2, "2025-01-05"), ("B1", "PEAR", 6, 1.25, "2025-01-12"),
+            ("A1", "APPLE", 5, 3.5, "2025-02-03"), ("A1", "APPLE", 8, 2.75, "2025-03-04")]:
+        engine.receive(IncomingItem("S1", item_no, item_name, quantity, price, 8, f"{day} 09:00:00"))
+    for item_no, item_name, quantity, day in [
+            ("A1", "APPLE", 4, "2025-01-20"), ("B1", "PEAR", 6, "2025-02-14"), ("A1", "APPLE", 3, "2025-03-10")]:
+        engine.ship(OutgoingShipment("S1", item_no, item_name, quantity, "USA FBA", f"{day} 15:00:00"))
+
+    assert create_checkpoints(engine.conn, "monthly", "2025-03-20") == ["2025-01-31", "2025-02-28"]
+    assert nearest_checkpoint(engine.conn, "2025-03-20") == "2025-02-28"
+    for day in DAYS:
+        assert state_as_of(engine.conn, day) == full_replay(engine.conn, day), day
+
+    # A receipt dated before the latest checkpoint drops the checkpoints it changes
+    engine.receive(IncomingItem("S1", "B1", "PEAR", 4, 2, 8, "2025-01-25 09:00:00"))
+    assert nearest_checkpoint(engine.conn, "2025-03-20") is None
+    for day in DAYS:
+        assert state_as_of(engine.conn, day) == full_replay(engine.conn, day), day
+
+    assert create_checkpoints(engine.conn, "monthly", "2025-03-20") == ["2025-01-31", "2025-02-28"]
+    for day in DAYS:
+        assert state_as_of(engine.conn, day) == full_replay(engine.conn, day), day
+    # Of the ten pears received by the 25th, the February shipment took six
+    pear = [row for row in inventory_as_of(engine.conn, "2025-02-28") if row[2] == "PEAR"]
+    assert [row[3] for row in pear] == [4]
+    engine.conn.close()
@@ -0,0 +1,40 @@
+import sqlite3
+
+import pytest
+
+from db import connect, run_with_retries, transaction
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = connect(str(tmp_path / "inventory.db"))
+    conn.execute('CREATE TABLE entries (id INTEGER PRIMARY KEY, value TEXT)')
+    yield conn
+    conn.close()
+
+
+def failing_until(attempt):
+    calls = []
+
+    def function():
+        calls.append(attempt)
+        if len(calls) < attempt:
+            error = sqlite3.OperationalError("database is locked")
+            error.sqlite_errorcode = sqlite3.SQLITE_BUSY
+            raise error
+        return len(calls)
+    return function, calls
+
+
+def test_run_with_retries_runs_a_busy_function_again(conn):
+    function, calls = failing_until(3)
+    assert run_with_retries(conn, function, base_delay=0) == 3
+    assert len(calls) == 3
+
+
+def test_run_with_retries_does_not_retry_inside_an_open_transaction(conn):
+    function, calls = failing_until(2)
+    with pytest.raises(sqlite3.OperationalError):
+        with transaction(conn):
+            run_with_retries(conn, function, base_delay=0)
+    assert len(calls) == 1
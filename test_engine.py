@@ -0,0 +1,235 @@
+import pytest
+
+from db import connect, transaction
+from engine import (MIGRATIONS, ConcurrentUpdateError, ExpenseEntry, IncomingItem, InsufficientQuantityError,
+                    InventoryEngine, OutgoingShipment, migrate, parse_date_range)
+from statements import LEDGER_COLUMNS
+from events import recover
+from rebuild import rebuild
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = InventoryEngine(connect(str(tmp_path / "inventory.db")))
+    yield engine
+    engine.conn.close()
+
+
+def page_ids(engine, ledger, filters):
+    return [row[0] for row in engine.ledger_page(ledger, filters=filters)]
+
+
+def all_pages(engine, ledger, sort_column, descending, limit, **options):
+    # Page through the ledger the way PagedTreeview does, each page continuing from the last row's key
+    position = 0 if sort_column == "id" else LEDGER_COLUMNS[ledger][1].index(sort_column) + 1
+    pages, after = [], None
+    while True:
+        page = engine.ledger_page(ledger, sort_column, descending, after, limit, **options)
+        assert len(page) <= limit
+        if not page:
+            return pages
+        pages.append(page)
+        after = (page[-1][position], page[-1][0])
+
+
+def test_ledger_filter_matches_a_prefix_of_numeric_columns(engine):
+    ids = [engine.receive(IncomingItem("S1", "A1", "APPLE", quantity, 2.5, 8, "2025-03-05 10:00:00"))
+           for quantity in (1, 12, 120, 21)]
+    assert page_ids(engine, "incoming", {"quantity": "1"}) == ids[:3]
+    assert page_ids(engine, "incoming", {"quantity": "12"}) == ids[1:3]
+    assert page_ids(engine, "incoming", {"price": "2.5"}) == ids
+    assert page_ids(engine, "incoming", {"entry_date": "2025-03"}) == ids
+
+
+def test_ledger_filter_matches_stores_items_and_text_columns(engine):
+    apple = engine.receive(IncomingItem("STORE1", "A1", "APPLE", 10, 1, 0))
+    pear = engine.receive(IncomingItem("STORE2", "B1", "PEAR", 10, 1, 0))
+    shipped = engine.ship(OutgoingShipment("STORE2", "B1", "PEAR", 1, "USA FBA"))
+    engine.ship(OutgoingShipment("STORE1", "A1", "APPLE", 1, "CAN MFN"))
+    expense = engine.add_expense(ExpenseEntry("STORE2", "TAPE", 1, 3, 0))
+    engine.add_expense(ExpenseEntry("STORE1", "BOXES", 1, 3, 0))
+
+    assert page_ids(engine, "incoming", {"store": "store2"}) == [pear]
+    assert page_ids(engine, "incoming", {"item_no": "A"}) == [apple]
+    assert page_ids(engine, "incoming", {"item_name": "PE"}) == [pear]
+    assert page_ids(engine, "outgoing", {"shipping_to": "USA"}) == [shipped]
+    assert page_ids(engine, "expense", {"store": "STORE2"}) == [expense]
+    assert page_ids(engine, "expense", {"item_name": "TA"}) == [expense]
+
+
+@pytest.mark.parametrize("rewrite", [rebuild, recover])
+def test_rewriting_the_balances_on_the_engines_connection_refreshes_its_cache(engine, rewrite):
+    engine.receive(IncomingItem("S1", "A1", "APPLE", 10, 2, 0))
+    with transaction(engine.conn):
+        engine.conn.execute('UPDATE inventory_balances SET total_quantity = 0')
+    engine.clear_inventory_cache()
+    assert engine.get_inventory_item("S1", "A1", "APPLE")[0] == 0
+
+    rewrite(engine.conn)
+    assert engine.get_inventory_item("S1", "A1", "APPLE")[0] == 10
+
+
+def test_a_posting_that_loses_a_race_for_a_row_fails_inside_a_transaction_and_succeeds_on_retry(engine, tmp_path):
+    other = InventoryEngine(connect(str(tmp_path / "inventory.db")))
+    engine.receive(IncomingItem("S1", "A1", "APPLE", 10, 2, 0))
+    sync = engine._sync_inventory_cache
+    attempts = []
+
+    def sync_from_the_second_attempt():
+        # As if the other station's commit slipped past the check, the cached row and its version are stale
+        attempts.append(len(attempts) + 1)
+        if len(attempts) > 1:
+            sync()
+
+    def race():
+        # The engine caches the row, then the other station changes it
+        engine._sync_inventory_cache = sync
+        engine.get_inventory_item("S1", "A1", "APPLE")
+        other.receive(IncomingItem("S1", "A1", "APPLE", 5, 2, 0))
+        attempts.clear()
+        engine._sync_inventory_cache = sync_from_the_second_attempt
+
+    race()
+    with pytest.raises(ConcurrentUpdateError):
+        with transaction(engine.conn):
+            engine.ship(OutgoingShipment("S1", "A1", "APPLE", 3, "USA FBA"))
+    assert attempts == [1]
+    assert engine.ledger_page("outgoing") == []
+
+    race()
+    engine.ship(OutgoingShipment("S1", "A1", "APPLE", 3, "USA FBA"))
+    assert attempts == [1, 2]
+    assert len(engine.ledger_page("outgoing")) == 1
+    assert other.get_inventory_item("S1", "A1", "APPLE")[0] == 17
+    other.conn.close()
+
+
+def table_counts(conn):
+    return {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+            for table in ("stores", "items", "incoming_ledger", "outgoing_ledger", "events", "inventory_balances")}
+
+
+def test_a_failed_batch_is_rolled_back_completely(engine):
+    engine.receive(IncomingItem("S1", "A1", "APPLE", 10, 2, 0))
+    before = table_counts(engine.conn)
+
+    with pytest.raises(ValueError):
+        engine.receive_batch([IncomingItem("S1", "A1", "APPLE", 5, 2, 0), IncomingItem("S2", "B1", "PEAR", 5, 2, 0),
+                              IncomingItem("S2", "B2", "PLUM", "five", 2, 0)])
+    with pytest.raises(InsufficientQuantityError):
+        with transaction(engine.conn):
+            engine.ship(OutgoingShipment("S1", "A1", "APPLE", 4, "USA FBA"))
+            engine.receive(IncomingItem("S3", "C1", "FIG", 1, 1, 0))
+            engine.ship(OutgoingShipment("S1", "A1", "APPLE", 7, "USA FBA"))
+    engine.clear_inventory_cache()
+
+    assert table_counts(engine.conn) == before
+    assert engine.get_inventory_item("S1", "A1", "APPLE")[0] == 10
+    assert engine.get_inventory_item("S2", "B1", "PEAR") is None
+
+
+def test_the_id_of_a_reversed_newest_entry_is_not_handed_out_again(engine):
+    engine.receive(IncomingItem("S1", "A1", "APPLE", 10, 2, 0))
+    newest = engine.receive(IncomingItem("S1", "A1", "APPLE", 5, 3, 0))
+    engine.reverse_incoming(newest)
+    assert engine.receive(IncomingItem("S1", "A1", "APPLE", 1, 1, 0)) > newest
+
+    shipment = engine.ship(OutgoingShipment("S1", "A1", "APPLE", 2, "USA FBA"))
+    engine.reverse_shipment(shipment)
+    assert engine.ship(OutgoingShipment("S1", "A1", "APPLE", 2, "USA FBA")) > shipment
+
+
+def test_the_ledger_migration_starts_the_ids_past_entries_reversed_before_it(tmp_path, monkeypatch):
+    conn = connect(str(tmp_path / "inventory.db"))
+    monkeypatch.setattr("engine.MIGRATIONS", MIGRATIONS[:8])
+    engine = InventoryEngine(conn)
+    engine.receive(IncomingItem("S1", "A1", "APPLE", 10, 2, 0))
+    newest = engine.receive(IncomingItem("S1", "A1", "APPLE", 5, 3, 0))
+    engine.reverse_incoming(newest)
+    shipment = engine.ship(OutgoingShipment("S1", "A1", "APPLE", 4, "USA FBA"))
+
+    monkeypatch.undo()
+    migrate(conn)
+    assert engine.receive(IncomingItem("S1", "A1", "APPLE", 1, 1, 0)) > newest
+    # The rebuilt table kept its rows and the rollup triggers
+    engine.ship(OutgoingShipment("S1", "A1", "APPLE", 1, "USA FBA"))
+    assert [row[0] for row in engine.ledger_page("outgoing")] == [shipment, shipment + 1]
+    assert conn.execute("SELECT SUM(shipment_count), SUM(total_quantity) FROM shipment_summary").fetchone() == (2, 5)
+    conn.close()
+
+
+def test_the_shipment_rollup_matches_a_group_by_over_the_shipments(engine):
+    engine.receive(IncomingItem("S1", "A1", "APPLE", 50, 2, 8, "2025-03-01 09:00:00"))
+    engine.receive(IncomingItem("S1", "B1", "PEAR", 20, 1.25, 0, "2025-03-01 09:00:00"))
+    engine.ship(OutgoingShipment("S1", "A1", "APPLE", 4, "USA FBA", "2025-03-02 10:00:00"))
+    reversed_shipment = engine.ship(OutgoingShipment("S1", "A1", "APPLE", 6, "USA FBA", "2025-03-02 11:00:00"))
+    engine.receive(IncomingItem("S1", "A1", "APPLE", 10, 3, 8, "2025-03-02 12:00:00"))
+    engine.ship(OutgoingShipment("S1", "A1", "APPLE", 5, "USA FBA", "2025-03-02 23:59:59"))
+    engine.reverse_shipment(reversed_shipment)
+    posted, rejected = engine.ship_batch([
+        OutgoingShipment("S1", "A1", "APPLE", 3, "CAN FBA", "2025-03-03 00:00:00"),
+        OutgoingShipment("S1", "B1", "PEAR", 25, "USA FBA", "2025-03-03 08:00:00"),  # only 20 on hand
+        OutgoingShipment("S1", "B1", "PEAR", 7, "USA FBA", "2025-03-03 08:00:00"),
+        OutgoingShipment("S1", "B1", "PEAR", 2, "USA FBA", "2025-03-04 08:00:00"),
+    ])
+    assert (len(posted), len(rejected)) == (3, 1)
+
+    rollup = engine.conn.execute('''
+        SELECT r.shipping_to, s.name, i.item_no, i.item_name, date(r.day * 86400, 'unixepoch'),
+               r.shipment_count, r.total_quantity, round(r.total_cost, 6), round(r.total_cost_after_tax, 6)
+        FROM shipment_summary r JOIN items i ON i.id = r.item_id JOIN stores s ON s.id = i.store_id
+        ORDER BY 1, 2, 3, 4, 5
+    ''').fetchall()
+    grouped = engine.conn.execute('''
+        SELECT shipping_to, store, item_no, item_name, date(entry_date), COUNT(*), SUM(quantity),
+               round(SUM(quantity * average_price_at_shipment), 6), round(SUM(quantity * average_price_at_shipment_after_tax), 6)
+        FROM outgoing_shipments
+        GROUP BY shipping_to, store, item_no, item_name, date(entry_date)
+        ORDER BY 1, 2, 3, 4, 5
+    ''').fetchall()
+    assert rollup == grouped
+    assert [row[4:7] for row in rollup] == [("2025-03-03", 1, 3), ("2025-03-02", 2, 9), ("2025-03-03", 1, 7),
+                                            ("2025-03-04", 1, 2)]
+
+
+@pytest.mark.parametrize("sort_column", ["id", "quantity", "entry_date", "item_name"])
+@pytest.mark.parametrize("descending", [False, True])
+def test_keyset_pages_cover_every_row_once_across_ties_at_page_boundaries(engine, sort_column, descending):
+    # Three quantities and four days, so every page boundary falls among rows with the same sort value
+    for n in range(23):
+        engine.receive(IncomingItem("S1", f"A{n % 2}", f"ITEM {n % 5}", 1 + n % 3, 2, 0,
+                                    f"2025-03-0{1 + n % 4} 10:00:00"))
+    rows = engine.ledger_page("incoming", limit=100)
+    position = 0 if sort_column == "id" else LEDGER_COLUMNS["incoming"][1].index(sort_column) + 1
+    expected = sorted(rows, key=lambda row: (row[position], row[0]), reverse=descending)
+
+    for limit in (1, 4, 5, 23):
+        pages = all_pages(engine, "incoming", sort_column, descending, limit)
+        assert [row for page in pages for row in page] == expected, limit
+        assert [len(page) for page in pages[:-1]] == [limit] * (len(pages) - 1)
+
+
+def test_date_ranges_include_the_whole_end_day_and_combine_with_filters(engine):
+    for entry_date, item_no in [("2025-02-28 23:59:59", "A1"), ("2025-03-01 00:00:00", "A1"),
+                                ("2025-03-01 12:00:00", "B1"), ("2025-03-02 23:59:59", "A1"),
+                                ("2025-03-03 00:00:00", "A1"), ("2025-03-02 08:00:00", "A12")]:
+        engine.receive(IncomingItem("S1", item_no, "APPLE", 1, 2, 0, entry_date))
+
+    start_date, end_date = parse_date_range("03/01/2025", "03/02/2025")
+    assert (str(start_date), str(end_date)) == ("2025-03-01 00:00:00", "2025-03-03 00:00:00")
+    assert parse_date_range(" ", "") == (None, None)
+    with pytest.raises(ValueError):
+        parse_date_range("2025-03-01", None)
+
+    def dates(limit, **options):
+        pages = all_pages(engine, "incoming", "entry_date", False, limit, start_date=start_date, end_date=end_date,
+                          **options)
+        return [row[1] for page in pages for row in page]
+
+    assert dates(2) == ["2025-03-01 00:00:00", "2025-03-01 12:00:00", "2025-03-02 08:00:00", "2025-03-02 23:59:59"]
+    assert dates(1, filters={"item_no": "A1"}) == ["2025-03-01 00:00:00", "2025-03-02 08:00:00",
+                                                   "2025-03-02 23:59:59"]
+    assert dates(3, filters={"item_no": "A12"}) == ["2025-03-02 08:00:00"]
+    no_start, end_of_february = parse_date_range("", "02/28/2025")
+    assert no_start is None
+    assert [row[1] for row in engine.ledger_page("incoming", end_date=end_of_february)] == ["2025-02-28 23:59:59"]
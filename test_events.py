@@ -0,0 +1,39 @@
+from db import connect, transaction
+from engine import ExpenseEntry, IncomingItem, InventoryEngine, OutgoingShipment
+from events import create_snapshot, recover, replay_events
+
+
+def balances(conn):
+    inventory = dict((row[0], tuple(row[1:])) for row in conn.execute(
+        'SELECT item_id, total_quantity, average_price_before_tax, average_price_after_tax FROM inventory_balances'))
+    expenses = dict((tuple(row[:2]), tuple(row[2:])) for row in conn.execute(
+        'SELECT store_id, item_name, total_quantity, average_price_before_tax, average_price_after_tax FROM expense_balances'))
+    return inventory, expenses
+
+
+def test_recovering_from_a_snapshot_and_the_events_after_it_matches_a_full_replay(tmp_path):
+    engine = InventoryEngine(connect(str(tmp_path / "inventory.db")))
+    engine.receive(IncomingItem("S1", "A1", "APPLE", 10, 2, 8))
+    engine.receive(IncomingItem("S1", "B1", "PEAR", 4, 1.5, 0))
+    engine.ship(OutgoingShipment("S1", "A1", "APPLE", 3, "USA FBA"))
+    engine.add_expense(ExpenseEntry("S1", "TAPE", 2, 3, 5))
+    with transaction(engine.conn):
+        engine.catch_up()
+        create_snapshot(engine.conn)
+
+    engine.receive(IncomingItem("S1", "A1", "APPLE", 6, 3.25, 8))
+    shipped = engine.ship(OutgoingShipment("S1", "B1", "PEAR", 4, "CAN FBA"))
+    engine.reverse_shipment(shipped)
+    engine.ship(OutgoingShipment("S1", "A1", "APPLE", 5, "USA MFN"))
+    engine.add_expense(ExpenseEntry("S1", "TAPE", 1, 4, 5))
+
+    inventory, expenses = {}, {}
+    last_seq = replay_events(engine.conn, inventory, expenses)
+    engine.conn.execute('DELETE FROM inventory_balances')
+    engine.conn.commit()
+
+    assert recover(engine.conn) == last_seq
+    recovered_inventory, recovered_expenses = balances(engine.conn)
+    assert recovered_inventory == inventory
+    assert recovered_expenses == expenses
+    engine.conn.close()
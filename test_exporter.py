@@ -0,0 +1,63 @@
+import csv
+import gzip
+
+import pytest
+
+from db import connect
+from engine import ExpenseEntry, IncomingItem, InventoryEngine, OutgoingShipment
+from exporter import count_rows, export_database
+from statements import EXPORT_TABLES
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = InventoryEngine(connect(str(tmp_path / "inventory.db")))
+    for n in range(5):
+        engine.receive(IncomingItem("S1", f"A{n}", f"ITEM {n}", 10 + n, 1.5 + n, 8, f"2025-03-0{n + 1} 09:00:00"))
+    for n in range(3):
+        engine.ship(OutgoingShipment("S1", f"A{n}", f"ITEM {n}", 2, "USA FBA", f"2025-03-0{n + 5} 10:00:00"))
+    engine.add_expense(ExpenseEntry("S1", "TAPE", 2, 3, 5, "2025-03-02 09:00:00"))
+    engine.add_expense(ExpenseEntry("S2", "BOXES", 10, 0.5, 5, "2025-03-03 09:00:00"))
+    yield engine
+    engine.conn.close()
+
+
+def table_rows(conn, table):
+    cursor = conn.execute(f'SELECT * FROM {table}')
+    return [column[0] for column in cursor.description], cursor.fetchall()
+
+
+def test_csv_gz_round_trips_the_rows_and_headers_of_every_table(engine, tmp_path):
+    progress = []
+    result = export_database(engine.conn, "csv.gz", str(tmp_path / "export"), chunk_size=2, progress=progress.append)
+    assert result.rows == count_rows(engine.conn) == 5 + 3 + 2 + 2 + 5
+    assert progress[-1] == result.rows
+
+    assert result.paths == [str(tmp_path / f"export_{table}.csv.gz") for table in EXPORT_TABLES]
+    for table, path in zip(EXPORT_TABLES, result.paths):
+        with gzip.open(path, "rt", newline="", encoding="utf-8") as f:
+            header, *rows = list(csv.reader(f))
+        columns, expected = table_rows(engine.conn, table)
+        assert header == columns, table
+        assert rows == [["" if value is None else str(value) for value in row] for row in expected], table
+
+
+def test_xlsx_writes_a_sheet_per_table(engine, tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    result = export_database(engine.conn, "xlsx", str(tmp_path / "export"), chunk_size=2)
+    workbook = openpyxl.load_workbook(result.paths[0], read_only=True)
+    assert workbook.sheetnames == EXPORT_TABLES
+    for table in EXPORT_TABLES:
+        header, *rows = list(workbook[table].iter_rows(values_only=True))
+        columns, expected = table_rows(engine.conn, table)
+        assert (list(header), len(rows)) == (columns, len(expected)), table
+    workbook.close()
+
+
+def test_parquet_writes_a_file_per_table(engine, tmp_path):
+    parquet = pytest.importorskip("pyarrow.parquet")
+    result = export_database(engine.conn, "parquet", str(tmp_path / "export"), chunk_size=2)
+    for table, path in zip(EXPORT_TABLES, result.paths):
+        exported = parquet.read_table(path)
+        columns, expected = table_rows(engine.conn, table)
+        assert (exported.column_names, exported.num_rows) == (columns, len(expected)), table
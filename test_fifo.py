@@ -0,0 +1,76 @@
+import pytest
+
+from db import connect
+from engine import IncomingItem, InsufficientQuantityError, InventoryEngine, OutgoingShipment
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = InventoryEngine(connect(str(tmp_path / "inventory.db")))
+    engine.set_lot_tracking(True)
+    yield engine
+    engine.conn.close()
+
+
+def receive(engine, quantity, price, day):
+    return engine.receive(IncomingItem("S1", "A1", "APPLE", quantity, price, 10, f"2025-03-{day:02d} 09:00:00"))
+
+
+def ship(engine, quantity, day):
+    return engine.ship(OutgoingShipment("S1", "A1", "APPLE", quantity, "USA FBA", f"2025-03-{day:02d} 12:00:00"))
+
+
+def open_layers(engine):
+    return [(layer[0], layer[2]) for layer in engine.open_cost_layers("S1", "A1", "APPLE")]
+
+
+def test_shipments_take_from_the_oldest_layer_first(engine):
+    first, second = receive(engine, 10, 2, 1), receive(engine, 10, 4, 2)
+    ship(engine, 15, 3)
+    assert open_layers(engine) == [(second, 5)]
+
+
+def test_reversing_a_shipment_gives_its_quantities_back_to_the_layers_it_took_them_from(engine):
+    first, second = receive(engine, 10, 2, 1), receive(engine, 10, 4, 2)
+    shipped = ship(engine, 15, 3)
+    engine.reverse_shipment(shipped)
+    assert open_layers(engine) == [(first, 10), (second, 10)]
+
+
+def test_a_receipt_whose_stock_was_shipped_cannot_be_reversed(engine):
+    received = receive(engine, 10, 2, 1)
+    ship(engine, 4, 2)
+    with pytest.raises(InsufficientQuantityError):
+        engine.reverse_incoming(received)
+    assert open_layers(engine) == [(received, 6)]
+
+
+def test_fifo_cost_of_shipments_prices_each_shipment_at_the_layers_it_took(engine):
+    receive(engine, 10, 2, 1)
+    receive(engine, 10, 4, 2)
+    ship(engine, 15, 3)
+    ship(engine, 2, 10)
+
+    (row,) = engine.fifo_cost_of_shipments()
+    assert row[:4] == ("S1", "A1", "APPLE", 17)
+    assert row[4] == pytest.approx(10 * 2 + 7 * 4)
+    assert row[5] == pytest.approx((10 * 2 + 7 * 4) * 1.1)
+    assert row[6] == pytest.approx(17 * 3)
+
+    (row,) = engine.fifo_cost_of_shipments("2025-03-05", "2025-03-31")
+    assert row[3:5] == (2, pytest.approx(2 * 4))
+
+
+def test_lot_tracking_turned_on_by_another_station_applies_to_the_next_posting(tmp_path):
+    path = str(tmp_path / "inventory.db")
+    engine = InventoryEngine(connect(path))
+    receive(engine, 10, 2, 1)
+    other = InventoryEngine(connect(path))
+    other.set_lot_tracking(True)
+
+    received = receive(engine, 10, 4, 2)
+    ship(engine, 12, 3)
+    assert engine.lot_tracking
+    assert open_layers(engine) == [(received, 8)]
+    other.conn.close()
+    engine.conn.close()
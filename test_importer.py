@@ -0,0 +1,34 @@
+from db import connect
+from engine import InventoryEngine
+from importer import import_file
+from workers import WorkerPool
+
+
+class FakeRoot:
+
+    def after(self, ms, callback):
+        pass
+
+
+def test_an_import_runs_on_a_worker_connection_and_reports_progress(tmp_path):
+    path = str(tmp_path / "inventory.db")
+    engine = InventoryEngine(connect(path))
+    csv_path = tmp_path / "incoming.csv"
+    lines = ["store,item_no,item_name,quantity,price,tax_rate"]
+    lines += [f"S1,A{n % 3},ITEM {n % 3},2,1.5,0" for n in range(7)]
+    lines.append("S1,A9,ITEM 9,not a number,1,0")
+    csv_path.write_text("\n".join(lines) + "\n")
+
+    workers = WorkerPool(FakeRoot(), path)
+    results, progress = [], []
+    workers.submit("Importing file", lambda worker, job: import_file(worker, str(csv_path), "incoming", 3, job.progress),
+                   on_done=results.append, on_progress=lambda done, total: progress.append(done), writable=True)
+    workers.executor.shutdown(wait=True)
+    workers.poll()
+
+    result, = results
+    assert (result.imported, result.batches, len(result.rejected)) == (7, 3, 1)
+    assert progress == [3, 6, 8]
+    # The main connection sees the worker's commits
+    assert engine.get_inventory_item("S1", "A0", "ITEM 0")[0] == 6
+    engine.conn.close()
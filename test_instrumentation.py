@@ -0,0 +1,65 @@
+import sqlite3
+
+import pytest
+
+from instrumentation import RECORDER, Histogram, InstrumentedConnection, timed
+
+
+@pytest.fixture
+def conn():
+    RECORDER.reset()
+    conn = sqlite3.connect(":memory:", factory=InstrumentedConnection)
+    yield conn
+    conn.close()
+    RECORDER.reset()
+
+
+def operations():
+    return {operation.name: operation for operation in RECORDER.report()}
+
+
+def test_statements_are_counted_under_their_fingerprint_with_the_rows_they_touched(conn):
+    conn.execute("CREATE TABLE t (a INTEGER, b TEXT)")
+    conn.executemany("INSERT INTO t (a, b) VALUES (?, ?)", [(n, f"row {n}") for n in range(5)])
+    conn.commit()
+    assert conn.execute("SELECT b FROM t WHERE a = 1").fetchall() == [("row 1",)]
+    assert len(list(conn.execute("SELECT b FROM t WHERE a >= 2"))) == 3
+    cursor = conn.cursor()
+    cursor.execute("SELECT a FROM t WHERE b IN ('row 0', 'row 4')")
+    assert len(cursor.fetchmany(1) + cursor.fetchmany(5)) == 2
+    conn.execute("SELECT a FROM t WHERE b IN ('row 1', 'row 2', 'row 3')").fetchone()
+
+    recorded = operations()
+    insert = recorded["sql: INSERT INTO t (a, b) VALUES (?, ...)"]
+    assert (insert.count, insert.rows) == (1, 5)
+    select = recorded["sql: SELECT b FROM t WHERE a = ?"]
+    assert (select.count, select.rows) == (1, 1)
+    assert recorded["sql: SELECT b FROM t WHERE a >= ?"].rows == 3
+    # Other literals and another length of IN list are the same statement
+    in_list = recorded["sql: SELECT a FROM t WHERE b IN (?, ...)"]
+    assert (in_list.count, in_list.rows) == (2, 3)
+    assert recorded["commit"].count == 1
+    for operation in recorded.values():
+        assert 0 <= operation.p50 <= operation.p95 <= operation.p99 <= operation.max <= operation.total
+
+    with timed("job: export", 7):
+        pass
+    assert (operations()["job: export"].count, operations()["job: export"].rows) == (1, 7)
+
+    RECORDER.reset()
+    assert RECORDER.report() == []
+    conn.execute("SELECT a FROM t WHERE a = 4").fetchone()
+    assert [(operation.name, operation.count, operation.rows) for operation in RECORDER.report()] == [
+        ("sql: SELECT a FROM t WHERE a = ?", 1, 1)]
+
+
+def test_percentiles_are_the_upper_bound_of_their_bucket():
+    histogram = Histogram()
+    for _ in range(98):
+        histogram.add(0.001)
+    histogram.add(0.05)
+    histogram.add(2.0)
+    assert histogram.percentile(0.5) == pytest.approx(0.001)
+    assert histogram.percentile(0.99) == pytest.approx(10 ** (-13 / 10))
+    assert histogram.percentile(1.0) == 2.0
+    assert (histogram.count, histogram.max) == (100, 2.0)
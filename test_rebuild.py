@@ -0,0 +1,17 @@
+from db import connect
+from engine import IncomingItem, InventoryEngine, OutgoingShipment
+from rebuild import rebuild, verify
+
+
+def test_a_backdated_receipt_is_not_reported_as_drift_or_rebuilt_away(tmp_path):
+    engine = InventoryEngine(connect(str(tmp_path / "inventory.db")))
+    engine.receive(IncomingItem("S1", "A1", "APPLE", 10, 2, 0, "2025-03-01 09:00:00"))
+    engine.ship(OutgoingShipment("S1", "A1", "APPLE", 10, "USA FBA", "2025-03-02 09:00:00"))
+    engine.receive(IncomingItem("S1", "A1", "APPLE", 10, 4, 0, "2025-03-03 09:00:00"))
+    engine.receive(IncomingItem("S1", "A1", "APPLE", 10, 8, 0, "2025-03-01 10:00:00"))
+    assert engine.get_inventory_item("S1", "A1", "APPLE")[:2] == (20, 6.0)
+
+    assert verify(engine.conn) == []
+    rebuild(engine.conn)
+    assert engine.get_inventory_item("S1", "A1", "APPLE")[:2] == (20, 6.0)
+    engine.conn.close()
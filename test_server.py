@@ -0,0 +1,132 @@
+import asyncio
+import json
+import threading
+from http.client import HTTPConnection
+
+import pytest
+
+import server
+from engine import IncomingItem
+from server import InventoryServer
+
+
+@pytest.fixture
+def api(tmp_path):
+    inventory_server = InventoryServer(str(tmp_path / "inventory.db"), readers=2)
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    state = {}
+
+    def ready(listener):
+        state["port"] = listener.sockets[0].getsockname()[1]
+        started.set()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        state["task"] = loop.create_task(inventory_server.serve("127.0.0.1", 0, ready))
+        try:
+            loop.run_until_complete(state["task"])
+        except asyncio.CancelledError:
+            pass
+        # Let the handlers of connections still open finish before the loop goes
+        pending = asyncio.all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        loop.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert started.wait(10)
+    connection = HTTPConnection("127.0.0.1", state["port"], timeout=10)
+
+    def request(method, target, payload=None):
+        body = None if payload is None else payload if isinstance(payload, bytes) else json.dumps(payload)
+        connection.request(method, target, body=body)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+
+    yield request
+    connection.close()
+    loop.call_soon_threadsafe(state["task"].cancel)
+    thread.join(10)
+
+
+def receipt(item_no, quantity, price):
+    return {"store": "S1", "item_no": item_no, "item_name": f"ITEM {item_no}", "quantity": quantity,
+            "price": price, "tax_rate": 0}
+
+
+def test_single_and_list_posts_get_their_own_results(api):
+    status, result = api("POST", "/receive", receipt("A1", 10, 2))
+    assert status == 200 and result["id"] == 1
+
+    status, results = api("POST", "/ship", [
+        {"store": "S1", "item_no": "A1", "item_name": "ITEM A1", "quantity": 4, "shipping_to": "USA FBA"},
+        {"store": "S1", "item_no": "A1", "item_name": "ITEM A1", "quantity": 7, "shipping_to": "USA FBA"},
+        {"store": "S1", "item_no": "NOPE", "item_name": "PEAR", "quantity": 1, "shipping_to": "USA FBA"},
+    ])
+    assert status == 200
+    assert results[0]["status"] == 200 and results[0]["average_price_at_shipment"] == 2
+    assert (results[1]["status"], results[1]["available_quantity"]) == (409, 6)
+    assert results[2]["status"] == 404
+
+    status, item = api("GET", "/inventory/item?store=S1&item_no=A1&item_name=ITEM%20A1")
+    assert status == 200 and item["total_quantity"] == 6
+
+
+def test_a_bad_payload_is_a_400(api):
+    assert api("POST", "/receive", {"store": "S1"})[0] == 400
+    assert api("POST", "/receive", b"{not json")[0] == 400
+    assert api("POST", "/reverse", {"ledger": "nowhere", "id": 1})[0] == 400
+    status, results = api("POST", "/receive", [receipt("A1", 1, 1), "not an object"])
+    assert [result["status"] for result in results] == [200, 400]
+
+
+def test_the_inventory_streams_every_row(api, monkeypatch):
+    monkeypatch.setattr(server, "STREAM_CHUNK_SIZE", 3)
+    assert api("GET", "/inventory") == (200, [])
+
+    api("POST", "/receive", [receipt(f"A{n:02}", n + 1, 1) for n in range(8)])
+    status, rows = api("GET", "/inventory")
+    assert status == 200
+    assert [(row["item_no"], row["total_quantity"]) for row in rows] == [(f"A{n:02}", n + 1) for n in range(8)]
+
+
+def test_ledger_pages_follow_on_from_the_last_row(api):
+    api("POST", "/receive", [{**receipt("A1", n + 1, 1), "entry_date": f"2025-03-{n + 1:02} 10:00:00"}
+                             for n in range(5)])
+
+    status, first = api("GET", "/ledger/incoming?limit=2")
+    assert status == 200 and [row["id"] for row in first] == [1, 2]
+    _, second = api("GET", f"/ledger/incoming?limit=2&after_id={first[-1]['id']}&after_value={first[-1]['id']}")
+    assert [row["id"] for row in second] == [3, 4]
+
+    _, dated = api("GET", "/ledger/incoming?from=2025-03-02&to=2025-03-03")
+    assert [row["quantity"] for row in dated] == [2, 3]
+    _, filtered = api("GET", "/ledger/incoming?quantity=4")
+    assert [row["id"] for row in filtered] == [4]
+    assert api("GET", "/ledger/nowhere")[0] == 404
+
+
+def test_a_failed_request_rolls_back_to_its_savepoint_without_undoing_the_others(tmp_path, monkeypatch):
+    def receive_then_fail(engine, payload):
+        engine.receive(IncomingItem(**payload))
+        raise ValueError("rejected after posting")
+
+    monkeypatch.setitem(server.WRITE_OPERATIONS, "receive_then_fail", receive_then_fail)
+    inventory_server = InventoryServer(str(tmp_path / "inventory.db"))
+    inventory_server.open_writer()
+    results = inventory_server.run_write_batch([
+        ("receive", receipt("A1", 10, 2)),
+        ("receive_then_fail", receipt("A1", 5, 8)),
+        ("receive", receipt("A1", 10, 4)),
+    ])
+
+    assert isinstance(results[1], ValueError)
+    engine = inventory_server.write_engine
+    assert engine.get_inventory_item("S1", "A1", "ITEM A1")[:2] == (20, 3)
+    assert [row[5] for row in engine.ledger_page("incoming")] == [10, 10]
+    engine.conn.close()
+    inventory_server.writer.shutdown()
+    inventory_server.readers.shutdown()
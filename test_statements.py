@@ -0,0 +1,20 @@
+from benchmark import check_size, generate_ledger
+from db import connect
+from engine import InventoryEngine
+from statements import STATEMENT_CACHE_SIZE, STATEMENTS, hot_statements, query_plans
+
+
+def test_no_hot_statement_reads_a_whole_table_of_a_generated_ledger(tmp_path):
+    assert check_size(20000, 42, str(tmp_path)) == []
+
+
+def test_every_registered_statement_can_be_planned(tmp_path):
+    conn = connect(str(tmp_path / "inventory.db"))
+    generate_ledger(InventoryEngine(conn), 1000)
+    assert set(STATEMENTS) <= set(query_plans(conn))
+    conn.close()
+
+
+def test_the_statement_cache_holds_every_registered_statement_and_hot_variant():
+    statements = set(STATEMENTS.values()) | {sql for _, sql in hot_statements()}
+    assert STATEMENT_CACHE_SIZE >= len(statements)
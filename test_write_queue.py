@@ -0,0 +1,61 @@
+import pytest
+
+from db import connect
+from engine import IncomingItem, InsufficientQuantityError, InventoryEngine, ItemNotFoundError, OutgoingShipment
+from write_queue import WriteQueue
+
+
+def test_futures_resolve_to_the_ids_of_their_own_rows_when_shipments_are_rejected(tmp_path):
+    path = str(tmp_path / "inventory.db")
+    engine = InventoryEngine(connect(path))
+    engine.receive(IncomingItem("S1", "A1", "APPLE", 10, 2, 0))
+
+    with WriteQueue(path, max_delay=10) as write_queue:
+        futures = [
+            write_queue.submit(OutgoingShipment("S1", "A1", "APPLE", 4, "USA FBA")),
+            write_queue.submit(OutgoingShipment("S1", "A1", "APPLE", 7, "USA FBA")),  # only 6 left
+            write_queue.submit(OutgoingShipment("S1", "NOPE", "PEAR", 1, "USA FBA")),
+            write_queue.submit(OutgoingShipment("S1", "A1", "APPLE", 5, "CAN FBA")),
+            write_queue.submit(IncomingItem("S1", "B1", "PEAR", 3, 1, 0)),
+            write_queue.submit(OutgoingShipment("S1", "A1", "APPLE", 2, "USA MFN")),  # only 1 left
+        ]
+        write_queue.flush()
+
+    with pytest.raises(InsufficientQuantityError):
+        futures[1].result()
+    with pytest.raises(ItemNotFoundError):
+        futures[2].result()
+    with pytest.raises(InsufficientQuantityError):
+        futures[5].result()
+
+    shipments = {row[0]: (row[2], row[6]) for row in engine.ledger_page("outgoing")}
+    assert shipments[futures[0].result()] == ("USA FBA", 4)
+    assert shipments[futures[3].result()] == ("CAN FBA", 5)
+    assert len(shipments) == 2
+    receipts = {row[0]: row[4] for row in engine.ledger_page("incoming")}
+    assert receipts[futures[4].result()] == "PEAR"
+    engine.conn.close()
+
+
+def test_an_entry_with_a_bad_date_or_no_item_is_rejected_alone(tmp_path):
+    path = str(tmp_path / "inventory.db")
+    engine = InventoryEngine(connect(path))
+    engine.receive(IncomingItem("S1", "A1", "APPLE", 10, 2, 0))
+
+    with WriteQueue(path, max_delay=10) as write_queue:
+        futures = [
+            write_queue.submit(IncomingItem("S1", "B1", "PEAR", 3, 1, 0, "2025-03-05 10:00:00")),
+            write_queue.submit(OutgoingShipment("S1", "A1", "APPLE", 4, "USA FBA", "13/45/2025")),
+            write_queue.submit(OutgoingShipment("S1", "A1", "APPLE", 2, "CAN FBA", "2025-03-05 11:00:00")),
+            write_queue.submit(IncomingItem("S1", " ", "PLUM", 3, 1, 0)),
+        ]
+        write_queue.flush()
+
+    with pytest.raises(ValueError):
+        futures[1].result()
+    with pytest.raises(ValueError):
+        futures[3].result()
+    assert [row[0] for row in engine.ledger_page("incoming")][1:] == [futures[0].result()]
+    assert [row[0] for row in engine.ledger_page("outgoing")] == [futures[2].result()]
+    assert engine.get_inventory_item("S1", "A1", "APPLE")[0] == 8
+    engine.conn.close()
@@ -0,0 +1,133 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from db import connect
+from engine import InventoryEngine
+from instrumentation import timed
+
+
+# Queries, exports and imports started from the app run on a small pool of threads, each with its own
+# read-only connection and, for jobs that write, its own writable one, so the Tk main loop keeps drawing
+# while they run. Tk may only be touched from the main
+# thread: finished jobs and progress updates go onto a queue that the main thread drains every POLL_MS
+# through root.after, and the callbacks run there.
+
+DEFAULT_WORKERS = 2
+POLL_MS = 50
+
+# SQLite calls the progress handler every this many virtual machine instructions, a cancelled job's
+# query stops at the next call
+PROGRESS_HANDLER_STEPS = 10000
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+
+    def __init__(self, name, results, on_done=None, on_error=None, on_progress=None):
+        self.name = name
+        self.results = results
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        # A queued job never starts, a running one stops at its next query step or progress report.
+        # Either way none of its callbacks are called any more.
+        self.cancelled.set()
+
+    def check(self):
+        if self.cancelled.is_set():
+            raise JobCancelled(f"{self.name} was cancelled.")
+
+    def progress(self, done, total=None):
+        # Called from the job, doubles as a cancellation point for work done in Python
+        self.check()
+        self.results.put((self, "progress", (done, total)))
+
+
+class WorkerPool:
+
+    def __init__(self, root, path=None, workers=DEFAULT_WORKERS):
+        self.root = root
+        self.path = path
+        self.results = queue.Queue()
+        self.local = threading.local()
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="inventory-worker")
+        self.jobs = set()
+        self.closed = False
+        self.root.after(POLL_MS, self.poll)
+
+    def submit(self, name, function, *args, on_done=None, on_error=None, on_progress=None, writable=False):
+        # Run function(engine, job, *args) on a worker, with an engine that can post when writable is set.
+        # on_done(result), on_error(error) and on_progress(done, total) are called on the Tk main thread.
+        job = Job(name, self.results, on_done, on_error, on_progress)
+        self.jobs.add(job)
+        self.executor.submit(self.run, job, function, args, writable)
+        return job
+
+    def cancel_all(self):
+        for job in list(self.jobs):
+            job.cancel()
+
+    def close(self):
+        self.closed = True
+        self.cancel_all()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    # ---- Worker threads ----
+
+    def engine(self, writable=False):
+        # Each worker opens its connections the first time it runs a job that needs them and keeps them
+        name = "write_engine" if writable else "engine"
+        engine = getattr(self.local, name, None)
+        if engine is None:
+            engine = InventoryEngine(connect(self.path, readonly=not writable), setup=False)
+            setattr(self.local, name, engine)
+        return engine
+
+    def run(self, job, function, args, writable=False):
+        try:
+            job.check()
+            engine = self.engine(writable)
+            engine.conn.set_progress_handler(job.cancelled.is_set, PROGRESS_HANDLER_STEPS)
+            try:
+                with timed(f"job: {job.name}"):
+                    result = function(engine, job, *args)
+            finally:
+                engine.conn.set_progress_handler(None, 0)
+                if engine.conn.in_transaction:
+                    engine.conn.rollback()
+            self.results.put((job, "done", result))
+        except BaseException as error:
+            self.results.put((job, "error", error))
+
+    # ---- Tk main thread ----
+
+    def poll(self):
+        while True:
+            try:
+                job, kind, value = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if kind != "progress":
+                self.jobs.discard(job)
+            # A cancelled job's result, or the error its interrupted query raised, is dropped
+            if job.cancelled.is_set():
+                continue
+            if kind == "done":
+                if job.on_done:
+                    job.on_done(value)
+            elif kind == "error":
+                if job.on_error:
+                    job.on_error(value)
+                else:
+                    self.root.report_callback_exception(type(value), value, value.__traceback__)
+            elif job.on_progress:
+                job.on_progress(*value)
+        if not self.closed:
+            self.root.after(POLL_MS, self.poll)
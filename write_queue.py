@@ -0,0 +1,157 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from itertools import groupby
+
+from db import connect, run_with_retries, transaction
+from engine import InventoryEngine, IncomingItem, OutgoingShipment, clean_input, date_to_epoch, is_conflict
+
+
+# Posting receipts and shipments one by one costs a commit, and so a WAL append and sync, each.
+# WriteQueue takes postings from any thread and commits them in groups: whatever arrived within
+# max_delay seconds of the first posting of a group, up to max_operations, goes into one transaction.
+# Consecutive receipts go through receive_batch and consecutive shipments through ship_batch, whose running
+# in-memory stock checks every shipment against the shipments before it in the same group.
+# Every posting gets its own Future with the new entry id or the reason it was rejected.
+
+DEFAULT_MAX_DELAY = 0.05
+DEFAULT_MAX_OPERATIONS = 500
+
+FLUSH = object()
+STOP = object()
+
+QUEUED_TYPES = (IncomingItem, OutgoingShipment)
+
+
+def validate(entry):
+    # Catch bad input before it can fail the whole group
+    if type(entry) not in QUEUED_TYPES:
+        raise TypeError(f"Only receipts and shipments can be queued, got {type(entry).__name__}.")
+    for field in ("store", "item_no", "item_name"):
+        if not clean_input(getattr(entry, field) or ""):
+            raise ValueError(f"The {field.replace('_', ' ')} cannot be empty.")
+    int(entry.quantity)
+    if isinstance(entry, IncomingItem):
+        float(entry.price)
+        float(entry.tax_rate)
+    if entry.entry_date:
+        date_to_epoch(entry.entry_date)
+
+
+class WriteQueue:
+
+    def __init__(self, path=None, max_delay=DEFAULT_MAX_DELAY, max_operations=DEFAULT_MAX_OPERATIONS):
+        self.path = path
+        self.max_delay = max_delay
+        self.max_operations = max_operations
+        self.pending = queue.Queue()
+        self.stats = {"groups": 0, "operations": 0, "rejected": 0}
+        self.thread = threading.Thread(target=self.run, name="inventory-write-queue", daemon=True)
+        self.thread.start()
+
+    def submit(self, entry):
+        # Queue an IncomingItem or OutgoingShipment, the Future resolves to its entry id once committed
+        future = Future()
+        self.pending.put((entry, future))
+        return future
+
+    def flush(self, timeout=None):
+        # Commit everything submitted so far without waiting for max_delay, and wait until it is committed
+        done = threading.Event()
+        self.pending.put((FLUSH, done))
+        return done.wait(timeout)
+
+    def close(self):
+        self.pending.put((STOP, None))
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # ---- Writer thread ----
+
+    def run(self):
+        # The queue's thread owns its connection, postings from other threads only ever touch self.pending
+        engine = InventoryEngine(connect(self.path))
+        try:
+            stopping = False
+            while not stopping:
+                entry, waiter = self.pending.get()
+                group, flushed = [], []
+                deadline = time.monotonic() + self.max_delay
+                while True:
+                    if entry is STOP:
+                        stopping = True
+                    elif entry is FLUSH:
+                        flushed.append(waiter)
+                    else:
+                        group.append((entry, waiter))
+                    if stopping or flushed or len(group) >= self.max_operations:
+                        break
+                    try:
+                        entry, waiter = self.pending.get(timeout=max(0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+
+                if group:
+                    self.commit_group(engine, group)
+                for done in flushed:
+                    done.set()
+        finally:
+            engine.conn.close()
+
+    def commit_group(self, engine, group):
+        valid = []
+        for entry, future in group:
+            try:
+                validate(entry)
+            except (TypeError, ValueError) as error:
+                future.set_exception(error)
+                self.stats["rejected"] += 1
+                continue
+            valid.append((entry, future))
+
+        def post_group():
+            results = []
+            with transaction(engine.conn):
+                for kind, run in groupby(valid, key=lambda operation: type(operation[0])):
+                    run = list(run)
+                    entries = [entry for entry, _ in run]
+                    rejected = {}
+                    if kind is IncomingItem:
+                        posted = engine.receive_batch(entries)
+                    else:
+                        posted, rejected = engine.ship_batch(entries)
+                        rejected = {id(shipment): error for shipment, error in rejected}
+                    # The posted ids are in the order of the entries that were not rejected
+                    posted = iter(posted)
+                    for entry, future in run:
+                        if id(entry) in rejected:
+                            results.append((future, rejected[id(entry)]))
+                        else:
+                            results.append((future, next(posted)))
+            return results
+
+        try:
+            # A group that lost a race with another writer is posted again as a whole
+            results = run_with_retries(engine.conn, post_group, is_conflict)
+        except Exception as error:
+            # Nothing in the group was committed, the engine's cache may hold some of it
+            engine.clear_inventory_cache()
+            for _, future in valid:
+                future.set_exception(error)
+            self.stats["rejected"] += len(valid)
+            return
+
+        self.stats["groups"] += 1
+        for future, result in results:
+            self.stats["operations"] += 1
+            if isinstance(result, Exception):
+                future.set_exception(result)
+                self.stats["rejected"] += 1
+            else:
+                future.set_result(result)